@@ -0,0 +1,94 @@
+import asyncio
+
+import numpy as np
+
+from .ApiTemplate import API, APIException
+
+
+def defaultCanonical(apiName, pair) -> str | None:
+    # adapters already keyed by "BASE/QUOTE" are used as is
+    return pair.upper() if "/" in pair else None
+
+
+class PriceMatrix:
+    # pair x exchange quotes; a missing bid is -inf and a missing ask +inf,
+    # so max/min over exchanges ignore them without masking
+    __slots__ = (
+        "pairs",
+        "rows",
+        "exchanges",
+        "bids",
+        "asks",
+        "bestBid",
+        "bestBidExchange",
+        "bestAsk",
+        "bestAskExchange",
+        "spread",
+        "errors",
+    )
+
+    def __init__(self, pairs, exchanges, bids, asks, errors):
+        self.pairs = pairs
+        self.rows = {pair: i for i, pair in enumerate(pairs)}
+        self.exchanges = exchanges
+        self.bids = bids
+        self.asks = asks
+        self.errors = errors  # exchange -> exception for failed fetches
+
+        rows = np.arange(len(pairs))
+        self.bestBidExchange = bids.argmax(axis=1)
+        self.bestAskExchange = asks.argmin(axis=1)
+        self.bestBid = bids[rows, self.bestBidExchange]
+        self.bestAsk = asks[rows, self.bestAskExchange]
+        # positive when one exchange bids above another's ask
+        self.spread = self.bestBid - self.bestAsk
+
+    def crossed(self) -> np.ndarray:
+        # rows where buying at the best ask and selling at the best bid pays
+        return np.flatnonzero(
+            (self.spread > 0) & np.isfinite(self.bestBid) & np.isfinite(self.bestAsk)
+        )
+
+
+class PriceAggregator:
+    def __init__(self, apis: list[API] = (), canonical=defaultCanonical):
+        self.apis = list(apis)
+        # canonical(apiName, pair) -> "BASE/QUOTE" or None to drop the pair
+        self.canonical = canonical
+
+    def register(self, api: API):
+        self.apis.append(api)
+
+    async def fetch(self) -> PriceMatrix:
+        # best bid/ask are picked over exchange columns, so there must be one
+        if not self.apis:
+            raise APIException("Error: " + "no exchanges registered")
+        results = await asyncio.gather(
+            *[api.getAssetsPrices() for api in self.apis], return_exceptions=True
+        )
+        exchanges = [api.getApiName() for api in self.apis]
+
+        columns, errors = [], {}
+        index = {}
+        for name, result in zip(exchanges, results):
+            if isinstance(result, (APIException, Exception)):
+                errors[name] = result
+                columns.append({})
+                continue
+            column = {}
+            for pair, price in result.items():
+                key = self.canonical(name, pair)
+                if key is not None:
+                    column[index.setdefault(key, len(index))] = price
+            columns.append(column)
+
+        bids = np.full((len(index), len(exchanges)), -np.inf)
+        asks = np.full((len(index), len(exchanges)), np.inf)
+        for j, column in enumerate(columns):
+            if not column:
+                continue
+            rows = np.fromiter(column.keys(), dtype=np.intp, count=len(column))
+            bids[rows, j] = [price.bid for price in column.values()]
+            asks[rows, j] = [price.ask for price in column.values()]
+
+        return PriceMatrix(list(index), exchanges, bids, asks, errors)
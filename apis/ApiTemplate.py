@@ -1,8 +1,31 @@
+import asyncio
+import contextvars
+import email.utils
+import functools
+import json
+import math
+import random
+import time
+import urllib.parse
+
 import aiohttp
 
+try:
+    import orjson
+except ImportError:  # optional, falls back to the stdlib decoder
+    orjson = None
+
+from orderbook import OrderBook
+from .CircuitBreaker import CircuitBreaker, LatencyWindow
+from .Metrics import Metrics
+from .RateLimiter import RateLimiter
+from .SymbolRegistry import SymbolRegistry
 from schemas import (
+    DepthArray,
     DepthSchema,
     PriceSchema,
+    PriceVolumeSchema,
+    TickerSchema,
     WithdrawFeeSchema,
     WithdrawNetworkFeeSchema,
 )
@@ -17,13 +40,243 @@ class APIException(BaseException):
         return self.message
 
 
+class DepthResyncException(APIException):
+    # the local book missed an update and has to be rebuilt from a snapshot
+    pass
+
+
+# decodes raw response bytes (or websocket text)
+loadJson = orjson.loads if orjson is not None else json.loads
+
+
+class Response:
+    __slots__ = ("status", "headers", "content_type", "body", "decoder", "onDecode")
+
+    def __init__(
+        self, status, headers, content_type, body, decoder=loadJson, onDecode=None
+    ):
+        self.status = status
+        self.headers = headers
+        self.content_type = content_type
+        self.body = body
+        self.decoder = decoder
+        self.onDecode = onDecode  # called with the decode time when metrics are on
+
+    def json(self):
+        # straight from the body bytes, whatever the content type says
+        if self.onDecode is None:
+            return self.decoder(self.body)
+        start = time.perf_counter()
+        result = self.decoder(self.body)
+        self.onDecode(time.perf_counter() - start)
+        return result
+
+
+class Metadata:
+    __slots__ = ("symbols", "timestamp")
+
+    def __init__(self, symbols, timestamp):
+        self.symbols = symbols  # SymbolRegistry
+        self.timestamp = timestamp
+
+
+def singleFlight(ttl=0):
+    # concurrent calls with the same arguments await one shared call; with a
+    # ttl the result is also reused for that many seconds, so callers must
+    # not mutate it
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(self, *args):
+            return await self._singleFlight(
+                (func.__qualname__,) + args, lambda: func(self, *args), ttl
+            )
+
+        return wrapper
+
+    return decorator
+
+
+# [seconds] spent sending requests and decoding in the current measured() call
+_requestTime = contextvars.ContextVar("requestTime", default=None)
+# session timeout of the current fetch attempt, None for DEFAULT_TIMEOUT
+_attemptTimeout = contextvars.ContextVar("attemptTimeout", default=None)
+
+
+def _retryAfter(value) -> float | None:
+    # Retry-After is either seconds or an HTTP-date
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(
+            0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time()
+        )
+    except (TypeError, ValueError):
+        return None
+
+
+def measured(func):
+    # records as the "build" phase the time an adapter method spends outside
+    # requests and decoding, i.e. turning responses into schemas; goes below
+    # @singleFlight so joined calls are not counted twice
+    @functools.wraps(func)
+    async def wrapper(self, *args, **kwargs):
+        if self._metrics is None:
+            return await func(self, *args, **kwargs)
+        spent = [0.0]
+        token = _requestTime.set(spent)
+        start = time.perf_counter()
+        try:
+            return await func(self, *args, **kwargs)
+        finally:
+            _requestTime.reset(token)
+            total = time.perf_counter() - start
+            self._metrics.observe(
+                self.getApiName(), func.__name__, "build", max(0.0, total - spent[0])
+            )
+            # a measured caller does not count this call as its own build
+            parent = _requestTime.get()
+            if parent is not None:
+                parent[0] += total
+
+    return wrapper
+
+
 class API:
     DEFAULT_TIMEOUT: int = 10
+    # False while the exchange's circuit breaker is open
     OPERATIONAL: bool = True
+    JSON_DECODER = staticmethod(loadJson)
+
+    # connection pool
+    CONNECTION_LIMIT: int = 100
+    CONNECTION_LIMIT_PER_HOST: int = 20
+    KEEPALIVE_TIMEOUT: int = 30
+    DNS_CACHE_TTL: int = 300
+
+    # seconds before pair list / symbol map are refreshed in the background
+    METADATA_TTL: int = 3600
+    # exchange asset codes -> canonical codes, e.g. {"XBT": "BTC"}
+    ASSET_ALIASES: dict[str, str] = {}
+    # seconds before withdrawal fees are refetched in the background
+    WITHDRAW_FEES_TTL: int = 6 * 3600
+    # seconds a stale copy is served after its background refresh failed
+    # before another one is tried
+    REFRESH_RETRY: float = 60
+
+    # seconds an identical GET response is reused, 0 only joins in-flight calls
+    RESPONSE_CACHE_TTL: float = 0
+
+    # rate limits: bucket -> (weight, per seconds); requests are queued until
+    # their bucket has room, unlisted buckets use "default" and unlisted url
+    # paths weigh 1. Empty means no limiting.
+    RATE_LIMITS: dict[str, tuple[int, float]] = {}
+    ENDPOINT_WEIGHTS: dict[str, int] = {}
+
+    # unsigned GETs are retried on transport errors and these statuses,
+    # waiting a random 0..RETRY_BACKOFF * 2**n seconds (capped) before retry
+    # n. Attempts time out after ATTEMPT_TIMEOUT and all of them together
+    # after DEFAULT_TIMEOUT, the last one getting whatever is left
+    RETRY_ATTEMPTS: int = 3
+    ATTEMPT_TIMEOUT: float = 4
+    RETRY_STATUSES: tuple[int, ...] = (418, 429, 500, 502, 503, 504)
+    RETRY_BACKOFF: float = 0.2
+    RETRY_BACKOFF_MAX: float = 5
+    # a GET unanswered after its endpoint's HEDGE_QUANTILE latency is sent
+    # once more and the first response wins; 0 disables hedging
+    HEDGE_QUANTILE: float = 0
+    HEDGE_MIN_DELAY: float = 0.05
+    # consecutive failed calls (after their retries) that open a breaker;
+    # open breakers fail fast and let one probe through every
+    # BREAKER_COOLDOWN seconds. Endpoint breakers count transport errors and
+    # 5xx, the exchange breaker transport errors, and 5xx only while at least
+    # BREAKER_ENDPOINTS endpoints are failing at once
+    BREAKER_THRESHOLD: int = 5
+    BREAKER_COOLDOWN: float = 30
+    BREAKER_ENDPOINTS: int = 2
+
+    # book sizes the REST depth endpoint serves, ascending; empty means any
+    # size up to DEPTH_MAX levels (None: no limit)
+    DEPTH_LIMITS: tuple[int, ...] = ()
+    DEPTH_MAX: int | None = None
+
+    # depth streams
+    WS_URL: str = ""
+    WS_HEARTBEAT: int = 20
+    # pause before reconnecting, doubled per failure without an update in
+    # between up to RESYNC_DELAY_MAX
+    RESYNC_DELAY: float = 1
+    RESYNC_DELAY_MAX: float = 30
 
-    def __init__(self, api_key, api_secret):
+    def __init__(
+        self,
+        api_key,
+        api_secret,
+        session=None,
+        cache=None,
+        metrics=None,
+        transport=None,
+    ):
         self.api_key = api_key
         self.api_secret = api_secret
+        # a session passed in by the caller is shared and never closed here
+        self._session = session
+        self._ownsSession = session is None
+        # DiskCache for metadata and withdrawal fees, None keeps them in memory
+        self._cache = cache
+        self._resources = {}
+        self._refreshAt = {}  # resource -> monotonic time of the next refresh
+        # Metrics shared by any number of instances, None records nothing
+        self._metrics = metrics
+        if metrics is not None:
+            metrics.register(self)
+        # RecordingTransport / ReplayTransport in place of the session
+        self._transport = transport
+        self._metadata = None
+        self._metadataTask = None
+        self._inflight = {}
+        self._results = {}
+        self._limiters = {}
+        self._breakers = {}
+        self._latencies = {}
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def close(self):
+        if self._metadataTask is not None and not self._metadataTask.done():
+            self._metadataTask.cancel()
+        if self._ownsSession and self._session is not None:
+            await self._session.close()
+        self._session = None
+
+    @classmethod
+    def createSession(cls, metrics=None) -> aiohttp.ClientSession:
+        # with metrics, new connections are timed as the "connect" phase
+        connector = aiohttp.TCPConnector(
+            limit=cls.CONNECTION_LIMIT,
+            limit_per_host=cls.CONNECTION_LIMIT_PER_HOST,
+            keepalive_timeout=cls.KEEPALIVE_TIMEOUT,
+            ttl_dns_cache=cls.DNS_CACHE_TTL,
+            ssl=False,
+        )
+        return aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=cls.DEFAULT_TIMEOUT),
+            trace_configs=[Metrics.traceConfig()] if metrics is not None else None,
+        )
+
+    def _getSession(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = self.createSession(self._metrics)
+            self._ownsSession = True
+        return self._session
 
     # statics
     @staticmethod
@@ -46,27 +299,428 @@ class API:
         raise NotImplementedError()
         return ""
 
-    async def _request(
-        self, method, url, params=None, data=None, headers={}, toSign=False
+    async def _singleFlight(self, key, factory, ttl=0):
+        cached = self._results.get(key)
+        if cached is not None:
+            if cached[0] > time.monotonic():
+                return cached[1]
+            del self._results[key]
+
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(factory())
+            self._inflight[key] = task
+            task.add_done_callback(functools.partial(self._onFlightDone, key, ttl))
+        # one caller giving up must not cancel the call for the others
+        return await asyncio.shield(task)
+
+    def _onFlightDone(self, key, ttl, task):
+        self._inflight.pop(key, None)
+        if task.cancelled() or task.exception() is not None:
+            return
+        result = task.result()
+        # an error response that outlived its retries is not kept for the ttl
+        if isinstance(result, Response) and result.status != 200:
+            return
+        if ttl > 0:
+            self._results[key] = (time.monotonic() + ttl, result)
+
+    @staticmethod
+    def _freeze(mapping):
+        if not mapping:
+            return ()
+        return tuple(sorted(mapping.items()))
+
+    async def _send(
+        self, method, url, params=None, data=None, headers=None, signed=False
     ):
-        if toSign:
-            headers["signature"] = self._sign(params, self.api_secret)
+        # signed requests are sent once: a retry would reuse an expired
+        # nonce/timestamp
+        spent = _requestTime.get()
+        if spent is None:
+            return await self._dispatch(method, url, params, data, headers, signed)
+        start = time.perf_counter()
+        try:
+            return await self._dispatch(method, url, params, data, headers, signed)
+        finally:
+            spent[0] += time.perf_counter() - start
+
+    async def _dispatch(
+        self, method, url, params=None, data=None, headers=None, signed=False
+    ):
+        # identical unsigned GETs share one request; signed ones carry a
+        # nonce/timestamp and never collide
+        if signed:
+            return await self._resilientFetch(
+                method, url, params, data, headers, retry=False
+            )
+        if method == "GET" and not data:
+            key = (method, url, self._freeze(params), self._freeze(headers))
+            return await self._singleFlight(
+                key,
+                lambda: self._resilientFetch(method, url, params, data, headers),
+                self.RESPONSE_CACHE_TTL,
+            )
+        return await self._resilientFetch(method, url, params, data, headers)
+
+    # resilience
+    def _getBreaker(self, endpoint) -> CircuitBreaker:
+        # endpoint None is the exchange-wide breaker
+        breaker = self._breakers.get(endpoint)
+        if breaker is None:
+            breaker = self._breakers[endpoint] = CircuitBreaker(
+                self.BREAKER_THRESHOLD, self.BREAKER_COOLDOWN
+            )
+        return breaker
+
+    def _getLatency(self, endpoint) -> LatencyWindow:
+        window = self._latencies.get(endpoint)
+        if window is None:
+            window = self._latencies[endpoint] = LatencyWindow()
+        return window
+
+    def _checkBreakers(self, endpoint):
+        # the endpoint is checked first so a call it blocks doesn't take the
+        # exchange breaker's probe
+        breaker = self._getBreaker(endpoint)
+        if not breaker.ready():
+            raise APIException("Error: " + endpoint + " circuit open")
+        if not self._getBreaker(None).allow():
+            raise APIException("Error: " + self.getApiName() + " circuit open")
+        breaker.allow()
+
+    def _recordOutcome(self, endpoint, status):
+        # status None when no response arrived
+        breaker, exchange = self._getBreaker(endpoint), self._getBreaker(None)
+        if status is not None and status < 500:
+            breaker.success()
+            exchange.success()
+        else:
+            breaker.failure()
+            failing = sum(
+                1
+                for key, other in self._breakers.items()
+                if key is not None and other.failures
+            )
+            if status is None or failing >= self.BREAKER_ENDPOINTS:
+                exchange.failure()
+        self.OPERATIONAL = not exchange.isOpen
+
+    def _backoff(self, attempt) -> float:
+        # full jitter, so clients retrying together spread out
+        return random.uniform(
+            0, min(self.RETRY_BACKOFF_MAX, self.RETRY_BACKOFF * 2 ** (attempt - 1))
+        )
+
+    def _hedgeDelay(self, endpoint) -> float | None:
+        if not self.HEDGE_QUANTILE:
+            return None
+        delay = self._getLatency(endpoint).quantile(self.HEDGE_QUANTILE)
+        return None if delay is None else max(delay, self.HEDGE_MIN_DELAY)
+
+    async def _resilientFetch(
+        self, method, url, params=None, data=None, headers=None, retry=True
+    ):
+        # only GETs are retried and hedged, other methods may not be idempotent
+        endpoint = urllib.parse.urlsplit(url).path
+        retry = retry and method == "GET"
+        attempts = self.RETRY_ATTEMPTS if retry else 1
+        deadline = time.monotonic() + self.DEFAULT_TIMEOUT
+        # breakers see the call once, not each of its attempts
+        self._checkBreakers(endpoint)
+        for attempt in range(attempts):
+            if attempt:
+                remaining = deadline - time.monotonic()
+                await asyncio.sleep(min(self._backoff(attempt), remaining / 2))
+            remaining = deadline - time.monotonic()
+            last = attempt == attempts - 1 or remaining <= self.ATTEMPT_TIMEOUT
+            token = _attemptTimeout.set(remaining if last else self.ATTEMPT_TIMEOUT)
+            try:
+                response = await self._hedgedFetch(
+                    endpoint, method, url, params, data, headers, retry
+                )
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                if last:
+                    self._recordOutcome(endpoint, None)
+                    raise
+                continue
+            finally:
+                _attemptTimeout.reset(token)
+
+            if response.status not in self.RETRY_STATUSES or last:
+                self._recordOutcome(endpoint, response.status)
+                return response
+
+    async def _hedgedFetch(self, endpoint, method, url, params, data, headers, hedge):
+        delay = self._hedgeDelay(endpoint) if hedge else None
+        if delay is None:
+            return await self._timedFetch(endpoint, method, url, params, data, headers)
 
-        async with aiohttp.ClientSession() as session:
-            async with session.request(
+        tasks = [
+            asyncio.ensure_future(
+                self._timedFetch(endpoint, method, url, params, data, headers)
+            )
+        ]
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if not done:
+                tasks.append(
+                    asyncio.ensure_future(
+                        self._timedFetch(endpoint, method, url, params, data, headers)
+                    )
+                )
+            # the first response wins, an error only counts if both fail
+            pending = set(tasks)
+            while True:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                if not pending:
+                    return task.result()
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def _timedFetch(self, endpoint, method, url, params, data, headers):
+        start = time.monotonic()
+        response = await self._throttledFetch(method, url, params, data, headers)
+        self._getLatency(endpoint).add(time.monotonic() - start)
+        return response
+
+    # rate limiting
+    def _rateLimitBucket(self, method, path, params) -> str:
+        return "default"
+
+    def _requestWeight(self, method, path, params) -> int:
+        return self.ENDPOINT_WEIGHTS.get(path, 1)
+
+    def _getLimiter(self, bucket) -> RateLimiter:
+        limiter = self._limiters.get(bucket)
+        if limiter is None:
+            capacity, period = self.RATE_LIMITS.get(bucket, self.RATE_LIMITS["default"])
+            limiter = self._limiters[bucket] = RateLimiter(capacity, period)
+        return limiter
+
+    def _syncRateLimit(self, bucket, response):
+        # back off for as long as the exchange asks after a 429/418
+        if response.status in (418, 429):
+            limiter = self._getLimiter(bucket)
+            retryAfter = _retryAfter(response.headers.get("Retry-After"))
+            limiter.pause(
+                limiter.capacity / limiter.rate if retryAfter is None else retryAfter
+            )
+
+    async def _throttledFetch(self, method, url, params=None, data=None, headers=None):
+        if not self.RATE_LIMITS:
+            return await self._fetch(method, url, params, data, headers)
+
+        path = urllib.parse.urlsplit(url).path
+        bucket = self._rateLimitBucket(method, path, params)
+        await self._getLimiter(bucket).acquire(
+            self._requestWeight(method, path, params)
+        )
+        response = await self._fetch(method, url, params, data, headers)
+        self._syncRateLimit(bucket, response)
+        return response
+
+    async def _fetch(self, method, url, params=None, data=None, headers=None):
+        if self._transport is not None:
+            return await self._transport.fetch(self, method, url, params, data, headers)
+        return await self._sessionFetch(method, url, params, data, headers)
+
+    def _requestTimeout(self) -> aiohttp.ClientTimeout:
+        # per request, as sessions passed in may carry aiohttp's 5 min default
+        return aiohttp.ClientTimeout(
+            total=_attemptTimeout.get() or self.DEFAULT_TIMEOUT
+        )
+
+    async def _sessionFetch(self, method, url, params=None, data=None, headers=None):
+        # every adapter goes through here, so all calls share one pooled session
+        if self._metrics is not None:
+            return await self._measuredFetch(method, url, params, data, headers)
+        async with self._getSession().request(
+            method,
+            url,
+            params=params,
+            data=data,
+            headers=headers,
+            timeout=self._requestTimeout(),
+        ) as response:
+            return Response(
+                response.status,
+                response.headers,
+                response.content_type,
+                await response.read(),
+                self.JSON_DECODER,
+            )
+
+    async def _measuredFetch(self, method, url, params, data, headers):
+        # ttfb is the time to response headers less any new connection setup
+        exchange = self.getApiName()
+        endpoint = urllib.parse.urlsplit(url).path
+        timings = {}
+        start = time.perf_counter()
+        try:
+            async with self._getSession().request(
                 method,
                 url,
                 params=params,
                 data=data,
                 headers=headers,
-                timeout=self.DEFAULT_TIMEOUT,
-                verify_ssl=False,
+                timeout=self._requestTimeout(),
+                trace_request_ctx=timings,
             ) as response:
-                if response.status == 200:
-                    response_json = await response.json()
-                    return response_json
-                else:
-                    raise APIException("Error: " + "request error")
+                headersAt = time.perf_counter()
+                body = await response.read()
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            self._metrics.recordResponse(exchange, endpoint, "error", 0)
+            raise
+        end = time.perf_counter()
+
+        connect = timings.get("connect", 0.0)
+        if "connect" in timings:
+            self._metrics.observe(exchange, endpoint, "connect", connect)
+        self._metrics.observe(exchange, endpoint, "ttfb", headersAt - start - connect)
+        self._metrics.observe(exchange, endpoint, "download", end - headersAt)
+        self._metrics.recordResponse(exchange, endpoint, response.status, len(body))
+        return Response(
+            response.status,
+            response.headers,
+            response.content_type,
+            body,
+            self.JSON_DECODER,
+            functools.partial(self._observeDecode, endpoint),
+        )
+
+    def _observeDecode(self, endpoint, seconds):
+        self._metrics.observe(self.getApiName(), endpoint, "decode", seconds)
+        spent = _requestTime.get()
+        if spent is not None:
+            spent[0] += seconds
+
+    def rateLimitHeadroom(self) -> dict[str, float]:
+        # bucket -> share of its weight available right now
+        return {bucket: limiter.headroom for bucket, limiter in self._limiters.items()}
+
+    async def _request(
+        self, method, url, params=None, data=None, headers=None, toSign=False
+    ):
+        headers = dict(headers or {})
+        if toSign:
+            headers["signature"] = self._sign(params, self.api_secret)
+
+        response = await self._send(
+            method, url, params=params, data=data, headers=headers, signed=toSign
+        )
+        if response.status == 200:
+            return response.json()
+        else:
+            raise APIException("Error: " + "request error")
+
+    # metadata cache
+    async def _loadSymbols(self) -> SymbolRegistry:
+        # adapters register their native ticker/rest/ws ids from the raw
+        # pair listing; this fallback only knows getAssetList's pairs
+        symbols = SymbolRegistry(self.ASSET_ALIASES)
+        for asset0, asset1 in await self.getAssetList():
+            symbols.add(asset0, asset1, asset0 + asset1)
+        return symbols
+
+    async def _loadMetadata(self) -> Metadata:
+        symbols = await self._loadSymbols()
+        self._metadata = Metadata(symbols, time.monotonic())
+        await self._writeCache("metadata", symbols.toDict())
+        return self._metadata
+
+    def _scheduleMetadataLoad(self) -> asyncio.Future:
+        # concurrent refreshes share one in-flight load
+        if self._metadataTask is None or self._metadataTask.done():
+            self._metadataTask = asyncio.ensure_future(self._loadMetadata())
+        return self._metadataTask
+
+    async def refreshMetadata(self) -> Metadata:
+        return await asyncio.shield(self._scheduleMetadataLoad())
+
+    async def getMetadata(self, forceRefresh=False) -> Metadata:
+        if self._metadata is None and not forceRefresh:
+            cached = await self._readCache("metadata")
+            if cached is not None:
+                symbols = SymbolRegistry.fromDict(cached[0], self.ASSET_ALIASES)
+                age = time.time() - cached[1]
+                self._metadata = Metadata(symbols, time.monotonic() - age)
+
+        if forceRefresh or self._metadata is None:
+            return await self.refreshMetadata()
+
+        if time.monotonic() - self._metadata.timestamp > self.METADATA_TTL:
+            # serve the stale copy, a failed background refresh keeps it
+            self._refreshInBackground("metadata", self._scheduleMetadataLoad)
+        return self._metadata
+
+    # disk cache
+    async def _readCache(self, resource) -> tuple[object, float] | None:
+        if self._cache is None:
+            return None
+        return await asyncio.to_thread(self._cache.get, self.getApiName(), resource)
+
+    async def _writeCache(self, resource, value):
+        if self._cache is None:
+            return
+        try:
+            await asyncio.to_thread(self._cache.put, self.getApiName(), resource, value)
+        except OSError:
+            pass  # an unwritable cache only costs the next cold start
+
+    async def _cachedResource(self, resource, ttl, load, encode, decode):
+        # stale-while-revalidate over memory and the disk cache: a stale value
+        # is returned at once while a single background load replaces it
+        entry = self._resources.get(resource)
+        if entry is None:
+            cached = await self._readCache(resource)
+            if cached is not None:
+                entry = (decode(cached[0]), cached[1])
+                self._resources.setdefault(resource, entry)
+
+        key = ("cachedResource", resource)
+        if entry is None:
+            return await self._singleFlight(
+                key, lambda: self._loadResource(resource, load, encode)
+            )
+        if time.time() - entry[1] > ttl:
+            self._refreshInBackground(
+                resource,
+                lambda: asyncio.ensure_future(
+                    self._singleFlight(
+                        key, lambda: self._loadResource(resource, load, encode)
+                    )
+                ),
+            )
+        return entry[0]
+
+    def _refreshInBackground(self, resource, start):
+        # one refresh at a time; after a failure, counted in the metrics, the
+        # stale copy is served for REFRESH_RETRY seconds before the next try
+        if time.monotonic() < self._refreshAt.get(resource, 0):
+            return
+        self._refreshAt[resource] = math.inf
+        start().add_done_callback(functools.partial(self._onRefreshDone, resource))
+
+    def _onRefreshDone(self, resource, task):
+        if task.cancelled() or task.exception() is None:
+            self._refreshAt.pop(resource, None)
+            return
+        self._refreshAt[resource] = time.monotonic() + self.REFRESH_RETRY
+        if self._metrics is not None:
+            self._metrics.recordRefreshError(self.getApiName(), resource)
+
+    async def _loadResource(self, resource, load, encode):
+        value = await load()
+        self._resources[resource] = (value, time.time())
+        await self._writeCache(resource, encode(value))
+        return value
 
     async def getAssetList(self) -> list[list[str]]:
         raise NotImplementedError()
@@ -78,10 +732,15 @@ class API:
         return PriceSchema(bid=0, ask=0)
 
     async def getAssetsPrices(self) -> dict[str, PriceSchema]:
+        # best bid/ask of asset0/asset1; by default the getTickerSnapshot
+        # dict itself, shared, callers must not mutate it
+        return await self.getTickerSnapshot()
+
+    async def getTickerSnapshot(self) -> dict[str, TickerSchema]:
         raise NotImplementedError()
-        # best bid/ask of asset0/asset1
+        # best bid/ask and 24h volume of every pair from a single fetch
         return {
-            "BTC/USDT": PriceSchema(bid=0, ask=0),
+            "BTC/USDT": TickerSchema(bid=0, ask=0, volume=0),
         }
 
     async def get24hVolume(self, asset0, asset1) -> float:
@@ -90,18 +749,125 @@ class API:
         return 0
 
     async def get24hVolumes(self) -> dict[str, float]:
-        raise NotImplementedError()
         # 24h volume in asset1
-        return {
-            "BTC/USDT": 0,
-        }
+        snapshot = await self.getTickerSnapshot()
+        return {asset: ticker.volume for asset, ticker in snapshot.items()}
 
-    async def getDepth(self, asset0, asset1) -> DepthSchema:
+    def _depthLimit(self, depth) -> int:
+        # the smallest book size the exchange serves with `depth` levels
+        for limit in self.DEPTH_LIMITS:
+            if limit >= depth:
+                return limit
+        if self.DEPTH_LIMITS:
+            return self.DEPTH_LIMITS[-1]
+        return depth if self.DEPTH_MAX is None else min(depth, self.DEPTH_MAX)
+
+    @staticmethod
+    def _depthFromRows(asks, bids, timestamp, asArray) -> DepthSchema | DepthArray:
+        # a sorted depth from [price, volume, ...] rows, in the form getDepth
+        # was asked for
+        if asArray:
+            depth = DepthArray.fromRows(asks=asks, bids=bids, timestamp=timestamp)
+        else:
+            depth = DepthSchema.build(
+                asks=[
+                    PriceVolumeSchema.build(price=float(i[0]), volume=float(i[1]))
+                    for i in asks
+                ],
+                bids=[
+                    PriceVolumeSchema.build(price=float(i[0]), volume=float(i[1]))
+                    for i in bids
+                ],
+                timestamp=timestamp,
+            )
+        depth.sort()
+        return depth
+
+    async def getDepth(
+        self, asset0, asset1, asArray=False, depth=10
+    ) -> DepthSchema | DepthArray:
         raise NotImplementedError()
+        # at most `depth` levels per side, fetching no more than _depthLimit;
+        # asArray returns the levels as numpy arrays instead of schema lists
+        if asArray:
+            da = DepthArray.fromRows(asks=[], bids=[], timestamp=0)
+            da.sort()
+            return da
         ds = DepthSchema(asks=[], bids=[], timestamp=0)
         ds.sort()
         return ds
 
+    async def iterDepths(self, pairs, concurrency=None, **kwargs):
+        # yields (asset0, asset1, depth, error) in completion order, at most
+        # `concurrency` requests in flight; kwargs go to getDepth
+        semaphore = asyncio.Semaphore(concurrency or self.CONNECTION_LIMIT_PER_HOST)
+
+        async def fetch(asset0, asset1):
+            async with semaphore:
+                try:
+                    depth = await self.getDepth(asset0, asset1, **kwargs)
+                except (APIException, Exception) as e:
+                    return asset0, asset1, None, e
+                return asset0, asset1, depth, None
+
+        tasks = [asyncio.ensure_future(fetch(a0, a1)) for a0, a1 in pairs]
+        try:
+            for task in asyncio.as_completed(tasks):
+                yield await task
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def getDepths(
+        self, pairs, concurrency=None, **kwargs
+    ) -> tuple[dict[str, DepthSchema | DepthArray], dict[str, BaseException]]:
+        # one failing pair does not fail the batch, it is reported in errors
+        depths, errors = {}, {}
+        async for asset0, asset1, depth, error in self.iterDepths(
+            pairs, concurrency, **kwargs
+        ):
+            if error is None:
+                depths[asset0 + "/" + asset1] = depth
+            else:
+                errors[asset0 + "/" + asset1] = error
+        return depths, errors
+
+    async def streamDepth(self, asset0, asset1, limit=10):
+        # yields the top `limit` levels of a locally maintained book after
+        # every update, rebuilding it from a fresh snapshot on any gap or
+        # dropped connection; other errors (an unknown pair, a rejected
+        # subscription) are raised
+        failures = 0
+        while True:
+            book = OrderBook()
+            try:
+                async with self._getSession().ws_connect(
+                    self.WS_URL, heartbeat=self.WS_HEARTBEAT
+                ) as ws:
+                    async for _ in self._depthUpdates(ws, book, asset0, asset1, limit):
+                        failures = 0
+                        yield book.toDepthSchema(limit)
+            except (DepthResyncException, aiohttp.ClientError, asyncio.TimeoutError):
+                pass
+            await asyncio.sleep(
+                min(self.RESYNC_DELAY_MAX, self.RESYNC_DELAY * 2**failures)
+            )
+            failures += 1
+
+    async def _depthUpdates(self, ws, book, asset0, asset1, limit):
+        raise NotImplementedError()
+        # subscribe on ws, load the snapshot into book, then apply diffs and
+        # yield after each; raise DepthResyncException on a sequence gap
+        yield
+
+    async def _wsMessages(self, ws):
+        async for msg in ws:
+            if msg.type == aiohttp.WSMsgType.TEXT:
+                if msg.data != "pong":
+                    yield self.JSON_DECODER(msg.data)
+            elif msg.type == aiohttp.WSMsgType.ERROR:
+                raise DepthResyncException("Error: " + "websocket error")
+
     async def getWithdrawFee(self, asset) -> WithdrawFeeSchema:
         raise NotImplementedError()
         wf = WithdrawFeeSchema(
@@ -121,6 +887,18 @@ class API:
         return wf
 
     async def getWithdrawFees(self) -> dict[str, WithdrawFeeSchema]:
+        # shared, callers must not mutate it; refreshed after WITHDRAW_FEES_TTL
+        return await self._cachedResource(
+            "withdrawFees",
+            self.WITHDRAW_FEES_TTL,
+            self._loadWithdrawFees,
+            lambda fees: {asset: fee.toRow() for asset, fee in fees.items()},
+            lambda rows: {
+                asset: WithdrawFeeSchema.fromRow(row) for asset, row in rows.items()
+            },
+        )
+
+    async def _loadWithdrawFees(self) -> dict[str, WithdrawFeeSchema]:
         raise NotImplementedError()
         return {
             "BTC": WithdrawFeeSchema(
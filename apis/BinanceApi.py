@@ -1,22 +1,57 @@
-from .ApiTemplate import API, APIException
+from .ApiTemplate import (
+    API,
+    APIException,
+    DepthResyncException,
+    measured,
+    singleFlight,
+)
+from .SymbolRegistry import SymbolRegistry
 
 from schemas import (
+    DepthArray,
     DepthSchema,
     PriceSchema,
-    PriceVolumeSchema,
+    TickerSchema,
     WithdrawFeeSchema,
     WithdrawNetworkFeeSchema,
 )
 
-import aiohttp
+import asyncio
 import hashlib
 import hmac
 import time
 
 
 class BinanceAPI(API):
-    def __init__(self, api_key, api_secret):
-        super().__init__(api_key, api_secret)
+    WS_URL = "wss://stream.binance.com:9443/ws"
+    DEPTH_LIMITS = (5, 10, 20, 50, 100, 500, 1000, 5000)
+    DEPTH_SNAPSHOT_LIMIT = 1000
+
+    # /api/v3 request weight and /sapi ip weight, per minute
+    RATE_LIMITS = {"default": (6000, 60), "sapi": (12000, 60)}
+    ENDPOINT_WEIGHTS = {
+        "/api/v3/exchangeInfo": 20,
+        "/api/v3/ticker/24hr": 80,
+        "/api/v3/ticker/bookTicker": 4,
+        "/sapi/v1/capital/config/getall": 10,
+    }
+    # depth weight by the largest limit it covers
+    DEPTH_WEIGHTS = ((100, 5), (500, 25), (1000, 50), (5000, 250))
+    USED_WEIGHT_HEADERS = {
+        "default": "X-MBX-USED-WEIGHT-1M",
+        "sapi": "X-SAPI-USED-IP-WEIGHT-1M",
+    }
+
+    def __init__(
+        self,
+        api_key,
+        api_secret,
+        session=None,
+        cache=None,
+        metrics=None,
+        transport=None,
+    ):
+        super().__init__(api_key, api_secret, session, cache, metrics, transport)
         return
 
     @staticmethod
@@ -43,8 +78,9 @@ class BinanceAPI(API):
         return signature
 
     async def _request(
-        self, method, url, params=None, data=None, headers={}, toSign=False
+        self, method, url, params=None, data=None, headers=None, toSign=False
     ):
+        headers = dict(headers or {})
         if toSign:
             if params is None:
                 params = {}
@@ -53,25 +89,32 @@ class BinanceAPI(API):
             params["signature"] = self._sign(params, self.api_secret)
             headers["X-MBX-APIKEY"] = self.api_key
 
-        async with aiohttp.ClientSession() as session:
-            async with session.request(
-                method,
-                url,
-                params=params,
-                data=data,
-                headers=headers,
-                timeout=self.DEFAULT_TIMEOUT,
-                verify_ssl=False,
-            ) as response:
-                if response.status == 200:
-                    response_json = await response.json()
-                    return response_json
-                elif response.content_type == "application/json":
-                    response_json = await response.json()
-                    raise APIException("Error: " + response_json["msg"])
-                else:
-                    raise APIException("Error: " + "request error")
+        response = await self._send(
+            method, url, params=params, data=data, headers=headers, signed=toSign
+        )
+        if response.status == 200:
+            return response.json()
+        elif response.content_type == "application/json":
+            raise APIException("Error: " + response.json()["msg"])
+        else:
+            raise APIException("Error: " + "request error")
 
+    def _rateLimitBucket(self, method, path, params):
+        return "sapi" if path.startswith("/sapi/") else "default"
+
+    def _requestWeight(self, method, path, params):
+        if path == "/api/v3/depth":
+            limit = params.get("limit", 100)
+            return next((w for top, w in self.DEPTH_WEIGHTS if limit <= top), 250)
+        return super()._requestWeight(method, path, params)
+
+    def _syncRateLimit(self, bucket, response):
+        used = response.headers.get(self.USED_WEIGHT_HEADERS[bucket])
+        if used is not None:
+            self._getLimiter(bucket).sync(int(used))
+        super()._syncRateLimit(bucket, response)
+
+    @measured
     async def getAssetList(self):
         url = "https://api.binance.com/api/v3/exchangeInfo"
 
@@ -81,23 +124,35 @@ class BinanceAPI(API):
             keys = [[i["baseAsset"], i["quoteAsset"]] for i in response["symbols"]]
         return keys
 
+    @measured
+    async def _loadSymbols(self) -> SymbolRegistry:
+        url = "https://api.binance.com/api/v3/exchangeInfo"
+        response = await self._request("GET", url)
+
+        symbols = SymbolRegistry(self.ASSET_ALIASES)
+        for i in response["symbols"]:
+            symbols.add(
+                i["baseAsset"], i["quoteAsset"], i["symbol"], ws=i["symbol"].lower()
+            )
+        return symbols
+
     async def getAssetPrice(self, asset0, asset1) -> PriceSchema:
         raise Exception("Not implemented")
 
+    @measured
     async def getAssetsPrices(self) -> dict[str, PriceSchema]:
         url = "https://api.binance.com/api/v3/ticker/bookTicker"
 
         response = await self._request("GET", url)
-        bookTickerCache = {i["symbol"]: i for i in response}
+        symbols = (await self.getMetadata()).symbols
 
         out = {}
-        for asset0, asset1 in await self.getAssetList():
-            symbol = asset0 + asset1
-            asset = asset0 + "/" + asset1
-            if symbol in bookTickerCache:
-                out[asset] = PriceSchema(
-                    bid=float(bookTickerCache[symbol]["bidPrice"]),
-                    ask=float(bookTickerCache[symbol]["askPrice"]),
+        for i in response:
+            asset = symbols.canonical(i["symbol"])
+            if asset is not None:
+                out[asset] = PriceSchema.build(
+                    bid=float(i["bidPrice"]),
+                    ask=float(i["askPrice"]),
                 )
 
         return out
@@ -106,56 +161,120 @@ class BinanceAPI(API):
         volumes = await self.get24hVolumes()
         return volumes[asset0 + "/" + asset1]
 
-    async def get24hVolumes(self) -> dict[str, float]:
+    @singleFlight()
+    @measured
+    async def getTickerSnapshot(self) -> dict[str, TickerSchema]:
+        # ticker/24hr also carries best bid/ask, so one call covers both
         url = "https://api.binance.com/api/v3/ticker/24hr"
 
         response = await self._request("GET", url)
-        tickerCache = {i["symbol"]: i for i in response}
+        symbols = (await self.getMetadata()).symbols
 
         out = {}
-        for asset0, asset1 in await self.getAssetList():
-            symbol = asset0 + asset1
-            asset = asset0 + "/" + asset1
-            if symbol in tickerCache:
-                out[asset] = float(tickerCache[symbol]["quoteVolume"])
+        for i in response:
+            asset = symbols.canonical(i["symbol"])
+            if asset is not None:
+                out[asset] = TickerSchema.build(
+                    bid=float(i["bidPrice"]),
+                    ask=float(i["askPrice"]),
+                    volume=float(i["quoteVolume"]),
+                )
 
         return out
 
-    async def getDepth(self, asset0, asset1) -> DepthSchema:
+    @measured
+    async def getDepth(
+        self, asset0, asset1, asArray=False, depth=10
+    ) -> DepthSchema | DepthArray:
         url = "https://api.binance.com/api/v3/depth"
 
+        symbols = (await self.getMetadata()).symbols
         params = {
-            "symbol": asset0 + asset1,
-            "limit": 10,
+            "symbol": symbols.native(asset0, asset1) or asset0 + asset1,
+            "limit": self._depthLimit(depth),
         }
         response = await self._request("GET", url, params=params)
+        return self._depthFromRows(
+            response["asks"][:depth],
+            response["bids"][:depth],
+            response["lastUpdateId"],
+            asArray,
+        )
 
-        ds = DepthSchema(
-            timestamp=response["lastUpdateId"],
-            bids=[PriceVolumeSchema(price=i[0], volume=i[1]) for i in response["bids"]],
-            asks=[PriceVolumeSchema(price=i[0], volume=i[1]) for i in response["asks"]],
+    async def _depthUpdates(self, ws, book, asset0, asset1, limit):
+        symbols = (await self.getMetadata()).symbols
+        symbol = symbols.native(asset0, asset1) or asset0 + asset1
+        await ws.send_json(
+            {
+                "method": "SUBSCRIBE",
+                "params": [symbol.lower() + "@depth@100ms"],
+                "id": 1,
+            }
         )
-        ds.sort()
-        return ds
+
+        # diffs arriving while the snapshot downloads are buffered and replayed
+        snapshot = asyncio.ensure_future(
+            self._request(
+                "GET",
+                "https://api.binance.com/api/v3/depth",
+                params={"symbol": symbol, "limit": self.DEPTH_SNAPSHOT_LIMIT},
+            )
+        )
+        buffered = []
+        lastUpdateId = None
+        try:
+            async for event in self._wsMessages(ws):
+                if event.get("e") != "depthUpdate":
+                    continue
+
+                if lastUpdateId is None:
+                    buffered.append(event)
+                    if not snapshot.done():
+                        continue
+                    response = snapshot.result()
+                    for side in ("bids", "asks"):
+                        for price, volume in response[side]:
+                            book.update(side, float(price), float(volume))
+                    lastUpdateId = response["lastUpdateId"]
+                    events, buffered = buffered, []
+                else:
+                    events = [event]
+
+                for event in events:
+                    if event["u"] <= lastUpdateId:
+                        continue
+                    if event["U"] > lastUpdateId + 1:
+                        raise DepthResyncException("Error: " + "depth sequence gap")
+                    for price, volume in event["b"]:
+                        book.update("bids", float(price), float(volume))
+                    for price, volume in event["a"]:
+                        book.update("asks", float(price), float(volume))
+                    lastUpdateId = event["u"]
+
+                book.timestamp = lastUpdateId
+                yield
+        finally:
+            snapshot.cancel()
 
     async def getWithdrawFee(self, asset) -> WithdrawFeeSchema:
         fees = await self.getWithdrawFees()
         return fees[asset]
 
-    async def getWithdrawFees(self) -> dict[str, WithdrawFeeSchema]:
+    @measured
+    async def _loadWithdrawFees(self) -> dict[str, WithdrawFeeSchema]:
         url = "https://api.binance.com/sapi/v1/capital/config/getall"
         result = await self._request("GET", url, toSign=True)
 
         out = {}
         for i in result:
-            out[i["coin"]] = WithdrawFeeSchema(
+            out[i["coin"]] = WithdrawFeeSchema.build(
                 deposit_enabled=i["depositAllEnable"],
                 withdraw_enabled=i["withdrawAllEnable"],
                 networks=[
-                    WithdrawNetworkFeeSchema(
+                    WithdrawNetworkFeeSchema.build(
                         network=i["network"],
-                        withdraw_fee=i["withdrawFee"],
-                        min_withdrawal=i["withdrawMin"],
+                        withdraw_fee=float(i["withdrawFee"]),
+                        min_withdrawal=float(i["withdrawMin"]),
                         deposit_enabled=i["depositEnable"],
                         withdraw_enabled=i["withdrawEnable"],
                     )
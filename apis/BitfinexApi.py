@@ -1,27 +1,53 @@
 import base64
 import datetime
 import json
-from .ApiTemplate import API, APIException
+from .ApiTemplate import (
+    API,
+    APIException,
+    DepthResyncException,
+    measured,
+    singleFlight,
+)
+from .SymbolRegistry import SymbolRegistry
 
 from schemas import (
+    DepthArray,
     DepthSchema,
     PriceSchema,
     PriceVolumeSchema,
+    TickerSchema,
     WithdrawFeeSchema,
 )
 
-import aiohttp
 import hashlib
+import numpy as np
 import time
 from .utils import parse_all_pages
 
 
 class BitfinexAPI(API):
     API_PUB_URL = "https://api-pub.bitfinex.com/v2"
+    WS_URL = "wss://api-pub.bitfinex.com/ws/2"
+
+    ASSET_ALIASES = {"UST": "USDT", "UDC": "USDC", "DSH": "DASH", "IOT": "IOTA"}
 
-    def __init__(self, api_key, api_secret):
-        self.api_key = api_key
-        self.api_secret = api_secret
+    # per endpoint, requests per minute
+    RATE_LIMITS = {"default": (90, 60), "tickers": (30, 60)}
+    DEPTH_LIMITS = (1, 25, 100)
+    WS_BOOK_LENGTHS = (1, 25, 100, 250)
+    # conf flag adding a sequence number to every channel message
+    WS_SEQ_ALL = 65536
+
+    def __init__(
+        self,
+        api_key,
+        api_secret,
+        session=None,
+        cache=None,
+        metrics=None,
+        transport=None,
+    ):
+        super().__init__(api_key, api_secret, session, cache, metrics, transport)
 
     @classmethod
     def getSymbol(cls, asset0, asset1):
@@ -54,9 +80,14 @@ class BitfinexAPI(API):
         signature = hashlib.sha384(api_secret).update(payload).hexdigest()
         return signature
 
+    def _rateLimitBucket(self, method, path, params):
+        # /v2/<endpoint>/...
+        return path.split("/")[2]
+
     async def _request(
-        self, method, url, params=None, data=None, headers={}, toSign=False
+        self, method, url, params=None, data=None, headers=None, toSign=False
     ):
+        headers = dict(headers or {})
         if toSign:
             nonce = str(int(time.time() * 1000))
             payloadObject = {
@@ -72,25 +103,17 @@ class BitfinexAPI(API):
             headers["X-BFX-PAYLOAD"] = payload
             headers["X-BFX-SIGNATURE"] = signature
 
-        async with aiohttp.ClientSession() as session:
-            async with session.request(
-                method,
-                url,
-                params=params,
-                data=data,
-                headers=headers,
-                timeout=self.DEFAULT_TIMEOUT,
-                verify_ssl=False,
-            ) as response:
-                if response.status == 200:
-                    response_json = await response.json()
-                    return response_json
-                elif response.content_type == "application/json":
-                    response_json = await response.json()
-                    raise APIException("Error: " + response_json)
-                else:
-                    raise APIException("Error: " + "request error")
+        response = await self._send(
+            method, url, params=params, data=data, headers=headers, signed=toSign
+        )
+        if response.status == 200:
+            return response.json()
+        elif response.content_type == "application/json":
+            raise APIException("Error: " + response.json())
+        else:
+            raise APIException("Error: " + "request error")
 
+    @measured
     async def getAssetList(self) -> list[list[str]]:
         url = BitfinexAPI.API_PUB_URL + "/conf/pub:list:pair:exchange"
         response = await self._request("GET", url)
@@ -104,72 +127,140 @@ class BitfinexAPI(API):
 
         return out
 
+    @measured
+    async def _loadSymbols(self) -> SymbolRegistry:
+        symbols = SymbolRegistry(self.ASSET_ALIASES)
+        for asset0, asset1 in await self.getAssetList():
+            symbols.add(asset0, asset1, self.getSymbol(asset0, asset1))
+        return symbols
+
+    async def _nativeSymbol(self, asset0, asset1) -> str:
+        # canonical pairs don't round-trip through getSymbol: BTC/USDT is tBTCUST
+        symbols = (await self.getMetadata()).symbols
+        return symbols.native(asset0, asset1) or self.getSymbol(asset0, asset1)
+
+    @measured
     async def getAssetPrice(self, asset0, asset1) -> PriceSchema:
-        url = BitfinexAPI.API_PUB_URL + "/ticker/" + self.getSymbol(asset0, asset1)
+        symbol = await self._nativeSymbol(asset0, asset1)
+        url = BitfinexAPI.API_PUB_URL + "/ticker/" + symbol
         response = await self._request("GET", url)
         ps = PriceSchema(ask=response[2], bid=response[0])
         return ps
 
-    async def getAssetsPrices(self) -> dict[str, PriceSchema]:
+    @singleFlight()
+    @measured
+    async def getTickerSnapshot(self) -> dict[str, TickerSchema]:
         url = BitfinexAPI.API_PUB_URL + "/tickers"
         params = {"symbols": "ALL"}
         response = await self._request("GET", url, params)
+        symbols = (await self.getMetadata()).symbols
         out = {}
 
         for asset in response:
-            if asset[0][0] == "t":
-                assets = self.getAssets(asset[0][1:])
-                out[assets[0] + "/" + assets[1]] = PriceSchema(
-                    ask=asset[3], bid=asset[1]
+            # funding tickers ("f...") are not registered and drop out here
+            assets = symbols.canonical(asset[0])
+            if assets is not None:
+                out[assets] = TickerSchema.build(
+                    bid=float(asset[1]), ask=float(asset[3]), volume=float(asset[8])
                 )
 
         return out
 
+    @measured
     async def get24hVolume(self, asset0, asset1) -> float:
-        url = BitfinexAPI.API_PUB_URL + "/ticker/" + self.getSymbol(asset0, asset1)
+        symbol = await self._nativeSymbol(asset0, asset1)
+        url = BitfinexAPI.API_PUB_URL + "/ticker/" + symbol
         response = await self._request("GET", url)
         return response[7]
 
-    async def get24hVolumes(self) -> dict[str, float]:
-        url = BitfinexAPI.API_PUB_URL + "/tickers"
-        params = {"symbols": "ALL"}
+    @measured
+    async def getDepth(
+        self, asset0, asset1, asArray=False, depth=10
+    ) -> DepthSchema | DepthArray:
+        symbol = await self._nativeSymbol(asset0, asset1)
+        url = BitfinexAPI.API_PUB_URL + "/book/" + symbol + "/P0"
+        params = {"len": self._depthLimit(depth)}
         response = await self._request("GET", url, params)
-        out = {}
 
-        for asset in response:
-            if asset[0][0] == "t":
-                assets = self.getAssets(asset[0][1:])
-                out[assets[0] + "/" + assets[1]] = asset[8]
-
-        return out
+        # rows are [price, count, amount], asks have negative amounts; a thin
+        # book has fewer than len rows per side
+        if asArray:
+            rows = np.array(response, dtype=np.float64).reshape(-1, 3)
+            bids = rows[rows[:, 2] > 0][:depth][:, [0, 2]]
+            asks = rows[rows[:, 2] < 0][:depth][:, [0, 2]]
+            asks[:, 1] *= -1
+            da = DepthArray(
+                asks=asks, bids=bids, timestamp=int(datetime.datetime.now().timestamp())
+            )
+            da.sort()
+            return da
 
-    async def getDepth(self, asset0, asset1) -> DepthSchema:
-        url = BitfinexAPI.API_PUB_URL + f"/book/t{asset0}{asset1}/P0"
-        params = {"len": 25}
-        limit = 10
-        response = await self._request("GET", url, params)
         bids, asks = [], []
 
-        for i in range(limit):
-            bids.append(PriceVolumeSchema(price=response[i][0], volume=response[i][2]))
-            asks.append(
-                PriceVolumeSchema(
-                    price=response[i + 25][0], volume=-response[i + 25][2]
+        for price, _, amount in response:
+            if amount > 0:
+                if len(bids) < depth:
+                    bids.append(
+                        PriceVolumeSchema.build(
+                            price=float(price), volume=float(amount)
+                        )
+                    )
+            elif len(asks) < depth:
+                asks.append(
+                    PriceVolumeSchema.build(price=float(price), volume=-float(amount))
                 )
-            )
 
-        ds = DepthSchema(
+        ds = DepthSchema.build(
             bids=bids, asks=asks, timestamp=int(datetime.datetime.now().timestamp())
         )
         ds.sort()
         return ds
 
-    async def getWithdrawFees(self) -> dict[str, WithdrawFeeSchema]:
+    async def _depthUpdates(self, ws, book, asset0, asset1, limit):
+        symbol = await self._nativeSymbol(asset0, asset1)
+        length = next((n for n in self.WS_BOOK_LENGTHS if n >= limit), 250)
+        await ws.send_json({"event": "conf", "flags": self.WS_SEQ_ALL})
+        await ws.send_json(
+            {
+                "event": "subscribe",
+                "channel": "book",
+                "symbol": symbol,
+                "prec": "P0",
+                "len": str(length),
+            }
+        )
+
+        seq = None
+        async for message in self._wsMessages(ws):
+            if isinstance(message, dict):
+                if message.get("event") == "error":
+                    raise APIException("Error: " + message["msg"])
+                continue
+
+            if seq is not None and message[-1] != seq + 1:
+                raise DepthResyncException("Error: " + "depth sequence gap")
+            seq = message[-1]
+
+            data = message[1]
+            if data == "hb":
+                continue
+            # the snapshot is a list of levels, an update is a single level
+            levels = data if data and isinstance(data[0], list) else [data]
+            for price, count, amount in levels:
+                side = "bids" if amount > 0 else "asks"
+                book.update(side, float(price), abs(amount) if count > 0 else 0.0)
+
+            book.timestamp = int(datetime.datetime.now().timestamp())
+            yield
+
+    @measured
+    async def _loadWithdrawFees(self) -> dict[str, WithdrawFeeSchema]:
         URL = "https://coinmarketfees.com/exchange/{market}/page/{page}"
-        return parse_all_pages(
+        return await parse_all_pages(
             url=URL,
             market="bitfinex",
             pages=10,
+            session=self._getSession(),
         )
 
     async def getWithdrawFee(self, asset) -> WithdrawFeeSchema:
@@ -1,23 +1,45 @@
+import asyncio
 import time
-
-import aiohttp
+import zlib
 
 from schemas import (
+    DepthArray,
     DepthSchema,
     PriceSchema,
-    PriceVolumeSchema,
+    TickerSchema,
     WithdrawFeeSchema,
     WithdrawNetworkFeeSchema,
 )
-from .ApiTemplate import API, APIException
+from .ApiTemplate import (
+    API,
+    APIException,
+    DepthResyncException,
+    measured,
+    singleFlight,
+)
+from .SymbolRegistry import SymbolRegistry
 
 
 class BitgetAPI(API):
     API_URL = "https://api.bitget.com/api"
-
-    def __init__(self, api_key, api_secret):
-        self.api_key = api_key
-        self.api_secret = api_secret
+    WS_URL = "wss://ws.bitget.com/spot/v1/stream"
+    DEPTH_MAX = 150
+    # bitget drops connections that send no text "ping" for 30s
+    WS_PING_INTERVAL = 25
+
+    # 20 requests per second for each endpoint
+    RATE_LIMITS = {"default": (20, 1)}
+
+    def __init__(
+        self,
+        api_key,
+        api_secret,
+        session=None,
+        cache=None,
+        metrics=None,
+        transport=None,
+    ):
+        super().__init__(api_key, api_secret, session, cache, metrics, transport)
 
     @staticmethod
     def getApiName():
@@ -31,106 +53,182 @@ class BitgetAPI(API):
     def getSpotUrl(asset0, asset1):
         return f"https://www.bitget.com/spot/{asset0}{asset1}_SPBL?type=spot"
 
-    async def _request(self, method, url_path, params=None, data=None, headers={}):
-        async with aiohttp.ClientSession() as session:
-            async with session.request(
-                method,
-                BitgetAPI.API_URL + url_path,
-                params=params,
-                data=data,
-                headers=headers,
-                timeout=self.DEFAULT_TIMEOUT,
-                verify_ssl=False,
-            ) as response:
-                if response.status == 200:
-                    response_json = await response.json()
-                    return response_json["data"]
-                elif response.content_type == "application/json":
-                    response_json = await response.json()
-                    raise APIException("Error: " + response_json)
-                else:
-                    raise APIException("Error: " + "request error")
+    def _rateLimitBucket(self, method, path, params):
+        return path
 
+    async def _request(self, method, url_path, params=None, data=None, headers=None):
+        response = await self._send(
+            method,
+            BitgetAPI.API_URL + url_path,
+            params=params,
+            data=data,
+            headers=headers,
+        )
+        if response.status == 200:
+            return response.json()["data"]
+        elif response.content_type == "application/json":
+            raise APIException("Error: " + response.json())
+        else:
+            raise APIException("Error: " + "request error")
+
+    @measured
     async def getAssetList(self) -> list[list[str]]:
         url_path = "/spot/v1/public/products"
         request = await self._request("GET", url_path)
         return [[asset["baseCoin"], asset["quoteCoin"]] for asset in request]
 
+    @measured
+    async def _loadSymbols(self) -> SymbolRegistry:
+        # rest ids carry the _SPBL suffix, websocket ids do not; tickers may
+        # use either
+        url_path = "/spot/v1/public/products"
+        request = await self._request("GET", url_path)
+
+        symbols = SymbolRegistry(self.ASSET_ALIASES)
+        for asset in request:
+            pair = symbols.add(
+                asset["baseCoin"],
+                asset["quoteCoin"],
+                asset["symbol"],
+                ws=asset["symbolName"],
+            )
+            symbols.alias("ticker", asset["symbolName"], pair)
+        return symbols
+
+    @measured
     async def getAssetPrice(self, asset0, asset1) -> PriceSchema:
-        url_path = f"/spot/v1/market/ticker?symbol={asset0}{asset1}_SPBL"
+        symbols = (await self.getMetadata()).symbols
+        symbol = symbols.native(asset0, asset1) or f"{asset0}{asset1}_SPBL"
+        url_path = "/spot/v1/market/ticker?symbol=" + symbol
         request = await self._request("GET", url_path)
         return PriceSchema(
             bid=request["buyOne"],
             ask=request["sellOne"],
         )
 
-    async def getAssetsPrices(self) -> dict[str, PriceSchema]:
+    @singleFlight()
+    @measured
+    async def getTickerSnapshot(self) -> dict[str, TickerSchema]:
         url_path = "/spot/v1/market/tickers"
         request = await self._request("GET", url_path)
+        symbols = (await self.getMetadata()).symbols
         out = {}
 
         for asset in request:
-            out[asset["symbol"]] = PriceSchema(
-                bid=asset["buyOne"],
-                ask=asset["sellOne"],
+            assets = symbols.canonical(asset["symbol"])
+            if assets is None:
+                continue
+            out[assets] = TickerSchema.build(
+                bid=float(asset["buyOne"]),
+                ask=float(asset["sellOne"]),
+                volume=float(asset["baseVol"]),
             )
 
         return out
 
-    async def get24hVolumes(self) -> dict[str, float]:
-        url_path = "/spot/v1/market/tickers"
-        request = await self._request("GET", url_path)
-        out = {}
-
-        for asset in request:
-            out[asset["symbol"]] = asset["baseVol"]
-
-        return out
-
+    @measured
     async def get24hVolume(self, asset0, asset1) -> float:
-        url_path = f"/spot/v1/market/ticker?symbol={asset0}{asset1}_SPBL"
+        symbols = (await self.getMetadata()).symbols
+        symbol = symbols.native(asset0, asset1) or f"{asset0}{asset1}_SPBL"
+        url_path = "/spot/v1/market/ticker?symbol=" + symbol
         request = await self._request("GET", url_path)
         return request["baseVol"]
 
-    async def getDepth(self, asset0, asset1) -> DepthSchema:
+    @measured
+    async def getDepth(
+        self, asset0, asset1, asArray=False, depth=10
+    ) -> DepthSchema | DepthArray:
         url_path = "/spot/v1/market/depth"
+        symbols = (await self.getMetadata()).symbols
         params = {
-            "symbol": f"{asset0}{asset1}_SPBL",
+            "symbol": symbols.native(asset0, asset1) or f"{asset0}{asset1}_SPBL",
             "type": "step0",
-            "limit": 10,
+            "limit": self._depthLimit(depth),
         }
         response = await self._request("GET", url_path, params=params)
+        return self._depthFromRows(
+            response["asks"][:depth],
+            response["bids"][:depth],
+            int(time.time() * 1000),
+            asArray,
+        )
 
-        ds = DepthSchema(
-            asks=[
-                PriceVolumeSchema(price=ask[0], volume=ask[1])
-                for ask in response["asks"]
-            ],
-            bids=[
-                PriceVolumeSchema(price=bid[0], volume=bid[1])
-                for bid in response["bids"]
-            ],
-            timestamp=int(time.time() * 1000),
+    @staticmethod
+    def _bookChecksum(book, raw) -> int:
+        # signed crc32 over the top 25 levels, alternating bid and ask
+        bids = [raw["bids"][price] for price, _ in book.top("bids", 25)]
+        asks = [raw["asks"][price] for price, _ in book.top("asks", 25)]
+        parts = []
+        for i in range(max(len(bids), len(asks))):
+            if i < len(bids):
+                parts.extend(bids[i])
+            if i < len(asks):
+                parts.extend(asks[i])
+        checksum = zlib.crc32(":".join(parts).encode())
+        return checksum - (1 << 32) if checksum >= 1 << 31 else checksum
+
+    async def _ping(self, ws):
+        while True:
+            await asyncio.sleep(self.WS_PING_INTERVAL)
+            await ws.send_str("ping")
+
+    async def _depthUpdates(self, ws, book, asset0, asset1, limit):
+        symbols = (await self.getMetadata()).symbols
+        instId = symbols.native(asset0, asset1, "ws") or asset0 + asset1
+        await ws.send_json(
+            {
+                "op": "subscribe",
+                "args": [{"instType": "SP", "channel": "books", "instId": instId}],
+            }
         )
-        ds.sort()
 
-        return ds
+        ping = asyncio.ensure_future(self._ping(ws))
+        raw = {"asks": {}, "bids": {}}
+        try:
+            async for message in self._wsMessages(ws):
+                if message.get("event") == "error":
+                    raise APIException("Error: " + message["msg"])
+                if "action" not in message:
+                    continue
+
+                if message["action"] == "snapshot":
+                    book.clear()
+                    raw = {"asks": {}, "bids": {}}
+
+                for data in message["data"]:
+                    for side in ("asks", "bids"):
+                        for level in data[side]:
+                            price = float(level[0])
+                            book.update(side, price, float(level[1]))
+                            if price in getattr(book, side):
+                                raw[side][price] = (level[0], level[1])
+                            else:
+                                raw[side].pop(price, None)
+
+                    if data["checksum"] != self._bookChecksum(book, raw):
+                        raise DepthResyncException("Error: " + "book checksum mismatch")
+                    book.timestamp = int(data["ts"])
+
+                yield
+        finally:
+            ping.cancel()
 
     async def getWithdrawFee(self, asset) -> WithdrawFeeSchema:
         fees = await self.getWithdrawFees()
         return fees[asset]
 
-    async def getWithdrawFees(self) -> dict[str, WithdrawFeeSchema]:
+    @measured
+    async def _loadWithdrawFees(self) -> dict[str, WithdrawFeeSchema]:
         url_path = "/spot/v1/public/currencies"
         response = await self._request("GET", url_path)
 
         out = {}
         for asset in response:
-            wfs = WithdrawFeeSchema(
+            wfs = WithdrawFeeSchema.build(
                 deposit_enabled=True,
                 withdraw_enabled=True,
                 networks=[
-                    WithdrawNetworkFeeSchema(
+                    WithdrawNetworkFeeSchema.build(
                         network=network["chain"],
                         withdraw_fee=float(network["withdrawFee"])
                         + float(network["extraWithDrawFee"]),
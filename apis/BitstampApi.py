@@ -1,28 +1,46 @@
+import asyncio
 import datetime
 import hmac
 import sys
 import uuid
 
 from schemas import (
+    DepthArray,
     DepthSchema,
     PriceSchema,
-    PriceVolumeSchema,
+    TickerSchema,
     WithdrawFeeSchema,
     WithdrawNetworkFeeSchema,
 )
 
-from .ApiTemplate import API, APIException
-import aiohttp
+from .ApiTemplate import (
+    API,
+    APIException,
+    DepthResyncException,
+    measured,
+    singleFlight,
+)
+from .SymbolRegistry import SymbolRegistry
 import hashlib
 import time
 
 
 class BitstampAPI(API):
     API_URL = "https://www.bitstamp.net/api/v2"
-
-    def __init__(self, api_key, api_secret):
-        self.api_key = api_key
-        self.api_secret = api_secret
+    WS_URL = "wss://ws.bitstamp.net"
+
+    RATE_LIMITS = {"default": (400, 1)}
+
+    def __init__(
+        self,
+        api_key,
+        api_secret,
+        session=None,
+        cache=None,
+        metrics=None,
+        transport=None,
+    ):
+        super().__init__(api_key, api_secret, session, cache, metrics, transport)
 
     @staticmethod
     def getApiName():
@@ -70,8 +88,9 @@ class BitstampAPI(API):
         return signature
 
     async def _request(
-        self, method, url_path, params=None, data=None, headers={}, toSign=False
+        self, method, url_path, params=None, data=None, headers=None, toSign=False
     ):
+        headers = dict(headers or {})
         if toSign:
             signature = self._sign(params, self.api_key, self.api_secret)
             headers["X-Auth"] = "BITSTAMP " + self.api_key
@@ -81,25 +100,22 @@ class BitstampAPI(API):
             headers["X-Auth-Version"] = "v2"
             headers["Content-Type"] = "application/x-www-form-urlencoded"
 
-        async with aiohttp.ClientSession() as session:
-            async with session.request(
-                method,
-                BitstampAPI.API_URL + url_path,
-                params=params,
-                data=data,
-                headers=headers,
-                timeout=self.DEFAULT_TIMEOUT,
-                verify_ssl=False,
-            ) as response:
-                if response.status == 200:
-                    response_json = await response.json()
-                    return response_json
-                elif response.content_type == "application/json":
-                    response_json = await response.json()
-                    raise APIException("Error: " + response_json)
-                else:
-                    raise APIException("Error: " + "request error")
+        response = await self._send(
+            method,
+            BitstampAPI.API_URL + url_path,
+            params=params,
+            data=data,
+            headers=headers,
+            signed=toSign,
+        )
+        if response.status == 200:
+            return response.json()
+        elif response.content_type == "application/json":
+            raise APIException("Error: " + response.json())
+        else:
+            raise APIException("Error: " + "request error")
 
+    @measured
     async def getAssetList(self) -> list[list[str]]:
         url_path = "/trading-pairs-info/"
         response = await self._request("GET", url_path)
@@ -112,70 +128,131 @@ class BitstampAPI(API):
 
         return asset_list
 
-    async def getAssetPrice(self, asset0, asset1) -> PriceSchema:
-        url_path = "/ticker/" + asset0.lower() + asset1.lower()
-        response = await self._request("GET", url_path)
-        return PriceSchema(bid=float(response["bid"]), ask=float(response["ask"]))
-
-    async def getAssetsPrices(self) -> dict[str, PriceSchema]:
-        url_path = "/ticker/"
+    @measured
+    async def _loadSymbols(self) -> SymbolRegistry:
+        url_path = "/trading-pairs-info/"
         response = await self._request("GET", url_path)
-        out = {}
 
+        symbols = SymbolRegistry(self.ASSET_ALIASES)
         for asset in response:
-            out[asset["pair"]] = PriceSchema(
-                bid=float(asset["bid"]), ask=float(asset["ask"])
+            asset0, asset1 = asset["name"].split("/")
+            symbols.add(
+                asset0,
+                asset1,
+                asset["name"],
+                rest=asset["url_symbol"],
+                ws=asset["url_symbol"],
             )
+        return symbols
 
-        return out
+    async def _urlSymbol(self, asset0, asset1) -> str:
+        symbols = (await self.getMetadata()).symbols
+        return symbols.native(asset0, asset1, "rest") or asset0.lower() + asset1.lower()
 
-    async def get24hVolume(self, asset0, asset1) -> float:
-        url_path = "/ticker/" + asset0.lower() + asset1.lower()
+    @measured
+    async def getAssetPrice(self, asset0, asset1) -> PriceSchema:
+        url_path = "/ticker/" + await self._urlSymbol(asset0, asset1)
         response = await self._request("GET", url_path)
-        return float(response["volume"])
+        return PriceSchema(bid=float(response["bid"]), ask=float(response["ask"]))
 
-    async def get24hVolumes(self) -> dict[str, float]:
+    @singleFlight()
+    @measured
+    async def getTickerSnapshot(self) -> dict[str, TickerSchema]:
         url_path = "/ticker/"
         response = await self._request("GET", url_path)
+        symbols = (await self.getMetadata()).symbols
         out = {}
 
         for asset in response:
-            out[asset["pair"]] = float(asset["volume"])
+            assets = symbols.canonical(asset["pair"])
+            if assets is None:
+                continue
+            out[assets] = TickerSchema.build(
+                bid=float(asset["bid"]),
+                ask=float(asset["ask"]),
+                volume=float(asset["volume"]),
+            )
 
         return out
 
-    async def getDepth(self, asset0, asset1) -> DepthSchema:
-        url_path = "/order_book/" + asset0.lower() + asset1.lower()
+    @measured
+    async def get24hVolume(self, asset0, asset1) -> float:
+        url_path = "/ticker/" + await self._urlSymbol(asset0, asset1)
         response = await self._request("GET", url_path)
+        return float(response["volume"])
 
-        limit = 10
-
-        ds = DepthSchema(
-            asks=[
-                PriceVolumeSchema(price=float(i[0]), volume=float(i[1]))
-                for i in response["asks"][:limit]
-            ],
-            bids=[
-                PriceVolumeSchema(price=float(i[0]), volume=float(i[1]))
-                for i in response["bids"][:limit]
-            ],
-            timestamp=int(datetime.datetime.now().timestamp()),
+    @measured
+    async def getDepth(
+        self, asset0, asset1, asArray=False, depth=10
+    ) -> DepthSchema | DepthArray:
+        # there is no smaller REST book: the full one is fetched and cut,
+        # streamDepth keeps shallow books without refetching
+        url_path = "/order_book/" + await self._urlSymbol(asset0, asset1)
+        response = await self._request("GET", url_path)
+        return self._depthFromRows(
+            response["asks"][:depth],
+            response["bids"][:depth],
+            int(datetime.datetime.now().timestamp()),
+            asArray,
         )
-        ds.sort()
 
-        return ds
+    async def _depthUpdates(self, ws, book, asset0, asset1, limit):
+        pair = await self._urlSymbol(asset0, asset1)
+        await ws.send_json(
+            {"event": "bts:subscribe", "data": {"channel": "diff_order_book_" + pair}}
+        )
 
-    async def getWithdrawFees(self) -> dict[str, WithdrawFeeSchema]:
+        # diffs arriving while the snapshot downloads are buffered and replayed;
+        # bitstamp has no sequence numbers, so only ordering by microtimestamp
+        # and its reconnect requests are checked
+        snapshot = asyncio.ensure_future(self._request("GET", "/order_book/" + pair))
+        buffered = []
+        lastTimestamp = None
+        try:
+            async for event in self._wsMessages(ws):
+                if event["event"] == "bts:request_reconnect":
+                    raise DepthResyncException("Error: " + "reconnect requested")
+                if event["event"] != "data":
+                    continue
+
+                if lastTimestamp is None:
+                    buffered.append(event["data"])
+                    if not snapshot.done():
+                        continue
+                    response = snapshot.result()
+                    for side in ("bids", "asks"):
+                        for price, volume in response[side]:
+                            book.update(side, float(price), float(volume))
+                    lastTimestamp = int(response["microtimestamp"])
+                    diffs, buffered = buffered, []
+                else:
+                    diffs = [event["data"]]
+
+                for diff in diffs:
+                    if int(diff["microtimestamp"]) <= lastTimestamp:
+                        continue
+                    for side in ("bids", "asks"):
+                        for price, volume in diff[side]:
+                            book.update(side, float(price), float(volume))
+                    lastTimestamp = int(diff["microtimestamp"])
+
+                book.timestamp = lastTimestamp // 1000000
+                yield
+        finally:
+            snapshot.cancel()
+
+    @measured
+    async def _loadWithdrawFees(self) -> dict[str, WithdrawFeeSchema]:
         url_path = "/fees/withdrawal/"
         response = await self._request("POST", url_path, toSign=True)
         out = {}
 
         for asset in response:
-            wfs = WithdrawFeeSchema(
+            wfs = WithdrawFeeSchema.build(
                 deposit_enabled=True,
                 withdraw_enabled=True,
                 networks=[
-                    WithdrawNetworkFeeSchema(
+                    WithdrawNetworkFeeSchema.build(
                         network="",
                         withdraw_fee=float(asset["fee"]),
                         min_withdrawal=0.0,
@@ -189,15 +266,16 @@ class BitstampAPI(API):
 
         return out
 
+    @measured
     async def getWithdrawFee(self, asset) -> WithdrawFeeSchema:
         url_path = "/fees/withdrawal/" + asset.lower()
         response = await self._request("POST", url_path, toSign=True)
 
-        wfs = WithdrawFeeSchema(
+        wfs = WithdrawFeeSchema.build(
             deposit_enabled=True,
             withdraw_enabled=True,
             networks=[
-                WithdrawNetworkFeeSchema(
+                WithdrawNetworkFeeSchema.build(
                     network="",
                     withdraw_fee=float(response["fee"]),
                     min_withdrawal=0.0,
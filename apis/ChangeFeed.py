@@ -0,0 +1,118 @@
+import time
+
+import numpy as np
+
+FIELDS = ("bid", "ask", "volume")
+
+
+class ChangeEvent:
+    # the pairs of one snapshot that moved, columnar; volume is nan for
+    # PriceSchema snapshots. `full` marks an exchange's first snapshot,
+    # which lists every pair.
+    __slots__ = ("exchange", "timestamp", "full", "pairs", "values", "removed")
+
+    def __init__(self, exchange, timestamp, full, pairs, values, removed):
+        self.exchange = exchange
+        self.timestamp = timestamp
+        self.full = full
+        self.pairs = pairs
+        self.values = values  # (len(pairs), 3) bid, ask, volume
+        self.removed = removed  # pairs missing from the snapshot
+
+    def __len__(self):
+        return len(self.pairs) + len(self.removed)
+
+    def toDict(self) -> dict:
+        # for json: one list per field instead of an object per pair
+        event = {
+            "exchange": self.exchange,
+            "timestamp": self.timestamp,
+            "full": self.full,
+            "pairs": self.pairs,
+            "removed": self.removed,
+        }
+        for i, field in enumerate(FIELDS):
+            column = self.values[:, i]
+            if not np.isnan(column).all():
+                event[field] = column.tolist()
+        return event
+
+
+class _Snapshot:
+    # last emitted bid/ask/volume per pair of one exchange, rows in order of
+    # first appearance
+    def __init__(self):
+        self.names = []
+        self.rows = {}
+        self.values = np.full((0, 3), np.nan)
+        self.present = np.zeros(0, dtype=bool)
+
+    def row(self, pair) -> int:
+        i = self.rows.get(pair)
+        if i is None:
+            i = self.rows[pair] = len(self.names)
+            self.names.append(pair)
+        return i
+
+    def grow(self):
+        if len(self.names) > len(self.values):
+            size = max(len(self.names), 2 * len(self.values))
+            values = np.full((size, 3), np.nan)
+            values[: len(self.values)] = self.values
+            present = np.zeros(size, dtype=bool)
+            present[: len(self.present)] = self.present
+            self.values, self.present = values, present
+
+
+class ChangeFeed:
+    # turns consecutive getAssetsPrices / getTickerSnapshot results into
+    # ChangeEvents of the pairs whose bid, ask or volume moved by more than
+    # `epsilon`, relative to the value last emitted for it (0: any change).
+    # Comparing against the last emitted value keeps slow drift from hiding
+    # below epsilon forever.
+    def __init__(self, epsilon=0.0):
+        self.epsilon = epsilon
+        self._snapshots = {}  # exchange -> _Snapshot
+
+    def reset(self, exchange=None):
+        # the next snapshot is emitted in full
+        if exchange is None:
+            self._snapshots.clear()
+        else:
+            self._snapshots.pop(exchange, None)
+
+    def diff(self, exchange, snapshot, timestamp=None) -> ChangeEvent:
+        full = exchange not in self._snapshots
+        state = self._snapshots.setdefault(exchange, _Snapshot())
+        tickers = list(snapshot.values())
+        rows = np.fromiter(
+            (state.row(pair) for pair in snapshot), dtype=np.intp, count=len(tickers)
+        )
+        state.grow()
+
+        new = np.empty((len(tickers), 3))
+        new[:, 0] = [ticker.bid for ticker in tickers]
+        new[:, 1] = [ticker.ask for ticker in tickers]
+        new[:, 2] = [getattr(ticker, "volume", np.nan) for ticker in tickers]
+        old = state.values[rows]
+        with np.errstate(invalid="ignore"):
+            moved = np.abs(new - old) > self.epsilon * np.abs(old)
+        changed = (moved | (np.isnan(new) != np.isnan(old))).any(axis=1)
+        changed |= ~state.present[rows]
+
+        present = np.zeros(len(state.present), dtype=bool)
+        present[rows] = True
+        removed = np.flatnonzero(state.present & ~present)
+        state.present = present
+        rows, new = rows[changed], new[changed]
+        state.values[rows] = new
+
+        names = state.names
+        return ChangeEvent(
+            exchange,
+            time.time() if timestamp is None else timestamp,
+            full,
+            [names[i] for i in rows.tolist()],
+            new,
+            [names[i] for i in removed.tolist()],
+        )
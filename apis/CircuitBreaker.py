@@ -0,0 +1,57 @@
+import collections
+import time
+
+
+class CircuitBreaker:
+    # opens after `threshold` consecutive failures; once open, one probe is
+    # let through every `cooldown` seconds and its outcome closes or reopens it
+    def __init__(self, threshold, cooldown):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.openedAt = None
+        self.probedAt = 0.0
+
+    @property
+    def isOpen(self) -> bool:
+        return self.openedAt is not None
+
+    def ready(self) -> bool:
+        # whether allow() would let a call through, without taking the probe
+        if self.openedAt is None:
+            return True
+        return time.monotonic() - max(self.openedAt, self.probedAt) >= self.cooldown
+
+    def allow(self) -> bool:
+        if not self.ready():
+            return False
+        if self.openedAt is not None:
+            self.probedAt = time.monotonic()
+        return True
+
+    def success(self):
+        self.failures = 0
+        self.openedAt = None
+
+    def failure(self):
+        self.failures += 1
+        if self.openedAt is not None or self.failures >= self.threshold:
+            self.openedAt = time.monotonic()
+
+
+class LatencyWindow:
+    # the last `size` latencies of one endpoint, in seconds
+    MIN_SAMPLES = 20
+
+    def __init__(self, size=200):
+        self.samples = collections.deque(maxlen=size)
+
+    def add(self, seconds):
+        self.samples.append(seconds)
+
+    def quantile(self, q) -> float | None:
+        # None until there are enough samples to trust
+        if len(self.samples) < self.MIN_SAMPLES:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
@@ -0,0 +1,46 @@
+import json
+import os
+import tempfile
+import time
+
+from .ApiTemplate import loadJson
+
+
+def replaceFile(path, write):
+    # write(f) fills a temp file next to `path` that is then renamed over it,
+    # so readers never see a partial file, even if this process dies mid-write
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            write(f)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+class DiskCache:
+    # one json file per exchange and resource, {"time": unix seconds,
+    # "value": ...}; entries never expire here, callers decide what is stale
+    def __init__(self, directory):
+        self.directory = directory
+
+    def _path(self, exchange, resource) -> str:
+        return os.path.join(self.directory, exchange, resource + ".json")
+
+    def get(self, exchange, resource) -> tuple[object, float] | None:
+        # (value, time written), None when missing or unreadable
+        try:
+            with open(self._path(exchange, resource), "rb") as f:
+                entry = loadJson(f.read())
+            return entry["value"], entry["time"]
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+    def put(self, exchange, resource, value):
+        path = self._path(exchange, resource)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        data = json.dumps(
+            {"time": time.time(), "value": value}, separators=(",", ":")
+        ).encode()
+        replaceFile(path, lambda f: f.write(data))
@@ -0,0 +1,153 @@
+import numpy as np
+
+from .ApiTemplate import APIException
+from schemas import DepthArray
+
+
+def _levels(depth, side) -> np.ndarray:
+    if isinstance(depth, DepthArray):
+        return getattr(depth, side)
+    levels = getattr(depth, side)
+    if not levels:
+        return np.empty((0, 2), dtype=np.float64)
+    return np.array([(i.price, i.volume) for i in levels], dtype=np.float64)
+
+
+def _searchRows(rows, values, side="left") -> np.ndarray:
+    # np.searchsorted of each row of `values` (n, k) into the same row of the
+    # ascending `rows` (n, m), in one call: rows are laid end to end, each
+    # shifted past the range of the one before
+    n, m = rows.shape
+    low = min(rows.min(initial=0), values.min(initial=0))
+    span = max(rows.max(initial=0), values.max(initial=0)) - low + 1
+    shift = np.arange(n)[:, None] * span
+    found = np.searchsorted((rows - low + shift).ravel(), values - low + shift, side)
+    return found - np.arange(n)[:, None] * m
+
+
+class ExecutionCosts:
+    # fills of a grid of order sizes (columns) against many books (rows),
+    # sizes and volumes in `unit`: "quote" notional or "base" amount
+    __slots__ = (
+        "keys",
+        "rows",
+        "side",
+        "unit",
+        "sizes",
+        "bands",
+        "mid",
+        "vwap",
+        "slippage",
+        "filled",
+        "executable",
+        "maxSize",
+        "liquidity",
+    )
+
+    def __init__(self, keys, side, unit, sizes, bands, mid):
+        self.keys = keys
+        self.rows = {key: i for i, key in enumerate(keys)}
+        self.side = side
+        self.unit = unit
+        self.sizes = sizes
+        self.bands = bands
+        self.mid = mid  # nan when a side is empty
+
+    def row(self, key) -> dict:
+        i = self.rows[key]
+        return {
+            "vwap": self.vwap[i],
+            "slippage": self.slippage[i],
+            "filled": self.filled[i],
+            "executable": self.executable[i],
+            "maxSize": self.maxSize[i],
+            "liquidity": self.liquidity[i],
+        }
+
+
+def executionCosts(
+    books, sizes, side="buy", unit="quote", bands=(0.001, 0.005, 0.01)
+) -> ExecutionCosts:
+    # books: {key: DepthSchema | DepthArray} or a list of them, sorted best
+    # first as getDepth returns them. A buy walks the asks, a sell the bids.
+    # Per book and size: vwap fill price, slippage in bps against mid
+    # (positive is a cost), the size filled and whether the book covers it;
+    # per book: maxSize, the whole side, and liquidity within each band (a
+    # fraction of mid, 0.01 is 1%).
+    if side not in ("buy", "sell"):
+        raise APIException("Error: " + "side must be buy or sell")
+    if unit not in ("quote", "base"):
+        raise APIException("Error: " + "unit must be quote or base")
+    if isinstance(books, dict):
+        keys, books = list(books), list(books.values())
+    else:
+        keys, books = list(range(len(books))), list(books)
+    sizes = np.asarray(sizes, dtype=np.float64)
+    bands = np.asarray(bands, dtype=np.float64)
+    walk = "asks" if side == "buy" else "bids"
+    sign = 1 if side == "buy" else -1
+
+    # one (n, width) price and volume matrix for the walked side; short
+    # books are padded with their last price and no volume
+    levels = [_levels(book, walk) for book in books]
+    width = max((len(i) for i in levels), default=0) or 1
+    prices = np.zeros((len(books), width))
+    volumes = np.zeros((len(books), width))
+    mid = np.full(len(books), np.nan)
+    for i, (book, walked) in enumerate(zip(books, levels)):
+        if not len(walked):
+            continue
+        prices[i, : len(walked)] = walked[:, 0]
+        prices[i, len(walked) :] = walked[-1, 0]
+        volumes[i, : len(walked)] = walked[:, 1]
+        other = _levels(book, "bids" if side == "buy" else "asks")
+        if len(other):
+            mid[i] = (walked[0, 0] + other[0, 0]) / 2
+
+    notionals = prices * volumes
+    cumVolume = np.cumsum(volumes, axis=1)
+    cumNotional = np.cumsum(notionals, axis=1)
+    cumulative = cumNotional if unit == "quote" else cumVolume
+    total = cumulative[:, -1]
+
+    result = ExecutionCosts(keys, side, unit, sizes, bands, mid)
+    result.maxSize = total
+
+    # the level each size ends in and what the levels before it fill
+    grid = np.broadcast_to(sizes, (len(books), len(sizes)))
+    last = np.minimum(_searchRows(cumulative, grid), width - 1)
+    rows = np.arange(len(books))[:, None]
+    price = prices[rows, last]
+    beforeVolume = cumVolume[rows, last] - volumes[rows, last]
+    beforeNotional = cumNotional[rows, last] - notionals[rows, last]
+    executable = grid <= total[:, None]
+    if unit == "quote":
+        remaining = grid - beforeNotional
+        volume = beforeVolume + remaining / np.where(price > 0, price, np.inf)
+        notional = grid
+    else:
+        remaining = grid - beforeVolume
+        volume = grid
+        notional = beforeNotional + remaining * price
+    # sizes beyond the book fill all of it
+    volume = np.where(executable, volume, cumVolume[:, -1:])
+    notional = np.where(executable, notional, cumNotional[:, -1:])
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        result.vwap = np.where(volume > 0, notional / volume, np.nan)
+        result.slippage = sign * (result.vwap - mid[:, None]) / mid[:, None] * 1e4
+    result.filled = np.minimum(grid, total[:, None])
+    result.executable = executable
+
+    # levels priced within each band of mid, searched on an ascending scale
+    # (bid prices negated)
+    limits = sign * mid[:, None] * (1 + sign * bands)
+    known = np.isfinite(mid)
+    within = _searchRows(
+        sign * prices, np.where(known[:, None], limits, 0), side="right"
+    )
+    cumulativePadded = np.hstack([np.zeros((len(books), 1)), cumulative])
+    result.liquidity = np.where(
+        known[:, None], cumulativePadded[rows, np.minimum(within, width)], 0
+    )
+    return result
@@ -1,20 +1,50 @@
 import datetime
-from schemas import DepthSchema, PriceSchema, PriceVolumeSchema, WithdrawFeeSchema
-from .ApiTemplate import API, APIException
-import aiohttp
+from schemas import (
+    DepthArray,
+    DepthSchema,
+    TickerSchema,
+    WithdrawFeeSchema,
+)
+from .ApiTemplate import (
+    API,
+    APIException,
+    DepthResyncException,
+    measured,
+    singleFlight,
+)
+from .SymbolRegistry import SymbolRegistry
 import hashlib
 import hmac
 import time
 import urllib.parse
 import base64
+import zlib
 from .utils import parse_all_pages
 
 
 class KrakenAPI(API):
     API_URL = "https://api.kraken.com"
-
-    def __init__(self, api_key: str, api_secret: str):
-        super().__init__(api_key, api_secret)
+    WS_URL = "wss://ws.kraken.com"
+
+    # about one public call per second with a small burst; private calls
+    # share a counter of 15 that decays by 0.33 per second
+    RATE_LIMITS = {"default": (3, 3), "private": (15, 45)}
+    ASSET_ALIASES = {"XBT": "BTC", "XDG": "DOGE"}
+    DEPTH_MAX = 500
+    WS_BOOK_DEPTHS = (10, 25, 100, 500, 1000)
+    # snapshot keys first, then update keys
+    WS_BOOK_KEYS = (("as", "asks"), ("bs", "bids"), ("a", "asks"), ("b", "bids"))
+
+    def __init__(
+        self,
+        api_key: str,
+        api_secret: str,
+        session=None,
+        cache=None,
+        metrics=None,
+        transport=None,
+    ):
+        super().__init__(api_key, api_secret, session, cache, metrics, transport)
 
     @staticmethod
     def getApiName():
@@ -38,33 +68,35 @@ class KrakenAPI(API):
         sigdigest = base64.b64encode(mac.digest())
         return sigdigest.decode()
 
+    def _rateLimitBucket(self, method, path, params):
+        return "private" if path.startswith("/0/private/") else "default"
+
     async def _request(
-        self, method, url_path, params={}, data={}, headers={}, toSign=False
+        self, method, url_path, params=None, data=None, headers=None, toSign=False
     ):
+        headers = dict(headers or {})
         if toSign:
+            data = dict(data or {})
             data["nonce"] = str(int(time.time() * 1000))
             headers["API-Key"] = (self.api_key,)
             headers["API-Sign"] = self._sign(url_path, data, self.api_secret)
 
-        async with aiohttp.ClientSession() as session:
-            async with session.request(
-                method,
-                KrakenAPI.API_URL + url_path,
-                params=params,
-                data=data,
-                headers=headers,
-                timeout=self.DEFAULT_TIMEOUT,
-                verify_ssl=False,
-            ) as response:
-                if response.status == 200:
-                    response_json = await response.json()
-                    return response_json["result"]
-                elif response.content_type == "application/json":
-                    response_json = await response.json()
-                    raise APIException("Error: " + response_json["error"])
-                else:
-                    raise APIException("Error: " + "request error")
-
+        response = await self._send(
+            method,
+            KrakenAPI.API_URL + url_path,
+            params=params,
+            data=data,
+            headers=headers,
+            signed=toSign,
+        )
+        if response.status == 200:
+            return response.json()["result"]
+        elif response.content_type == "application/json":
+            raise APIException("Error: " + response.json()["error"])
+        else:
+            raise APIException("Error: " + "request error")
+
+    @measured
     async def getAssetList(self) -> list[list[str]]:
         url_path = "/0/public/AssetPairs"
         response = await self._request("GET", url_path)
@@ -74,77 +106,122 @@ class KrakenAPI(API):
 
         return keys
 
-    async def getAssetsPrices(self) -> dict[str, PriceSchema]:
-        url_path = "/0/public/Ticker"
+    @measured
+    async def _loadSymbols(self) -> SymbolRegistry:
+        # ticker results are keyed like XXBTZUSD, depth takes the altname
+        # XBTUSD and the websocket the wsname XBT/USD
+        url_path = "/0/public/AssetPairs"
         response = await self._request("GET", url_path)
 
-        assets = await self.getAssetList()
-        out = {}
-
-        for asset0, asset1 in assets:
-            symbol = asset0 + asset1
-            assets = asset0 + "/" + asset1
-            if symbol not in response:
+        symbols = SymbolRegistry(self.ASSET_ALIASES)
+        for key, pair in response.items():
+            if "wsname" not in pair:
                 continue
+            asset0, asset1 = pair["wsname"].split("/")
+            symbols.add(asset0, asset1, key, rest=pair["altname"], ws=pair["wsname"])
+        return symbols
 
-            element = response[symbol]
-
-            out[assets] = PriceSchema(
-                ask=float(element["a"][0]), bid=float(element["b"][0])
-            )
-
-        return out
-
-    async def get24hVolumes(self) -> dict[str, float]:
+    @singleFlight()
+    @measured
+    async def getTickerSnapshot(self) -> dict[str, TickerSchema]:
         url_path = "/0/public/Ticker"
         response = await self._request("GET", url_path)
 
-        assets = await self.getAssetList()
+        symbols = (await self.getMetadata()).symbols
         out = {}
 
-        for asset0, asset1 in assets:
-            symbol = asset0 + asset1
-            assets = asset0 + "/" + asset1
-            if symbol not in response:
+        for symbol, element in response.items():
+            assets = symbols.canonical(symbol)
+            if assets is None:
                 continue
 
-            element = response[symbol]
-            out[assets] = float(element["v"][1])
+            out[assets] = TickerSchema.build(
+                bid=float(element["b"][0]),
+                ask=float(element["a"][0]),
+                volume=float(element["v"][1]),
+            )
 
         return out
 
-    async def getDepth(self, asset0, asset1) -> DepthSchema:
+    @measured
+    async def getDepth(
+        self, asset0, asset1, asArray=False, depth=10
+    ) -> DepthSchema | DepthArray:
         url_path = "/0/public/Depth"
 
+        symbols = (await self.getMetadata()).symbols
         params = {
-            "pair": asset0 + asset1,
-            "count": 10,
+            "pair": symbols.native(asset0, asset1, "rest") or asset0 + asset1,
+            "count": self._depthLimit(depth),
         }
 
         response = await self._request("GET", url_path, params=params)
         response = response.popitem()[1]
+        return self._depthFromRows(
+            response["asks"][:depth],
+            response["bids"][:depth],
+            int(datetime.datetime.now().timestamp()),
+            asArray,
+        )
 
-        ds = DepthSchema(
-            asks=[
-                PriceVolumeSchema(price=float(i[0]), volume=float(i[1]))
-                for i in response["asks"]
-            ],
-            bids=[
-                PriceVolumeSchema(price=float(i[0]), volume=float(i[1]))
-                for i in response["bids"]
-            ],
-            timestamp=int(datetime.datetime.now().timestamp()),
+    @staticmethod
+    def _bookChecksum(book, raw) -> int:
+        # crc32 over the top 10 asks then bids, as the original price/volume
+        # strings without the decimal point and leading zeros
+        parts = []
+        for side in ("asks", "bids"):
+            for price, _ in book.top(side, 10):
+                for value in raw[side][price]:
+                    parts.append(value.replace(".", "").lstrip("0"))
+        return zlib.crc32("".join(parts).encode())
+
+    async def _depthUpdates(self, ws, book, asset0, asset1, limit):
+        depth = next((d for d in self.WS_BOOK_DEPTHS if d >= limit), 1000)
+        symbols = (await self.getMetadata()).symbols
+        await ws.send_json(
+            {
+                "event": "subscribe",
+                "pair": [symbols.native(asset0, asset1, "ws") or asset0 + "/" + asset1],
+                "subscription": {"name": "book", "depth": depth},
+            }
         )
-        ds.sort()
 
-        return ds
+        raw = {"asks": {}, "bids": {}}
+        async for message in self._wsMessages(ws):
+            if isinstance(message, dict):
+                if message.get("status") == "error":
+                    raise APIException("Error: " + message["errorMessage"])
+                continue
 
-    async def getWithdrawFees(self) -> dict[str, WithdrawFeeSchema]:
+            checksum = None
+            for payload in message[1:-2]:
+                for key, side in self.WS_BOOK_KEYS:
+                    for level in payload.get(key, ()):
+                        price = float(level[0])
+                        book.update(side, price, float(level[1]))
+                        raw[side][price] = (level[0], level[1])
+                checksum = payload.get("c", checksum)
+
+            # levels beyond the subscribed depth are dropped silently
+            for side in ("asks", "bids"):
+                book.truncate(side, depth)
+                for price in raw[side].keys() - getattr(book, side).keys():
+                    del raw[side][price]
+
+            if checksum is not None and int(checksum) != self._bookChecksum(book, raw):
+                raise DepthResyncException("Error: " + "book checksum mismatch")
+
+            book.timestamp = int(datetime.datetime.now().timestamp())
+            yield
+
+    @measured
+    async def _loadWithdrawFees(self) -> dict[str, WithdrawFeeSchema]:
         URL = "https://coinmarketfees.com/exchange/{market}/page/{page}"
-        return parse_all_pages(
+        return await parse_all_pages(
             url=URL,
             market="kraken",
             pages=10,
+            session=self._getSession(),
         )
 
     async def getWithdrawFee(self, asset) -> WithdrawFeeSchema:
@@ -0,0 +1,183 @@
+import bisect
+import math
+import time
+import weakref
+
+import aiohttp
+
+# histogram upper bounds in seconds, +Inf is implied
+BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1, 2.5, 5, 10,
+)  # fmt: skip
+
+
+class Histogram:
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(BUCKETS, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self) -> list[int]:
+        out, total = [], 0
+        for count in self.counts:
+            total += count
+            out.append(total)
+        return out
+
+
+async def _connectStart(session, context, params):
+    if context.trace_request_ctx is not None:
+        context.trace_request_ctx["connectStart"] = time.perf_counter()
+
+
+async def _connectEnd(session, context, params):
+    timings = context.trace_request_ctx
+    if timings is not None and "connectStart" in timings:
+        timings["connect"] = time.perf_counter() - timings["connectStart"]
+
+
+def _labels(**labels) -> str:
+    return ",".join(
+        '{}="{}"'.format(
+            name,
+            str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"),
+        )
+        for name, value in labels.items()
+    )
+
+
+class Metrics:
+    # per exchange/endpoint counters and phase histograms, shared by any
+    # number of api instances. The endpoint is the url path for network and
+    # decode phases and the adapter method name for "build".
+    def __init__(self):
+        self.requests = {}  # (exchange, endpoint, status) -> count
+        self.bytes = {}  # (exchange, endpoint) -> response body bytes
+        self.latency = {}  # (exchange, endpoint, phase) -> Histogram
+        self.refreshErrors = {}  # (exchange, resource) -> count
+        self._apis = weakref.WeakSet()
+
+    def register(self, api):
+        # rate limit headroom and breaker state are read from registered
+        # apis when metrics are pulled
+        self._apis.add(api)
+
+    @staticmethod
+    def traceConfig() -> aiohttp.TraceConfig:
+        # times new connections (dns, tcp, tls) for requests passing a dict
+        # as trace_request_ctx; reused keep-alive connections have none
+        config = aiohttp.TraceConfig()
+        config.on_connection_create_start.append(_connectStart)
+        config.on_connection_create_end.append(_connectEnd)
+        return config
+
+    def recordResponse(self, exchange, endpoint, status, size):
+        # status is "error" when no response arrived
+        key = (exchange, endpoint, status)
+        self.requests[key] = self.requests.get(key, 0) + 1
+        key = (exchange, endpoint)
+        self.bytes[key] = self.bytes.get(key, 0) + size
+
+    def recordRefreshError(self, exchange, resource):
+        # a failed background refresh of metadata or withdrawal fees
+        key = (exchange, resource)
+        self.refreshErrors[key] = self.refreshErrors.get(key, 0) + 1
+
+    def observe(self, exchange, endpoint, phase, seconds):
+        key = (exchange, endpoint, phase)
+        histogram = self.latency.get(key)
+        if histogram is None:
+            histogram = self.latency[key] = Histogram()
+        histogram.observe(seconds)
+
+    def snapshot(self) -> dict:
+        # copies, safe to keep while requests go on
+        return {
+            "requests": dict(self.requests),
+            "bytes": dict(self.bytes),
+            "refreshErrors": dict(self.refreshErrors),
+            "latency": {
+                key: {
+                    "count": histogram.count,
+                    "sum": histogram.sum,
+                    "buckets": dict(zip(BUCKETS + (math.inf,), histogram.cumulative())),
+                }
+                for key, histogram in self.latency.items()
+            },
+            "headroom": {
+                (api.getApiName(), bucket): headroom
+                for api in list(self._apis)
+                for bucket, headroom in api.rateLimitHeadroom().items()
+            },
+            "operational": {
+                api.getApiName(): api.OPERATIONAL for api in list(self._apis)
+            },
+        }
+
+    def toPrometheus(self) -> str:
+        snapshot = self.snapshot()
+        lines = [
+            "# HELP apis_requests_total Responses by status, error when none arrived.",
+            "# TYPE apis_requests_total counter",
+        ]
+        for (exchange, endpoint, status), count in snapshot["requests"].items():
+            labels = _labels(exchange=exchange, endpoint=endpoint, status=status)
+            lines.append("apis_requests_total{%s} %d" % (labels, count))
+
+        lines += [
+            "# HELP apis_response_bytes_total Response body bytes.",
+            "# TYPE apis_response_bytes_total counter",
+        ]
+        for (exchange, endpoint), size in snapshot["bytes"].items():
+            labels = _labels(exchange=exchange, endpoint=endpoint)
+            lines.append("apis_response_bytes_total{%s} %d" % (labels, size))
+
+        lines += [
+            "# HELP apis_refresh_errors_total Failed background refreshes.",
+            "# TYPE apis_refresh_errors_total counter",
+        ]
+        for (exchange, resource), count in snapshot["refreshErrors"].items():
+            labels = _labels(exchange=exchange, resource=resource)
+            lines.append("apis_refresh_errors_total{%s} %d" % (labels, count))
+
+        lines += [
+            "# HELP apis_phase_seconds Request phase latency.",
+            "# TYPE apis_phase_seconds histogram",
+        ]
+        for (exchange, endpoint, phase), histogram in snapshot["latency"].items():
+            labels = _labels(exchange=exchange, endpoint=endpoint, phase=phase)
+            for bound, count in histogram["buckets"].items():
+                le = "+Inf" if bound == math.inf else repr(float(bound))
+                lines.append(
+                    'apis_phase_seconds_bucket{%s,le="%s"} %d' % (labels, le, count)
+                )
+            lines.append("apis_phase_seconds_sum{%s} %r" % (labels, histogram["sum"]))
+            lines.append(
+                "apis_phase_seconds_count{%s} %d" % (labels, histogram["count"])
+            )
+
+        lines += [
+            "# HELP apis_rate_limit_headroom Share of a rate limit bucket available.",
+            "# TYPE apis_rate_limit_headroom gauge",
+        ]
+        for (exchange, bucket), headroom in snapshot["headroom"].items():
+            labels = _labels(exchange=exchange, bucket=bucket)
+            lines.append("apis_rate_limit_headroom{%s} %r" % (labels, headroom))
+
+        lines += [
+            "# HELP apis_operational 0 while the exchange circuit breaker is open.",
+            "# TYPE apis_operational gauge",
+        ]
+        for exchange, operational in snapshot["operational"].items():
+            lines.append(
+                "apis_operational{%s} %d" % (_labels(exchange=exchange), operational)
+            )
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,249 @@
+import asyncio
+import struct
+import sys
+import time
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+from .Aggregator import defaultCanonical
+from .ApiTemplate import APIException
+from .Scheduler import Scheduler
+
+# a table is a header, `capacity` row names ("exchange:pair", utf-8) and
+# `capacity` cache-line sized rows; rows are handed out in order and never
+# move, so a reader only looks up names it has not seen yet
+MAGIC = b"PRICETB1"
+HEADER = struct.Struct("<8sI")  # magic, capacity; named row count follows
+HEADER_SIZE = 64
+NAME_SIZE = 64
+ROW = np.dtype(
+    {
+        "names": ["seq", "bid", "ask", "volume", "time"],
+        "formats": ["<u8", "<f8", "<f8", "<f8", "<f8"],
+        "itemsize": 64,
+    }
+)
+
+
+def _views(buffer, capacity) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    count = np.ndarray(1, "<u4", buffer, HEADER.size)
+    names = np.ndarray(capacity, "S%d" % NAME_SIZE, buffer, HEADER_SIZE)
+    rows = np.ndarray(capacity, ROW, buffer, HEADER_SIZE + capacity * NAME_SIZE)
+    return count, names, rows
+
+
+def _attach(name) -> shared_memory.SharedMemory:
+    # a reader must not register the segment with its resource tracker: that
+    # would unlink it at exit under the writer, and unregistering afterwards
+    # drops the writer's own entry when both share a tracker (one parent)
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+    register = resource_tracker.register
+    resource_tracker.register = lambda name, rtype: None
+    try:
+        return shared_memory.SharedMemory(name=name)
+    finally:
+        resource_tracker.register = register
+
+
+def _name(exchange, pair) -> bytes:
+    name = (exchange + ":" + pair).encode()
+    if len(name) > NAME_SIZE:
+        raise APIException("Error: " + "row name too long: " + name.decode())
+    return name
+
+
+class PriceTableWriter:
+    # the one process updating a table. Each row is guarded by a seqlock:
+    # its sequence number is odd while the row is being written and bumped
+    # again after, so readers retry torn reads instead of taking a lock.
+    # This relies on stores becoming visible in program order, as on x86.
+    def __init__(self, name, capacity=8192):
+        self._shm = shared_memory.SharedMemory(
+            name=name,
+            create=True,
+            size=HEADER_SIZE + capacity * (NAME_SIZE + ROW.itemsize),
+        )
+        HEADER.pack_into(self._shm.buf, 0, MAGIC, capacity)
+        self.capacity = capacity
+        self._count, self._names, self.rows = _views(self._shm.buf, capacity)
+        self._rowIds = {}  # name -> row
+
+    def _row(self, exchange, pair) -> int:
+        name = _name(exchange, pair)
+        i = self._rowIds.get(name)
+        if i is None:
+            i = len(self._rowIds)
+            if i == self.capacity:
+                raise APIException("Error: " + "price table is full")
+            # the name is in place before readers count the row
+            self._names[i] = name
+            self._count[0] = i + 1
+            self._rowIds[name] = i
+        return i
+
+    def publish(self, exchange, tickers, timestamp=None):
+        # tickers: pair -> PriceSchema or TickerSchema (volume nan without)
+        if not tickers:
+            return
+        values = list(tickers.values())
+        rows = np.fromiter(
+            (self._row(exchange, pair) for pair in tickers),
+            dtype=np.intp,
+            count=len(values),
+        )
+        # gathered up front so rows are only odd for the stores themselves
+        bids = np.fromiter((ticker.bid for ticker in values), np.float64, len(values))
+        asks = np.fromiter((ticker.ask for ticker in values), np.float64, len(values))
+        volumes = np.fromiter(
+            (getattr(ticker, "volume", np.nan) for ticker in values),
+            np.float64,
+            len(values),
+        )
+        written = time.time() if timestamp is None else timestamp
+        seq = self.rows["seq"]
+        seq[rows] += 1
+        self.rows["bid"][rows] = bids
+        self.rows["ask"][rows] = asks
+        self.rows["volume"][rows] = volumes
+        self.rows["time"][rows] = written
+        seq[rows] += 1
+
+    def close(self):
+        # readers keep their mapping; the name is gone for new ones
+        del self._count, self._names, self.rows
+        self._shm.close()
+        self._shm.unlink()
+
+
+class PriceTableReader:
+    # zero-copy reads of a table published by another process; a read caught
+    # mid-write is retried, pausing RETRY_PAUSE between tries, for up to
+    # RETRY_SECONDS
+    RETRY_SECONDS = 0.1
+    RETRY_PAUSE = 0.00005
+
+    def __init__(self, name):
+        self._shm = _attach(name)
+        magic, self.capacity = HEADER.unpack_from(self._shm.buf, 0)
+        if magic != MAGIC:
+            self._shm.close()
+            raise APIException("Error: " + name + " is not a price table")
+        self._count, self._names, self.rows = _views(self._shm.buf, self.capacity)
+        self._seq = self.rows["seq"]
+        self._bid = self.rows["bid"]
+        self._ask = self.rows["ask"]
+        self._volume = self.rows["volume"]
+        self._time = self.rows["time"]
+        self.keys = []  # (exchange, pair) by row
+        self._rowIds = {}
+
+    def _refresh(self):
+        for i in range(len(self.keys), int(self._count[0])):
+            exchange, pair = self._names[i].decode().split(":", 1)
+            self._rowIds[exchange, pair] = i
+            self.keys.append((exchange, pair))
+
+    def row(self, exchange, pair) -> int | None:
+        i = self._rowIds.get((exchange, pair))
+        if i is None:
+            self._refresh()
+            i = self._rowIds.get((exchange, pair))
+        return i
+
+    def get(self, exchange, pair) -> tuple[float, float, float, float] | None:
+        # (bid, ask, volume, unix time written) of one row, None if unknown
+        i = self.row(exchange, pair)
+        if i is None:
+            return None
+        seq = self._seq
+        deadline = None
+        while True:
+            before = seq[i]
+            if not before & 1:
+                quote = (
+                    float(self._bid[i]),
+                    float(self._ask[i]),
+                    float(self._volume[i]),
+                    float(self._time[i]),
+                )
+                if seq[i] == before:
+                    return quote
+            deadline = self._retry(deadline)
+
+    def snapshot(self) -> tuple[list[tuple[str, str]], np.ndarray]:
+        # (keys, (n, 4) bid/ask/volume/time) of every row, each row
+        # consistent; rows caught mid-write are read again
+        self._refresh()
+        n = len(self.keys)
+        values = np.empty((n, 4))
+        pending = np.arange(n)
+        deadline = None
+        while True:
+            before = self._seq[pending]
+            values[pending, 0] = self._bid[pending]
+            values[pending, 1] = self._ask[pending]
+            values[pending, 2] = self._volume[pending]
+            values[pending, 3] = self._time[pending]
+            torn = (before & 1).astype(bool) | (self._seq[pending] != before)
+            pending = pending[torn]
+            if not len(pending):
+                return self.keys[:n], values
+            deadline = self._retry(deadline)
+
+    def _retry(self, deadline) -> float:
+        # pauses before another read, giving the writer the cpu to finish
+        now = time.monotonic()
+        if deadline is None:
+            deadline = now + self.RETRY_SECONDS
+        elif now > deadline:
+            raise APIException("Error: " + "price table rows kept changing")
+        time.sleep(self.RETRY_PAUSE)
+        return deadline
+
+    def close(self):
+        del self._count, self._names, self.rows
+        del self._seq, self._bid, self._ask, self._volume, self._time
+        self._shm.close()
+
+
+class PricePublisher:
+    # polls getTickerSnapshot of every api through a Scheduler and writes it
+    # under canonical pair names to a shared price table, so workers read
+    # quotes from memory instead of each polling the exchanges
+    def __init__(
+        self, apis, name, interval=1, capacity=8192, canonical=defaultCanonical
+    ):
+        self.apis = list(apis)
+        self.interval = interval
+        self.canonical = canonical
+        self.table = PriceTableWriter(name, capacity)
+
+    async def _forward(self, api, subscription):
+        exchange = api.getApiName()
+        async for snapshot in subscription:
+            tickers = {}
+            for pair, ticker in snapshot.items():
+                key = self.canonical(exchange, pair)
+                if key is not None:
+                    tickers[key] = ticker
+            self.table.publish(exchange, tickers)
+
+    async def run(self):
+        # until cancelled; the table stays up until close()
+        async with Scheduler() as scheduler:
+            await asyncio.gather(
+                *[
+                    self._forward(
+                        api,
+                        scheduler.subscribe(
+                            api, "getTickerSnapshot", interval=self.interval
+                        ),
+                    )
+                    for api in self.apis
+                ]
+            )
+
+    def close(self):
+        self.table.close()
@@ -0,0 +1,49 @@
+import asyncio
+import time
+
+
+class RateLimiter:
+    # token bucket of `capacity` weight refilled evenly over `period` seconds;
+    # acquire() queues callers in order until their weight is available
+    def __init__(self, capacity, period):
+        self.capacity = capacity
+        self.rate = capacity / period
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.pausedUntil = 0.0
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        # nothing accrues while paused
+        elapsed = now - max(self.updated, self.pausedUntil)
+        if elapsed > 0:
+            self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+        self.updated = now
+
+    async def acquire(self, weight=1):
+        weight = min(weight, self.capacity)
+        async with self._lock:
+            while True:
+                self._refill()
+                wait = self.pausedUntil - self.updated
+                if wait <= 0:
+                    if self.tokens >= weight:
+                        self.tokens -= weight
+                        return
+                    wait = (weight - self.tokens) / self.rate
+                await asyncio.sleep(wait)
+
+    def sync(self, used):
+        # trust the server's count of weight used in the current window
+        self._refill()
+        self.tokens = min(self.tokens, self.capacity - used)
+
+    def pause(self, seconds):
+        self.pausedUntil = max(self.pausedUntil, time.monotonic() + seconds)
+        self.tokens = 0
+
+    @property
+    def headroom(self) -> float:
+        self._refill()
+        return max(self.tokens, 0) / self.capacity
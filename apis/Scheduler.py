@@ -0,0 +1,167 @@
+import asyncio
+import random
+
+from .ApiTemplate import API, APIException
+
+
+class PollJob:
+    # one (api, method, args) polled every `interval` seconds for all its
+    # subscribers; identical registrations share it
+    __slots__ = (
+        "api",
+        "method",
+        "args",
+        "interval",
+        "owners",
+        "subscribers",
+        "task",
+        "fetch",
+        "result",
+        "error",
+        "runs",
+        "skipped",
+    )
+
+    def __init__(self, api, method, args, interval):
+        self.api = api
+        self.method = method
+        self.args = args
+        self.interval = interval
+        self.owners = 0  # add() calls and open subscriptions
+        self.subscribers = []
+        self.task = None
+        self.fetch = None
+        self.result = None  # latest result, None until the first success
+        self.error = None  # exception of the latest failed fetch
+        self.runs = 0
+        self.skipped = 0  # ticks skipped while busy or out of budget
+
+
+class Subscription:
+    # async iterator over a job's results; a slow consumer only ever sees
+    # the newest `maxsize` of them
+    def __init__(self, scheduler, job, maxsize):
+        self._scheduler = scheduler
+        self.job = job
+        self.queue = asyncio.Queue(maxsize)
+        if job.result is not None:
+            self.queue.put_nowait(job.result)
+
+    def publish(self, result):
+        if self.queue.full():
+            self.queue.get_nowait()
+        self.queue.put_nowait(result)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        return await self.queue.get()
+
+    def close(self):
+        if self in self.job.subscribers:
+            self.job.subscribers.remove(self)
+            self._scheduler._release(self.job)
+
+
+class Scheduler:
+    # polls registered api calls on a fixed grid, each tick moved by up to
+    # JITTER of the interval and each job started at a random phase so jobs
+    # sharing an interval don't fire together. A tick is skipped while the
+    # previous fetch still runs or while any of the api's rate limit buckets
+    # has less than MIN_HEADROOM left, leaving it to on-demand requests.
+    JITTER = 0.1
+    MIN_HEADROOM = 0.2
+
+    def __init__(self):
+        self._jobs = {}  # (api, method, args) -> PollJob
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    def add(self, api: API, method, *args, interval) -> PollJob:
+        # registering a job again keeps one fetch at the shortest interval;
+        # each add() needs a matching remove()
+        if not callable(getattr(api, method, None)):
+            raise APIException(
+                "Error: " + api.getApiName() + " has no method " + method
+            )
+        key = (api, method, args)
+        job = self._jobs.get(key)
+        if job is None:
+            job = self._jobs[key] = PollJob(api, method, args, interval)
+            job.task = asyncio.get_running_loop().create_task(self._run(job))
+        job.interval = min(job.interval, interval)
+        job.owners += 1
+        return job
+
+    def remove(self, api: API, method, *args):
+        job = self._jobs.get((api, method, args))
+        if job is not None:
+            self._release(job)
+
+    def subscribe(self, api: API, method, *args, interval, maxsize=1) -> Subscription:
+        # the latest result, if any, is delivered first
+        job = self.add(api, method, *args, interval=interval)
+        subscription = Subscription(self, job, maxsize)
+        job.subscribers.append(subscription)
+        return subscription
+
+    def jobs(self) -> list[PollJob]:
+        return list(self._jobs.values())
+
+    def _release(self, job):
+        job.owners -= 1
+        if job.owners <= 0:
+            self._jobs.pop((job.api, job.method, job.args), None)
+            job.task.cancel()
+            if job.fetch is not None:
+                job.fetch.cancel()
+
+    def _busy(self, job) -> bool:
+        if job.fetch is not None and not job.fetch.done():
+            return True
+        return min(job.api.rateLimitHeadroom().values(), default=1) < self.MIN_HEADROOM
+
+    async def _run(self, job):
+        loop = asyncio.get_running_loop()
+        await asyncio.sleep(random.uniform(0, job.interval))
+        due = loop.time()
+        while True:
+            if self._busy(job):
+                job.skipped += 1
+            else:
+                job.fetch = loop.create_task(self._poll(job))
+            # the grid, not the previous wake-up, sets the next tick, so
+            # jitter and slow wake-ups don't add up to drift
+            due += job.interval
+            if due < loop.time():
+                due = loop.time()
+            jitter = random.uniform(-self.JITTER, self.JITTER) * job.interval
+            await asyncio.sleep(max(0, due - loop.time() + jitter))
+
+    async def _poll(self, job):
+        job.runs += 1
+        try:
+            result = await getattr(job.api, job.method)(*job.args)
+        except (APIException, Exception) as e:
+            job.error = e
+            return
+        job.result, job.error = result, None
+        for subscription in job.subscribers:
+            subscription.publish(result)
+
+    async def close(self):
+        tasks = []
+        for job in list(self._jobs.values()):
+            tasks.append(job.task)
+            if job.fetch is not None:
+                tasks.append(job.fetch)
+            job.task.cancel()
+            if job.fetch is not None:
+                job.fetch.cancel()
+        self._jobs.clear()
+        await asyncio.gather(*tasks, return_exceptions=True)
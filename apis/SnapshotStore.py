@@ -0,0 +1,234 @@
+import json
+import os
+import time
+
+import numpy as np
+
+from .ApiTemplate import APIException
+from .DiskCache import replaceFile
+from schemas import DepthArray
+
+# a store is a directory of .npy chunks, one structured array per kind and
+# exchange with rows in time order, and index.json listing the chunks and
+# each exchange's pair names (rows hold the pair's position in that list)
+INDEX = "index.json"
+KINDS = ("prices", "volumes", "depth")
+
+
+def snapshotDtype(kind, depthLevels) -> np.dtype:
+    # time is unix seconds; depth levels are [price, volume] rows, best first
+    # and nan padded
+    fields = [("time", "<f8"), ("pair", "<u4")]
+    if kind == "prices":
+        fields += [("bid", "<f8"), ("ask", "<f8")]
+    elif kind == "volumes":
+        fields += [("volume", "<f8")]
+    else:
+        fields += [
+            ("asks", "<f8", (depthLevels, 2)),
+            ("bids", "<f8", (depthLevels, 2)),
+        ]
+    return np.dtype(fields)
+
+
+def _loadIndex(directory) -> dict | None:
+    try:
+        with open(os.path.join(directory, INDEX), "rb") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+class SnapshotRecorder:
+    # buffers snapshots per kind and exchange and writes a chunk once
+    # CHUNK_ROWS rows or FLUSH_SECONDS have gathered; unflushed rows are lost
+    # if the process dies. Reopening a store appends to it. Snapshots of one
+    # kind and exchange must be added in time order.
+    CHUNK_ROWS = 1 << 16
+    FLUSH_SECONDS = 60
+
+    def __init__(self, directory, depthLevels=20):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        index = _loadIndex(directory) or {
+            "depthLevels": depthLevels,
+            "pairs": {},
+            "chunks": [],
+        }
+        if index["depthLevels"] != depthLevels:
+            raise APIException(
+                "Error: "
+                + directory
+                + " records %d depth levels" % index["depthLevels"]
+            )
+        self.depthLevels = depthLevels
+        self._index = index
+        self._pairIds = {
+            exchange: {pair: i for i, pair in enumerate(pairs)}
+            for exchange, pairs in index["pairs"].items()
+        }
+        self._dtypes = {kind: snapshotDtype(kind, depthLevels) for kind in KINDS}
+        self._buffers = {}  # (kind, exchange) -> [array]
+        self._rows = {}  # (kind, exchange) -> buffered rows
+        self._flushedAt = time.monotonic()
+
+    def _pairId(self, exchange, pair) -> int:
+        ids = self._pairIds.setdefault(exchange, {})
+        i = ids.get(pair)
+        if i is None:
+            i = ids[pair] = len(ids)
+            self._index["pairs"].setdefault(exchange, []).append(pair)
+        return i
+
+    def _append(self, kind, exchange, rows):
+        key = (kind, exchange)
+        self._buffers.setdefault(key, []).append(rows)
+        self._rows[key] = self._rows.get(key, 0) + len(rows)
+        if self._rows[key] >= self.CHUNK_ROWS:
+            self._writeChunk(key)
+            self._writeIndex()
+        elif time.monotonic() - self._flushedAt >= self.FLUSH_SECONDS:
+            self.flush()
+
+    def addPrices(self, exchange, prices, timestamp=None):
+        # prices: getAssetsPrices() output, pair -> PriceSchema
+        rows = np.empty(len(prices), self._dtypes["prices"])
+        rows["time"] = time.time() if timestamp is None else timestamp
+        rows["pair"] = [self._pairId(exchange, pair) for pair in prices]
+        rows["bid"] = [price.bid for price in prices.values()]
+        rows["ask"] = [price.ask for price in prices.values()]
+        self._append("prices", exchange, rows)
+
+    def addVolumes(self, exchange, volumes, timestamp=None):
+        # volumes: get24hVolumes() output, pair -> volume
+        rows = np.empty(len(volumes), self._dtypes["volumes"])
+        rows["time"] = time.time() if timestamp is None else timestamp
+        rows["pair"] = [self._pairId(exchange, pair) for pair in volumes]
+        rows["volume"] = list(volumes.values())
+        self._append("volumes", exchange, rows)
+
+    def addDepth(self, exchange, pair, depth, timestamp=None):
+        # depth: getDepth() output, either form; levels past depthLevels are
+        # dropped
+        rows = np.empty(1, self._dtypes["depth"])
+        rows["time"] = time.time() if timestamp is None else timestamp
+        rows["pair"] = self._pairId(exchange, pair)
+        for side in ("asks", "bids"):
+            if isinstance(depth, DepthArray):
+                levels = getattr(depth, side)[: self.depthLevels]
+            else:
+                levels = DepthArray.toLevels(
+                    [(i.price, i.volume) for i in getattr(depth, side)]
+                )[: self.depthLevels]
+            rows[side] = np.nan
+            rows[side][0, : len(levels)] = levels
+        self._append("depth", exchange, rows)
+
+    def _writeChunk(self, key):
+        rows = np.concatenate(self._buffers.pop(key))
+        self._rows.pop(key)
+        kind, exchange = key
+        directory = os.path.join(self.directory, kind, exchange)
+        os.makedirs(directory, exist_ok=True)
+        name = "%d.npy" % sum(
+            chunk["kind"] == kind and chunk["exchange"] == exchange
+            for chunk in self._index["chunks"]
+        )
+        replaceFile(os.path.join(directory, name), lambda f: np.save(f, rows))
+        self._index["chunks"].append(
+            {
+                "kind": kind,
+                "exchange": exchange,
+                "file": os.path.join(kind, exchange, name),
+                "rows": len(rows),
+                "start": float(rows["time"][0]),
+                "end": float(rows["time"][-1]),
+            }
+        )
+
+    def _writeIndex(self):
+        data = json.dumps(self._index, separators=(",", ":")).encode()
+        replaceFile(os.path.join(self.directory, INDEX), lambda f: f.write(data))
+
+    def flush(self):
+        for key in list(self._buffers):
+            self._writeChunk(key)
+        self._writeIndex()
+        self._flushedAt = time.monotonic()
+
+    def close(self):
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class SnapshotReader:
+    # chunks are memory-mapped on first use, so a read only pages in the
+    # chunks and rows it selects; refresh() picks up chunks written since
+    def __init__(self, directory):
+        self.directory = directory
+        self._chunks = {}  # file -> mapped array
+        self.refresh()
+
+    def refresh(self):
+        index = _loadIndex(self.directory)
+        if index is None:
+            raise APIException("Error: " + self.directory + " is not a store")
+        self.depthLevels = index["depthLevels"]
+        self.index = index["chunks"]
+        self.pairNames = index["pairs"]  # exchange -> [pair], by pair column
+        self._pairIds = {
+            exchange: {pair: i for i, pair in enumerate(pairs)}
+            for exchange, pairs in self.pairNames.items()
+        }
+
+    def exchanges(self, kind) -> list[str]:
+        return sorted(
+            {chunk["exchange"] for chunk in self.index if chunk["kind"] == kind}
+        )
+
+    def _chunk(self, file) -> np.ndarray:
+        rows = self._chunks.get(file)
+        if rows is None:
+            rows = self._chunks[file] = np.load(
+                os.path.join(self.directory, file), mmap_mode="r"
+            )
+        return rows
+
+    def read(self, kind, exchange, start=None, end=None, pairs=None) -> np.ndarray:
+        # rows of [start, end) for the given pair names (all when None); a
+        # range within one chunk and no pair filter is a view of the mapping
+        ids = None
+        if pairs is not None:
+            known = self._pairIds.get(exchange, {})
+            ids = np.array([known[pair] for pair in pairs if pair in known])
+        parts = []
+        for chunk in self.index:
+            if chunk["kind"] != kind or chunk["exchange"] != exchange:
+                continue
+            if (start is not None and chunk["end"] < start) or (
+                end is not None and chunk["start"] >= end
+            ):
+                continue
+            rows = self._chunk(chunk["file"])
+            times = rows["time"]
+            rows = rows[
+                (0 if start is None else np.searchsorted(times, start)) : (
+                    len(rows) if end is None else np.searchsorted(times, end)
+                )
+            ]
+            if ids is not None:
+                rows = rows[np.isin(rows["pair"], ids)]
+            parts.append(rows)
+        if not parts:
+            return np.empty(0, snapshotDtype(kind, self.depthLevels))
+        return parts[0] if len(parts) == 1 else np.concatenate(parts)
+
+    def pairs(self, exchange, rows) -> list[str]:
+        # pair names of rows returned by read
+        names = self.pairNames[exchange]
+        return [names[i] for i in rows["pair"].tolist()]
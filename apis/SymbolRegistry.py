@@ -0,0 +1,52 @@
+class SymbolRegistry:
+    # bidirectional maps between canonical "BASE/QUOTE" pairs and an
+    # exchange's native ids, one per kind of endpoint
+    KINDS = ("ticker", "rest", "ws")
+
+    def __init__(self, aliases=None):
+        self.aliases = aliases or {}  # exchange asset code -> canonical code
+        self._toCanonical = {kind: {} for kind in self.KINDS}
+        self._toNative = {kind: {} for kind in self.KINDS}
+
+    def normalize(self, asset) -> str:
+        asset = asset.upper()
+        return self.aliases.get(asset, asset)
+
+    def pair(self, asset0, asset1) -> str:
+        return self.normalize(asset0) + "/" + self.normalize(asset1)
+
+    def add(self, asset0, asset1, ticker, rest=None, ws=None) -> str:
+        # rest and ws ids default to the ticker id
+        canonical = self.pair(asset0, asset1)
+        for kind, native in zip(self.KINDS, (ticker, rest or ticker, ws or ticker)):
+            self._toCanonical[kind][native] = canonical
+            self._toNative[kind].setdefault(canonical, native)
+        return canonical
+
+    def alias(self, kind, native, canonical):
+        # another native id resolving to an already registered pair
+        self._toCanonical[kind][native] = canonical
+
+    def canonical(self, native, kind="ticker") -> str | None:
+        return self._toCanonical[kind].get(native)
+
+    def native(self, asset0, asset1, kind="ticker") -> str | None:
+        return self._toNative[kind].get(self.pair(asset0, asset1))
+
+    def pairs(self) -> list[str]:
+        return list(self._toNative["ticker"])
+
+    def __len__(self):
+        return len(self._toNative["ticker"])
+
+    def toDict(self) -> dict:
+        # json-safe form for the disk cache; aliases come from the adapter
+        return {"canonical": self._toCanonical, "native": self._toNative}
+
+    @classmethod
+    def fromDict(cls, data, aliases=None) -> "SymbolRegistry":
+        symbols = cls(aliases)
+        for kind in cls.KINDS:
+            symbols._toCanonical[kind].update(data["canonical"][kind])
+            symbols._toNative[kind].update(data["native"][kind])
+        return symbols
@@ -0,0 +1,153 @@
+import asyncio
+import hashlib
+import json
+import mmap
+import os
+import struct
+import time
+import urllib.parse
+
+from multidict import CIMultiDict
+
+from .ApiTemplate import APIException, Response
+
+# recordings are a magic line followed by records of a RECORD header (start
+# offset and duration in seconds, status, then lengths) and the request key,
+# a json meta blob (content type, headers) and the raw body
+MAGIC = b"APIREC1\n"
+RECORD = struct.Struct("<ddHIII")
+
+# params that change on every signed request and would never match
+VOLATILE_PARAMS = frozenset(("timestamp", "signature", "nonce", "recvWindow"))
+
+
+def _stable(values) -> str:
+    return urllib.parse.urlencode(
+        sorted(
+            (name, str(value))
+            for name, value in values.items()
+            if name not in VOLATILE_PARAMS
+        )
+    )
+
+
+def requestKey(method, url, params=None, data=None) -> str:
+    # a body is keyed by a hash of its non-volatile fields, so POSTs to one
+    # url with different bodies get their own responses
+    query = _stable(params or {})
+    key = method + " " + url + ("?" + query if query else "")
+    if data:
+        body = _stable(data) if isinstance(data, dict) else data
+        if isinstance(body, str):
+            body = body.encode()
+        key += " #" + hashlib.sha1(body).hexdigest()[:16]
+    return key
+
+
+class RecordingTransport:
+    # passes requests on to the api's session and appends every exchange to
+    # `path`; one file can be shared by several apis
+    def __init__(self, path):
+        self._file = open(path, "ab")
+        if self._file.tell() == 0:
+            self._file.write(MAGIC)
+        self.started = time.monotonic()
+
+    async def fetch(self, api, method, url, params, data, headers) -> Response:
+        start = time.monotonic()
+        response = await api._sessionFetch(method, url, params, data, headers)
+        self.write(
+            start - self.started,
+            time.monotonic() - start,
+            requestKey(method, url, params, data),
+            response,
+        )
+        return response
+
+    def write(self, offset, duration, key, response):
+        key = key.encode()
+        meta = json.dumps(
+            {"contentType": response.content_type, "headers": dict(response.headers)},
+            separators=(",", ":"),
+        ).encode()
+        self._file.write(
+            RECORD.pack(
+                offset,
+                duration,
+                response.status,
+                len(key),
+                len(meta),
+                len(response.body),
+            )
+        )
+        self._file.write(key)
+        self._file.write(meta)
+        self._file.write(response.body)
+        # flushed per record so a crash loses at most the one being written
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+class ReplayTransport:
+    # serves recorded responses by request key, in recorded order and from
+    # the start again once used up. speed 1 waits each response's recorded
+    # duration, 10 a tenth of it, 0 not at all. With useMmap the file is
+    # mapped instead of read, bodies are paged in as they are served.
+    def __init__(self, path, speed=0, useMmap=False):
+        self.speed = speed
+        with open(path, "rb") as f:
+            if useMmap and os.fstat(f.fileno()).st_size:
+                self._buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            else:
+                self._buffer = f.read()
+        if self._buffer[: len(MAGIC)] != MAGIC:
+            raise APIException("Error: " + path + " is not a recording")
+
+        self.records = []  # (offset, duration, status, key, meta, body) spans
+        self._byKey = {}  # key -> [record index]
+        self._next = {}  # key -> position in _byKey[key]
+        position = len(MAGIC)
+        while position < len(self._buffer):
+            offset, duration, status, keyLen, metaLen, bodyLen = RECORD.unpack_from(
+                self._buffer, position
+            )
+            position += RECORD.size
+            key = bytes(self._buffer[position : position + keyLen]).decode()
+            position += keyLen
+            meta = (position, position + metaLen)
+            position += metaLen
+            body = (position, position + bodyLen)
+            position += bodyLen
+            self._byKey.setdefault(key, []).append(len(self.records))
+            self.records.append((offset, duration, status, key, meta, body))
+
+    def requests(self) -> list[tuple[float, str]]:
+        # (start offset, request key) of every record, to re-issue traffic
+        # with its original pacing
+        return [(record[0], record[3]) for record in self.records]
+
+    async def fetch(self, api, method, url, params, data, headers) -> Response:
+        key = requestKey(method, url, params, data)
+        indexes = self._byKey.get(key)
+        if not indexes:
+            raise APIException("Error: " + "no recorded response for " + key)
+        position = self._next.get(key, 0)
+        self._next[key] = (position + 1) % len(indexes)
+        _, duration, status, _, meta, body = self.records[indexes[position]]
+
+        if self.speed:
+            await asyncio.sleep(duration / self.speed)
+        meta = json.loads(self._buffer[meta[0] : meta[1]])
+        return Response(
+            status,
+            CIMultiDict(meta["headers"]),
+            meta["contentType"],
+            self._buffer[body[0] : body[1]],
+            api.JSON_DECODER,
+        )
+
+    def close(self):
+        if isinstance(self._buffer, mmap.mmap):
+            self._buffer.close()
@@ -1,8 +1,17 @@
-from .ApiTemplate import API
+from .ApiTemplate import API, APIException, DepthResyncException
 
 from .BinanceApi import BinanceAPI
 from .KrakenApi import KrakenAPI
 from .BitfinexApi import BitfinexAPI
 from .BitstampApi import BitstampAPI
 from .BitgetApi import BitgetAPI
+from .Aggregator import PriceAggregator, PriceMatrix
+from .ChangeFeed import ChangeEvent, ChangeFeed
+from .DiskCache import DiskCache
+from .ExecutionCost import ExecutionCosts, executionCosts
+from .Metrics import Metrics
+from .PriceTable import PricePublisher, PriceTableReader, PriceTableWriter
+from .Scheduler import Scheduler
+from .SnapshotStore import SnapshotReader, SnapshotRecorder
+from .Transport import RecordingTransport, ReplayTransport
 from .utils import *
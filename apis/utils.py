@@ -1,10 +1,58 @@
-import json
-import requests
+import asyncio
+import atexit
 import concurrent.futures
-from bs4 import BeautifulSoup
+import json
+import multiprocessing
+import re
+import aiohttp
+from bs4 import BeautifulSoup, Tag
 from typing import Dict, Tuple
 
 from schemas import WithdrawFeeSchema, WithdrawNetworkFeeSchema
+from .ApiTemplate import API
+
+try:
+    import lxml  # noqa: F401
+
+    HTML_PARSER = "lxml"
+except ImportError:  # in requirements.txt; html.parser is several times slower
+    HTML_PARSER = "html.parser"
+
+COIN_ID = re.compile("^coin_")
+
+# page parsing is CPU bound, so it runs in worker processes to keep the
+# event loop free. The pool starts after the loop's threads, and forking a
+# threaded process can deadlock, so workers come from a forkserver (spawn
+# where there is none)
+_executor = None
+
+
+def get_executor() -> concurrent.futures.Executor:
+    global _executor
+    if _executor is None:
+        method = (
+            "forkserver"
+            if "forkserver" in multiprocessing.get_all_start_methods()
+            else "spawn"
+        )
+        _executor = concurrent.futures.ProcessPoolExecutor(
+            mp_context=multiprocessing.get_context(method)
+        )
+        atexit.register(shutdown_executor)
+    return _executor
+
+
+def shutdown_executor() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(cancel_futures=True)
+        _executor = None
+
+
+def new_fee_schema() -> WithdrawFeeSchema:
+    return WithdrawFeeSchema.build(
+        deposit_enabled=True, withdraw_enabled=True, networks=[]
+    )
 
 
 def update_fee_dict(
@@ -13,21 +61,20 @@ def update_fee_dict(
 ) -> None:
     for asset, fee_schemas in new_fee_dict.items():
         if fee_dict.get(asset) is None:
-            fee_dict[asset] = WithdrawFeeSchema(networks=[])
+            fee_dict[asset] = new_fee_schema()
         for network_fee_schema in fee_schemas.networks:
             fee_dict[asset].networks.append(network_fee_schema)
 
 
 def parse_table_row(
-    row: str,
+    row: Tag,
 ) -> Tuple[str, WithdrawNetworkFeeSchema] | Tuple[None, WithdrawNetworkFeeSchema]:
-    soup = BeautifulSoup(row, "html.parser")
     asset = None
-    if 'id="coin_' in row:
-        info_text_div = soup.find("div", {"class": "info_text"})
+    if COIN_ID.match(row.get("id", "")) or row.find(id=COIN_ID) is not None:
+        info_text_div = row.find("div", {"class": "info_text"})
         asset = info_text_div.find("a", {"class": "symbol"}).text.strip().upper()
-    network = soup.find("td", {"class": "text-left"}).text.strip()
-    td_text_center = soup.find_all("td", {"class": "text-center"})
+    network = row.find("td", {"class": "text-left"}).text.strip()
+    td_text_center = row.find_all("td", {"class": "text-center"})
 
     withdraw_fee = float(
         td_text_center[0].find("div", {"class": "ttop network-fee"}).text.strip()[1:]
@@ -36,7 +83,7 @@ def parse_table_row(
         td_text_center[2].find("div", {"class": "ttop network-min"}).text.strip()[1:]
     )
 
-    return asset, WithdrawNetworkFeeSchema(
+    return asset, WithdrawNetworkFeeSchema.build(
         network=network,
         withdraw_fee=withdraw_fee,
         min_withdrawal=min_withdrawal,
@@ -45,27 +92,31 @@ def parse_table_row(
     )
 
 
-def parse_additional_networks(page: str) -> Dict[str, WithdrawFeeSchema]:
+def parse_additional_networks(
+    page: str, soup: BeautifulSoup
+) -> Dict[str, WithdrawFeeSchema]:
     additional_networks_json = json.loads(
         page.split("allNetworkSub= ")[1].split(";</script>")[0]
     )
+    # asset names of rows that only carry a data-id, looked up once per page
+    asset_names = {
+        tr["data-id"]: tr.get("name", "").upper()
+        for tr in soup.find_all("tr", attrs={"data-id": True})
+    }
     out = {}
 
     for asset_code, html in additional_networks_json.items():
-        soup = BeautifulSoup(html["html"], "html.parser")
-        if soup.prettify().strip() == "":
+        rows = BeautifulSoup(html["html"], HTML_PARSER).find_all("tr")
+        if not rows:
             continue
 
-        wfs = WithdrawFeeSchema(networks=[])
+        wfs = new_fee_schema()
 
-        for row in soup.find_all("tr"):
+        for row in rows:
             try:
-                asset, network_fee_schema = parse_table_row(row.prettify())
+                asset, network_fee_schema = parse_table_row(row)
                 if asset is None:
-                    page_soup = BeautifulSoup(page, "html.parser")
-                    asset = page_soup.find("tr", {"data-id": asset_code})[
-                        "name"
-                    ].upper()
+                    asset = asset_names[asset_code]
                 if out.get(asset) is None:
                     out[asset] = wfs
                 out[asset].networks.append(network_fee_schema)
@@ -74,9 +125,12 @@ def parse_additional_networks(page: str) -> Dict[str, WithdrawFeeSchema]:
     return out
 
 
-def parse_page(page: str) -> Dict[str, WithdrawFeeSchema]:
-    soup = BeautifulSoup(page, "html.parser")
+def parse_page(page: str) -> Dict[str, WithdrawFeeSchema] | None:
+    # None when the page has no fee table, i.e. past the last page
+    soup = BeautifulSoup(page, HTML_PARSER)
     table = soup.find("table", {"class": "box_table_list"})
+    if table is None:
+        return None
     table_rows = table.find_all(
         "tr", {"class": "item_cSearch item item_coin_network table_tr_pr"}
     )
@@ -86,32 +140,46 @@ def parse_page(page: str) -> Dict[str, WithdrawFeeSchema]:
 
     for row in table_rows:
         try:
-            asset, fee_schema = parse_table_row(row.prettify())
+            asset, fee_schema = parse_table_row(row)
             if out.get(asset) is None:
-                out[asset] = WithdrawFeeSchema(networks=[])
-            out[asset].netwirks.append(fee_schema)
+                out[asset] = new_fee_schema()
+            out[asset].networks.append(fee_schema)
         except Exception:
             pass
 
-    additional_networks = parse_additional_networks(page)
+    additional_networks = parse_additional_networks(page, soup)
     update_fee_dict(out, additional_networks)
 
     return out
 
 
-def parse_all_pages(url: str, market: str, pages: int) -> Dict[str, WithdrawFeeSchema]:
+async def fetch_and_parse_page(session, url: str) -> Dict[str, WithdrawFeeSchema]:
+    # per request, a caller's session may have no timeout of its own
+    timeout = aiohttp.ClientTimeout(total=API.DEFAULT_TIMEOUT)
+    async with session.get(url, timeout=timeout) as response:
+        if response.status != 200:
+            return {}
+        page = await response.text()
+
+    parsed = await asyncio.get_running_loop().run_in_executor(
+        get_executor(), parse_page, page
+    )
+    return parsed or {}
+
+
+async def parse_all_pages(
+    url: str, market: str, pages: int, session
+) -> Dict[str, WithdrawFeeSchema]:
+    results = await asyncio.gather(
+        *[
+            fetch_and_parse_page(session, url.format(market=market, page=page_num))
+            for page_num in range(1, pages)
+        ]
+    )
+
     out = {}
-    with concurrent.futures.ThreadPoolExecutor() as executor:
-        futures = []
-        for page_num in range(1, pages):
-            futures.append(
-                executor.submit(
-                    requests.get, url.format(market=market, page=page_num), timeout=10
-                )
-            )
-        for future in concurrent.futures.as_completed(futures):
-            page = future.result()
-            if BeautifulSoup(page.text, "html.parser").find("table") is None:
-                break
-            update_fee_dict(out, parse_page(page.text))
+    for page in results:
+        update_fee_dict(out, page)
+    for fee_schema in out.values():
+        fee_schema.fixBools()
     return out
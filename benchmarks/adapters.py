@@ -0,0 +1,224 @@
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+import tracemalloc
+import urllib.parse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from apis import (  # noqa: E402
+    BinanceAPI,
+    BitfinexAPI,
+    BitgetAPI,
+    BitstampAPI,
+    KrakenAPI,
+)
+from fixtures import load, loadPage  # noqa: E402
+
+# every adapter's fetch + parse path against the fixtures, with the http
+# session stubbed out; url path prefix -> fixture
+FEE_PAGES = {"/exchange/{}/page/%d" % page: page for page in range(1, 10)}
+ROUTES = {
+    BinanceAPI: {
+        "/api/v3/exchangeInfo": "binance/exchangeInfo",
+        "/api/v3/ticker/24hr": "binance/ticker/24hr",
+        "/api/v3/ticker/bookTicker": "binance/ticker/bookTicker",
+        "/api/v3/depth": "binance/depth",
+        "/sapi/v1/capital/config/getall": "binance/capital/config/getall",
+    },
+    KrakenAPI: {
+        "/0/public/AssetPairs": "kraken/AssetPairs",
+        "/0/public/Ticker": "kraken/Ticker",
+        "/0/public/Depth": "kraken/Depth",
+    },
+    BitfinexAPI: {
+        "/v2/conf/": "bitfinex/conf",
+        "/v2/tickers": "bitfinex/tickers",
+        "/v2/book/": "bitfinex/book",
+    },
+    BitstampAPI: {
+        "/api/v2/trading-pairs-info/": "bitstamp/trading-pairs-info",
+        "/api/v2/ticker/": "bitstamp/ticker",
+        "/api/v2/order_book/": "bitstamp/order_book",
+        "/api/v2/fees/withdrawal/": "bitstamp/fees/withdrawal",
+    },
+    BitgetAPI: {
+        "/api/spot/v1/public/products": "bitget/products",
+        "/api/spot/v1/market/tickers": "bitget/tickers",
+        "/api/spot/v1/market/depth": "bitget/depth",
+        "/api/spot/v1/public/currencies": "bitget/currencies",
+    },
+}
+
+CASES = {
+    "getAssetsPrices": lambda api, pair: api.getAssetsPrices(),
+    "get24hVolumes": lambda api, pair: api.get24hVolumes(),
+    "getDepth": lambda api, pair: api.getDepth(*pair),
+    "getWithdrawFees": lambda api, pair: api.getWithdrawFees(),
+}
+
+
+class StubResponse:
+    def __init__(self, body, contentType):
+        self.status = 200 if body is not None else 404
+        self.headers = {}
+        self.content_type = contentType
+        self.body = body or b""
+
+    async def read(self) -> bytes:
+        return self.body
+
+    async def text(self) -> str:
+        return self.body.decode()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        pass
+
+
+class StubSession:
+    # stands in for aiohttp.ClientSession, answering from the fixtures by
+    # longest matching url path prefix
+    closed = False
+
+    def __init__(self, routes, market):
+        self.routes = {
+            path: (load(name), "application/json") for path, name in routes.items()
+        }
+        for path, page in FEE_PAGES.items():
+            self.routes[path.format(market)] = (loadPage(page), "text/html")
+        self.prefixes = sorted(self.routes, key=len, reverse=True)
+
+    def _respond(self, url):
+        path = urllib.parse.urlsplit(url).path
+        for prefix in self.prefixes:
+            if path.startswith(prefix):
+                return StubResponse(*self.routes[prefix])
+        return StubResponse(None, "text/plain")
+
+    def request(self, method, url, **kwargs):
+        return self._respond(url)
+
+    def get(self, url, **kwargs):
+        return self._respond(url)
+
+    async def close(self):
+        pass
+
+
+# kraken wants a base64 secret, bitstamp signs with bytes
+SECRETS = {BitstampAPI: b"secret"}
+
+
+def makeApi(cls):
+    secret = SECRETS.get(cls, "c2VjcmV0")
+    api = cls("key", secret, session=StubSession(ROUTES[cls], cls.getApiName()))
+    api.RATE_LIMITS = {}  # fixtures are free
+    return api
+
+
+def measure(loop, api, call, seconds) -> dict:
+    def run():
+        # cached withdrawal fees would skip the fetch and parse
+        api._resources.clear()
+        return loop.run_until_complete(call())
+
+    run()
+    start, ops = time.perf_counter(), 0
+    while time.perf_counter() - start < seconds:
+        run()
+        ops += 1
+    opsPerSec = ops / (time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        snapshot = tracemalloc.take_snapshot()
+        result = run()
+        # new blocks per line, so blocks freed elsewhere (the cleared
+        # resources) don't cancel them out; blocks freed within the call
+        # are not seen at all
+        allocs = sum(
+            max(0, stat.count_diff)
+            for stat in tracemalloc.take_snapshot().compare_to(snapshot, "lineno")
+        )
+        peak = tracemalloc.get_traced_memory()[1] - before
+    finally:
+        tracemalloc.stop()
+    del result
+    return {"ops": opsPerSec, "allocs": allocs, "peakKiB": peak / 1024}
+
+
+def compare(results, baseline, tolerance) -> list[str]:
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        if result["ops"] < base["ops"] * (1 - tolerance):
+            regressions.append(
+                "{} ops/sec {:.1f} -> {:.1f}".format(name, base["ops"], result["ops"])
+            )
+        if "allocs" in base and result["allocs"] > base["allocs"] * (1 + tolerance):
+            regressions.append(
+                "{} allocs {} -> {}".format(name, base["allocs"], result["allocs"])
+            )
+        if result["peakKiB"] > base["peakKiB"] * (1 + tolerance):
+            regressions.append(
+                "{} peak KiB {:.0f} -> {:.0f}".format(
+                    name, base["peakKiB"], result["peakKiB"]
+                )
+            )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("filter", nargs="*", help="only names containing these")
+    parser.add_argument("--seconds", type=float, default=1.0, help="per benchmark")
+    parser.add_argument("--save", help="write the results as a baseline")
+    parser.add_argument("--baseline", help="fail on regressions against it")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+
+    loop = asyncio.new_event_loop()
+    results = {}
+    print(f"{'benchmark':<28}{'ops/sec':>10}{'allocs':>10}{'peak KiB':>10}")
+    for cls in ROUTES:
+        api = makeApi(cls)
+        symbols = loop.run_until_complete(api.getMetadata()).symbols
+        pair = symbols.pairs()[0].split("/")
+        for case, call in CASES.items():
+            name = cls.getApiName() + "/" + case
+            if args.filter and not any(f in name for f in args.filter):
+                continue
+            result = results[name] = measure(
+                loop, api, lambda: call(api, pair), args.seconds
+            )
+            print(
+                f"{name:<28}{result['ops']:>10.1f}{result['allocs']:>10}"
+                f"{result['peakKiB']:>10.0f}"
+            )
+        loop.run_until_complete(api.close())
+    loop.close()
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            print("regression:", regression)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,524 @@
+import json
+import random
+
+# deterministic payloads with the shape and size of real exchange
+# responses, keyed "<exchange>/<endpoint>"
+
+ASSETS = [
+    "BTC", "ETH", "USDT", "USDC", "BNB", "XRP", "ADA", "SOL", "DOGE", "DOT",
+    "TRX", "LTC", "AVAX", "LINK", "ATOM", "XMR", "ETC", "XLM", "BCH", "ALGO",
+    "FIL", "APT", "NEAR", "VET", "ICP", "EUR", "USD", "GBP", "TRY", "BUSD",
+]  # fmt: skip
+
+
+def _rng(name):
+    return random.Random(name)
+
+
+def _pairs(rng, n):
+    pairs = set()
+    while len(pairs) < n:
+        base = rng.choice(ASSETS) + (
+            str(rng.randrange(100)) if rng.random() < 0.8 else ""
+        )
+        quote = rng.choice(["USDT", "BTC", "ETH", "EUR", "USD", "BUSD"])
+        if base != quote:
+            pairs.add((base, quote))
+    return sorted(pairs)
+
+
+def _num(rng, scale=1000.0):
+    return "{:.8f}".format(rng.random() * scale)
+
+
+def _levels(rng, n, start, step):
+    return [["{:.8f}".format(start + i * step), _num(rng, 10)] for i in range(n)]
+
+
+def binanceExchangeInfo():
+    rng = _rng("binance/exchangeInfo")
+    symbols = []
+    for base, quote in _pairs(rng, 2600):
+        symbols.append(
+            {
+                "symbol": base + quote,
+                "status": "TRADING",
+                "baseAsset": base,
+                "baseAssetPrecision": 8,
+                "quoteAsset": quote,
+                "quotePrecision": 8,
+                "quoteAssetPrecision": 8,
+                "orderTypes": ["LIMIT", "LIMIT_MAKER", "MARKET", "STOP_LOSS_LIMIT"],
+                "icebergAllowed": True,
+                "ocoAllowed": True,
+                "isSpotTradingAllowed": True,
+                "isMarginTradingAllowed": False,
+                "filters": [
+                    {
+                        "filterType": "PRICE_FILTER",
+                        "minPrice": "0.01000000",
+                        "maxPrice": "1000000.00000000",
+                        "tickSize": "0.01000000",
+                    },
+                    {
+                        "filterType": "LOT_SIZE",
+                        "minQty": "0.00001000",
+                        "maxQty": "9000.00000000",
+                        "stepSize": "0.00001000",
+                    },
+                    {
+                        "filterType": "NOTIONAL",
+                        "minNotional": "5.00000000",
+                        "maxNotional": "9000000.00000000",
+                    },
+                    {"filterType": "MAX_NUM_ORDERS", "maxNumOrders": 200},
+                ],
+                "permissions": ["SPOT", "MARGIN", "TRD_GRP_004", "TRD_GRP_005"],
+                "defaultSelfTradePreventionMode": "EXPIRE_MAKER",
+            }
+        )
+    return {"timezone": "UTC", "serverTime": 1700000000000, "symbols": symbols}
+
+
+def binanceTicker24hr():
+    rng = _rng("binance/ticker/24hr")
+    return [
+        {
+            "symbol": base + quote,
+            "priceChange": _num(rng),
+            "priceChangePercent": "1.234",
+            "weightedAvgPrice": _num(rng),
+            "prevClosePrice": _num(rng),
+            "lastPrice": _num(rng),
+            "lastQty": _num(rng),
+            "bidPrice": _num(rng),
+            "bidQty": _num(rng),
+            "askPrice": _num(rng),
+            "askQty": _num(rng),
+            "openPrice": _num(rng),
+            "highPrice": _num(rng),
+            "lowPrice": _num(rng),
+            "volume": _num(rng, 1e6),
+            "quoteVolume": _num(rng, 1e8),
+            "openTime": 1700000000000,
+            "closeTime": 1700086400000,
+            "firstId": 1,
+            "lastId": 1000,
+            "count": 1000,
+        }
+        for base, quote in _pairs(rng, 2600)
+    ]
+
+
+def binanceBookTicker():
+    rng = _rng("binance/ticker/bookTicker")
+    return [
+        {
+            "symbol": base + quote,
+            "bidPrice": _num(rng),
+            "bidQty": _num(rng),
+            "askPrice": _num(rng),
+            "askQty": _num(rng),
+        }
+        for base, quote in _pairs(rng, 2600)
+    ]
+
+
+def binanceDepth(limit=100):
+    rng = _rng("binance/depth")
+    return {
+        "lastUpdateId": 1027024,
+        "bids": _levels(rng, limit, 30000.0, -0.01),
+        "asks": _levels(rng, limit, 30000.01, 0.01),
+    }
+
+
+def krakenAssetPairs():
+    rng = _rng("kraken/AssetPairs")
+    result = {}
+    for base, quote in _pairs(rng, 700):
+        result["X" + base + "Z" + quote] = {
+            "altname": base + quote,
+            "wsname": base + "/" + quote,
+            "aclass_base": "currency",
+            "base": "X" + base,
+            "aclass_quote": "currency",
+            "quote": "Z" + quote,
+            "pair_decimals": 5,
+            "lot_decimals": 8,
+            "lot_multiplier": 1,
+            "leverage_buy": [2, 3, 4, 5],
+            "leverage_sell": [2, 3, 4, 5],
+            "fees": [[0, 0.26], [50000, 0.24], [100000, 0.22], [250000, 0.2]],
+            "fees_maker": [[0, 0.16], [50000, 0.14], [100000, 0.12]],
+            "fee_volume_currency": "ZUSD",
+            "margin_call": 80,
+            "margin_stop": 40,
+            "ordermin": "0.0001",
+        }
+    return {"error": [], "result": result}
+
+
+def krakenTicker():
+    rng = _rng("kraken/Ticker")
+    result = {}
+    for base, quote in _pairs(rng, 700):
+        result["X" + base + "Z" + quote] = {
+            "a": [_num(rng), "1", "1.000"],
+            "b": [_num(rng), "1", "1.000"],
+            "c": [_num(rng), _num(rng)],
+            "v": [_num(rng, 1e4), _num(rng, 1e5)],
+            "p": [_num(rng), _num(rng)],
+            "t": [1000, 20000],
+            "l": [_num(rng), _num(rng)],
+            "h": [_num(rng), _num(rng)],
+            "o": _num(rng),
+        }
+    return {"error": [], "result": result}
+
+
+def krakenDepth(count=100):
+    rng = _rng("kraken/Depth")
+    return {
+        "error": [],
+        "result": {
+            "XXBTZUSD": {
+                "asks": [
+                    row + [1700000000] for row in _levels(rng, count, 30000.1, 0.1)
+                ],
+                "bids": [
+                    row + [1700000000] for row in _levels(rng, count, 30000.0, -0.1)
+                ],
+            }
+        },
+    }
+
+
+def bitfinexPairs():
+    rng = _rng("bitfinex/conf")
+    return [
+        [
+            base + quote if len(base) == 3 and len(quote) == 3 else base + ":" + quote
+            for base, quote in _pairs(rng, 300)
+        ]
+    ]
+
+
+def bitfinexTickers():
+    rng = _rng("bitfinex/tickers")
+    out = []
+    for pair in bitfinexPairs()[0]:
+        out.append(["t" + pair] + [float(_num(rng)) for _ in range(10)])
+    for asset in ASSETS[:20]:
+        out.append(["f" + asset] + [float(_num(rng)) for _ in range(16)])
+    return out
+
+
+def bitfinexBook(length=25):
+    rng = _rng("bitfinex/book")
+    bids = [
+        [30000.0 - i, rng.randrange(1, 5), float(_num(rng, 10))] for i in range(length)
+    ]
+    asks = [
+        [30001.0 + i, rng.randrange(1, 5), -float(_num(rng, 10))] for i in range(length)
+    ]
+    return bids + asks
+
+
+def bitstampPairs():
+    rng = _rng("bitstamp/pairs")
+    return [
+        {
+            "name": base + "/" + quote,
+            "url_symbol": (base + quote).lower(),
+            "base_decimals": 8,
+            "counter_decimals": 2,
+            "instant_order_counter_decimals": 2,
+            "minimum_order": "10.00000000 " + quote,
+            "trading": "Enabled",
+            "instant_and_market_orders": "Enabled",
+            "description": base + " / " + quote,
+        }
+        for base, quote in _pairs(rng, 200)
+    ]
+
+
+def bitstampTicker():
+    rng = _rng("bitstamp/pairs")
+    return [
+        {
+            "timestamp": "1700000000",
+            "open": _num(rng),
+            "high": _num(rng),
+            "low": _num(rng),
+            "last": _num(rng),
+            "volume": _num(rng, 1e4),
+            "vwap": _num(rng),
+            "bid": _num(rng),
+            "ask": _num(rng),
+            "side": "0",
+            "open_24": _num(rng),
+            "percent_change_24": "1.23",
+            "pair": base + "/" + quote,
+        }
+        for base, quote in _pairs(rng, 200)
+    ]
+
+
+def bitstampOrderBook(levels=5000):
+    rng = _rng("bitstamp/order_book")
+    return {
+        "timestamp": "1700000000",
+        "microtimestamp": "1700000000000000",
+        "bids": _levels(rng, levels, 30000.0, -0.01),
+        "asks": _levels(rng, levels, 30000.01, 0.01),
+    }
+
+
+def bitgetProducts():
+    rng = _rng("bitget/products")
+    return {
+        "code": "00000",
+        "msg": "success",
+        "data": [
+            {
+                "symbol": base + quote + "_SPBL",
+                "symbolName": base + quote,
+                "baseCoin": base,
+                "quoteCoin": quote,
+                "minTradeAmount": "0.0001",
+                "maxTradeAmount": "10000",
+                "takerFeeRate": "0.001",
+                "makerFeeRate": "0.001",
+                "priceScale": "2",
+                "quantityScale": "4",
+                "status": "online",
+            }
+            for base, quote in _pairs(rng, 800)
+        ],
+    }
+
+
+def bitgetTickers():
+    rng = _rng("bitget/products")
+    return {
+        "code": "00000",
+        "msg": "success",
+        "data": [
+            {
+                "symbol": base + quote,
+                "high24h": _num(rng),
+                "low24h": _num(rng),
+                "close": _num(rng),
+                "quoteVol": _num(rng, 1e8),
+                "baseVol": _num(rng, 1e6),
+                "usdtVol": _num(rng, 1e8),
+                "ts": "1700000000000",
+                "buyOne": _num(rng),
+                "sellOne": _num(rng),
+                "bidSz": _num(rng),
+                "askSz": _num(rng),
+                "openUtc0": _num(rng),
+                "changeUtc": "0.01",
+                "change": "0.01",
+            }
+            for base, quote in _pairs(rng, 800)
+        ],
+    }
+
+
+def bitgetDepth(limit=100):
+    rng = _rng("bitget/depth")
+    return {
+        "code": "00000",
+        "msg": "success",
+        "data": {
+            "asks": _levels(rng, limit, 30000.01, 0.01),
+            "bids": _levels(rng, limit, 30000.0, -0.01),
+            "timestamp": "1700000000000",
+        },
+    }
+
+
+def _coins(rng, n):
+    coins = set(ASSETS)
+    while len(coins) < n:
+        coins.add(rng.choice(ASSETS) + str(rng.randrange(1000)))
+    return sorted(coins)
+
+
+def binanceCapitalConfig():
+    rng = _rng("binance/capital/config/getall")
+    out = []
+    for coin in _coins(rng, 600):
+        networks = [
+            {
+                "network": coin if i == 0 else rng.choice(["ETH", "BSC", "TRX", "SOL"]),
+                "coin": coin,
+                "withdrawIntegerMultiple": "0.00000001",
+                "isDefault": i == 0,
+                "depositEnable": rng.random() < 0.95,
+                "withdrawEnable": rng.random() < 0.95,
+                "depositDesc": "",
+                "withdrawDesc": "",
+                "specialTips": "",
+                "name": coin + " network",
+                "resetAddressStatus": False,
+                "addressRegex": "^[a-zA-Z0-9]{26,62}$",
+                "memoRegex": "",
+                "withdrawFee": _num(rng, 10),
+                "withdrawMin": _num(rng, 10),
+                "withdrawMax": "9999999999.99999999",
+                "minConfirm": 1,
+                "unLockConfirm": 2,
+                "sameAddress": False,
+                "estimatedArrivalTime": 5,
+                "busy": False,
+            }
+            for i in range(rng.randrange(1, 5))
+        ]
+        out.append(
+            {
+                "coin": coin,
+                "depositAllEnable": True,
+                "withdrawAllEnable": True,
+                "name": coin,
+                "free": "0",
+                "locked": "0",
+                "freeze": "0",
+                "withdrawing": "0",
+                "ipoing": "0",
+                "ipoable": "0",
+                "storage": "0",
+                "isLegalMoney": False,
+                "trading": True,
+                "networkList": networks,
+            }
+        )
+    return out
+
+
+def bitstampWithdrawalFees():
+    rng = _rng("bitstamp/fees/withdrawal")
+    return [
+        {"currency": coin.lower(), "fee": _num(rng, 10), "network": "default"}
+        for coin in _coins(rng, 120)
+    ]
+
+
+def bitgetCurrencies():
+    rng = _rng("bitget/currencies")
+    return {
+        "code": "00000",
+        "msg": "success",
+        "data": [
+            {
+                "coinId": str(i),
+                "coinName": coin,
+                "transfer": "true",
+                "chains": [
+                    {
+                        "chain": rng.choice(["ERC20", "TRC20", "BEP20", coin]),
+                        "needTag": "false",
+                        "withdrawable": "true",
+                        "rechargeAble": "true",
+                        "withdrawFee": _num(rng, 10),
+                        "extraWithDrawFee": "0",
+                        "depositConfirm": "12",
+                        "withdrawConfirm": "12",
+                        "minDepositAmount": _num(rng),
+                        "minWithdrawAmount": _num(rng),
+                        "browserUrl": "https://explorer/tx/",
+                    }
+                    for _ in range(rng.randrange(1, 4))
+                ],
+            }
+            for i, coin in enumerate(_coins(rng, 800))
+        ],
+    }
+
+
+def _feeRow(rng, coin, coinId, network, first):
+    # the markup apis.utils.parse_table_row reads; continuation rows of an
+    # asset carry no coin id
+    info = (
+        '<td class="coin_td"><div class="info_text"><img src="/img/{0}.png" '
+        'alt="{1}" width="24"><a class="symbol" href="/coin/{0}">{1}</a>'
+        '<span class="name">{1} coin</span></div></td>'.format(coin.lower(), coin)
+        if first
+        else "<td></td>"
+    )
+    return (
+        '<tr class="item_cSearch item item_coin_network table_tr_pr"{} data-id="{}" '
+        'name="{}">{}<td class="text-left">{}</td><td class="text-center">'
+        '<div class="ttop network-fee">${}</div><span class="tooltip">Network fee'
+        '</span></td><td class="text-center"><div class="ttop network-usd">${}</div>'
+        '</td><td class="text-center"><div class="ttop network-min">${}</div></td>'
+        "</tr>\n"
+    ).format(
+        ' id="coin_{}"'.format(coinId) if first else "",
+        coinId,
+        coin.lower(),
+        info,
+        network,
+        _num(rng, 10),
+        _num(rng, 100),
+        _num(rng, 10),
+    )
+
+
+def coinmarketfeesPage(page, pages=5, rows=100):
+    # html of one fee listing page; past `pages` the site serves a page
+    # without the table
+    if page > pages:
+        return "<html><body><p>No results</p></body></html>"
+    rng = _rng("coinmarketfees/page/{}".format(page))
+    body, additional = [], {}
+    for i, coin in enumerate(_coins(rng, page * rows)[(page - 1) * rows :]):
+        coinId = str(page * 10000 + i)
+        body.append(_feeRow(rng, coin, coinId, coin + " network", True))
+        if rng.random() < 0.4:
+            additional[coinId] = {
+                "html": "".join(
+                    _feeRow(rng, coin, coinId, network, False)
+                    for network in rng.sample(["ERC20", "TRC20", "BEP20", "SOL"], 2)
+                )
+            }
+    return (
+        "<html><head><title>Withdrawal fees</title></head><body>"
+        '<div class="container"><table class="box_table_list"><thead><tr>'
+        "<th>Coin</th><th>Network</th><th>Fee</th><th>USD</th><th>Min</th>"
+        "</tr></thead><tbody>{}</tbody></table></div>"
+        "<script>var allNetworkSub= {};</script></body></html>"
+    ).format("".join(body), json.dumps(additional))
+
+
+FIXTURES = {
+    "binance/exchangeInfo": binanceExchangeInfo,
+    "binance/ticker/24hr": binanceTicker24hr,
+    "binance/ticker/bookTicker": binanceBookTicker,
+    "binance/depth": binanceDepth,
+    "kraken/AssetPairs": krakenAssetPairs,
+    "kraken/Ticker": krakenTicker,
+    "kraken/Depth": krakenDepth,
+    "bitfinex/conf": bitfinexPairs,
+    "bitfinex/tickers": bitfinexTickers,
+    "bitfinex/book": bitfinexBook,
+    "bitstamp/trading-pairs-info": bitstampPairs,
+    "bitstamp/ticker": bitstampTicker,
+    "bitstamp/order_book": bitstampOrderBook,
+    "bitget/products": bitgetProducts,
+    "bitget/tickers": bitgetTickers,
+    "bitget/depth": bitgetDepth,
+    "binance/capital/config/getall": binanceCapitalConfig,
+    "bitstamp/fees/withdrawal": bitstampWithdrawalFees,
+    "bitget/currencies": bitgetCurrencies,
+}
+
+
+def load(name) -> bytes:
+    return json.dumps(FIXTURES[name]()).encode()
+
+
+def loadPage(page) -> bytes:
+    return coinmarketfeesPage(page).encode()
@@ -0,0 +1,34 @@
+import json
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from apis.ApiTemplate import loadJson  # noqa: E402
+from fixtures import FIXTURES, load  # noqa: E402
+
+# stdlib json.loads against the decoder API uses (orjson when installed),
+# both fed the raw response bytes
+
+
+def bench(decoder, body, number) -> float:
+    return min(timeit.repeat(lambda: decoder(body), number=number, repeat=5)) / number
+
+
+def main():
+    print("decoder:", loadJson.__module__)
+    print(f"{'payload':<28}{'KiB':>8}{'stdlib ms':>12}{'api ms':>10}{'speedup':>9}")
+    for name in FIXTURES:
+        body = load(name)
+        number = max(1, 2_000_000 // len(body))
+        stdlib = bench(json.loads, body, number)
+        fast = bench(loadJson, body, number)
+        print(
+            f"{name:<28}{len(body) // 1024:>8}{stdlib * 1e3:>12.3f}"
+            f"{fast * 1e3:>10.3f}{stdlib / fast:>8.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,5 @@
+import os
+
+# before anything imports schemas: adapters passing the wrong types to
+# build() fail the tests instead of producing unvalidated models
+os.environ["SCHEMAS_STRICT"] = "1"
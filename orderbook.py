@@ -0,0 +1,62 @@
+from itertools import islice
+from operator import neg
+
+from sortedcontainers import SortedDict
+
+from schemas import DepthSchema, PriceVolumeSchema
+
+
+class OrderBook:
+    # levels are kept best-first on both sides (bids keyed by -price), so
+    # updates are O(log n), the best level is O(1) and top-N is a slice
+    def __init__(self):
+        self.asks = SortedDict()  # price -> volume
+        self.bids = SortedDict(neg)
+        self.timestamp = 0
+
+    @classmethod
+    def fromDepthSchema(cls, depth: DepthSchema) -> "OrderBook":
+        book = cls()
+        book.asks.update((i.price, i.volume) for i in depth.asks)
+        book.bids.update((i.price, i.volume) for i in depth.bids)
+        book.timestamp = depth.timestamp
+        return book
+
+    def clear(self):
+        self.asks.clear()
+        self.bids.clear()
+
+    def update(self, side, price, volume):
+        # a zero volume removes the level
+        levels = getattr(self, side)
+        if volume:
+            levels[price] = volume
+        else:
+            levels.pop(price, None)
+
+    def best(self, side) -> tuple[float, float] | None:
+        levels = getattr(self, side)
+        return levels.peekitem(0) if levels else None
+
+    def top(self, side, n=None) -> list[tuple[float, float]]:
+        return list(islice(getattr(self, side).items(), n))
+
+    def truncate(self, side, n) -> list[float]:
+        levels = getattr(self, side)
+        removed = []
+        while len(levels) > n:
+            removed.append(levels.popitem()[0])
+        return removed
+
+    def toDepthSchema(self, limit=None) -> DepthSchema:
+        return DepthSchema.build(
+            asks=[
+                PriceVolumeSchema.build(price=price, volume=volume)
+                for price, volume in self.top("asks", limit)
+            ],
+            bids=[
+                PriceVolumeSchema.build(price=price, volume=volume)
+                for price, volume in self.top("bids", limit)
+            ],
+            timestamp=self.timestamp,
+        )
@@ -1,7 +1,27 @@
+import os
+
+import numpy as np
 from pydantic import BaseModel
 
+# validate values passed to build() as well; conftest.py turns it on for
+# the tests so adapters that pass the wrong types are caught
+STRICT = os.environ.get("SCHEMAS_STRICT", "") not in ("", "0")
+
+
+class FastSchema(BaseModel):
+    @classmethod
+    def build(cls, **values):
+        # trusted path for adapters: values must already have the field
+        # types (floats parsed with float(...)), nothing is validated
+        if STRICT:
+            return cls(**values)
+        model = cls.__new__(cls)
+        object.__setattr__(model, "__dict__", values)
+        object.__setattr__(model, "__fields_set__", set(values))
+        return model
 
-class PriceSchema(BaseModel):
+
+class PriceSchema(FastSchema):
     bid: float
     ask: float
 
@@ -9,7 +29,14 @@ class PriceSchema(BaseModel):
         return "bid: {}, ask: {}".format(self.bid, self.ask)
 
 
-class PriceVolumeSchema(BaseModel):
+class TickerSchema(PriceSchema):
+    volume: float  # 24h volume, in the unit get24hVolumes reports
+
+    def __str__(self):
+        return "bid: {}, ask: {}, volume: {}".format(self.bid, self.ask, self.volume)
+
+
+class PriceVolumeSchema(FastSchema):
     price: float
     volume: float
 
@@ -17,7 +44,7 @@ class PriceVolumeSchema(BaseModel):
         return "price: {}, volume: {}".format(self.price, self.volume)
 
 
-class DepthSchema(BaseModel):
+class DepthSchema(FastSchema):
     asks: list[PriceVolumeSchema]
     bids: list[PriceVolumeSchema]
     timestamp: int
@@ -32,7 +59,60 @@ class DepthSchema(BaseModel):
         )
 
 
-class WithdrawNetworkFeeSchema(BaseModel):
+class DepthArray:
+    # compact alternative to DepthSchema: asks and bids are (n, 2) float64
+    # arrays of [price, volume] rows
+    __slots__ = ("asks", "bids", "timestamp")
+
+    def __init__(self, asks: np.ndarray, bids: np.ndarray, timestamp: int):
+        self.asks = asks
+        self.bids = bids
+        self.timestamp = timestamp
+
+    @staticmethod
+    def toLevels(rows) -> np.ndarray:
+        # exchange rows whose first two columns are price and volume
+        if len(rows) == 0:
+            return np.empty((0, 2), dtype=np.float64)
+        return np.array(rows, dtype=np.float64)[:, :2]
+
+    @classmethod
+    def fromRows(cls, asks, bids, timestamp) -> "DepthArray":
+        return cls(cls.toLevels(asks), cls.toLevels(bids), timestamp)
+
+    def sort(self):
+        self.asks = self.asks[np.argsort(self.asks[:, 0], kind="stable")]
+        self.bids = self.bids[np.argsort(-self.bids[:, 0], kind="stable")]
+
+    def spread(self) -> float:
+        return self.asks[0, 0] - self.bids[0, 0]
+
+    def mid(self) -> float:
+        return (self.asks[0, 0] + self.bids[0, 0]) / 2
+
+    def cumulativeVolume(self, side) -> np.ndarray:
+        return np.cumsum(getattr(self, side)[:, 1])
+
+    def toDepthSchema(self) -> DepthSchema:
+        return DepthSchema.build(
+            asks=[
+                PriceVolumeSchema.build(price=p, volume=v)
+                for p, v in self.asks.tolist()
+            ],
+            bids=[
+                PriceVolumeSchema.build(price=p, volume=v)
+                for p, v in self.bids.tolist()
+            ],
+            timestamp=self.timestamp,
+        )
+
+    def __str__(self):
+        return "asks: {}, bids: {}, timestamp: {}".format(
+            self.asks.tolist(), self.bids.tolist(), self.timestamp
+        )
+
+
+class WithdrawNetworkFeeSchema(FastSchema):
     network: str
     withdraw_fee: float
     min_withdrawal: float
@@ -40,7 +120,7 @@ class WithdrawNetworkFeeSchema(BaseModel):
     withdraw_enabled: bool
 
 
-class WithdrawFeeSchema(BaseModel):
+class WithdrawFeeSchema(FastSchema):
     deposit_enabled: bool
     withdraw_enabled: bool
     networks: list[WithdrawNetworkFeeSchema]
@@ -54,3 +134,38 @@ class WithdrawFeeSchema(BaseModel):
                 self.withdraw_enabled = True
             if i.deposit_enabled:
                 self.deposit_enabled = True
+
+    def toRow(self) -> list:
+        # compact form for the disk cache:
+        # [deposit, withdraw, [[network, fee, min, deposit, withdraw], ...]]
+        return [
+            self.deposit_enabled,
+            self.withdraw_enabled,
+            [
+                [
+                    i.network,
+                    i.withdraw_fee,
+                    i.min_withdrawal,
+                    i.deposit_enabled,
+                    i.withdraw_enabled,
+                ]
+                for i in self.networks
+            ],
+        ]
+
+    @classmethod
+    def fromRow(cls, row) -> "WithdrawFeeSchema":
+        return cls.build(
+            deposit_enabled=row[0],
+            withdraw_enabled=row[1],
+            networks=[
+                WithdrawNetworkFeeSchema.build(
+                    network=network[0],
+                    withdraw_fee=network[1],
+                    min_withdrawal=network[2],
+                    deposit_enabled=network[3],
+                    withdraw_enabled=network[4],
+                )
+                for network in row[2]
+            ],
+        )
@@ -0,0 +1,113 @@
+import asyncio
+import itertools
+
+import numpy as np
+
+from apis import ChangeFeed, Scheduler
+from schemas import PriceSchema, TickerSchema
+
+
+def prices(**quotes) -> dict[str, PriceSchema]:
+    return {
+        pair.replace("_", "/"): PriceSchema.build(bid=bid, ask=ask)
+        for pair, (bid, ask) in quotes.items()
+    }
+
+
+def test_first_snapshot_is_full_then_only_moves():
+    feed = ChangeFeed()
+    event = feed.diff("x", prices(BTC_USD=(1, 2), ETH_USD=(3, 4)), timestamp=1)
+    assert event.full and event.timestamp == 1
+    assert event.pairs == ["BTC/USD", "ETH/USD"]
+    assert event.values[:, :2].tolist() == [[1, 2], [3, 4]]
+    assert np.isnan(event.values[:, 2]).all()
+
+    event = feed.diff("x", prices(BTC_USD=(1, 2), ETH_USD=(3, 5)))
+    assert not event.full
+    assert event.pairs == ["ETH/USD"] and event.values[0, 1] == 5
+    assert len(feed.diff("x", prices(BTC_USD=(1, 2), ETH_USD=(3, 5)))) == 0
+
+
+def test_removed_and_returning_pairs():
+    feed = ChangeFeed()
+    feed.diff("x", prices(BTC_USD=(1, 2), ETH_USD=(3, 4)))
+    event = feed.diff("x", prices(BTC_USD=(1, 2)))
+    assert event.pairs == [] and event.removed == ["ETH/USD"]
+    # a pair coming back is sent again even if unchanged
+    event = feed.diff("x", prices(BTC_USD=(1, 2), ETH_USD=(3, 4)))
+    assert event.pairs == ["ETH/USD"] and event.removed == []
+
+
+def test_epsilon_compares_against_last_emitted_value():
+    feed = ChangeFeed(epsilon=0.01)
+    feed.diff("x", prices(BTC_USD=(100, 101)))
+    # 0.6% then 1.2% from the first value: the drift is caught the second time
+    assert len(feed.diff("x", prices(BTC_USD=(100.6, 101)))) == 0
+    event = feed.diff("x", prices(BTC_USD=(101.2, 101)))
+    assert event.pairs == ["BTC/USD"]
+    assert len(feed.diff("x", prices(BTC_USD=(101.8, 101)))) == 0
+
+
+def test_volume_and_exchanges_are_tracked_separately():
+    feed = ChangeFeed()
+    tickers = {"BTC/USD": TickerSchema.build(bid=1, ask=2, volume=10)}
+    feed.diff("x", tickers)
+    event = feed.diff("x", {"BTC/USD": TickerSchema.build(bid=1, ask=2, volume=11)})
+    assert event.toDict()["volume"] == [11]
+    assert feed.diff("y", tickers).full
+    feed.reset("x")
+    assert feed.diff("x", tickers).full
+
+
+def test_to_dict_leaves_out_missing_columns():
+    event = ChangeFeed().diff("x", prices(BTC_USD=(1, 2)), timestamp=5)
+    assert event.toDict() == {
+        "exchange": "x",
+        "timestamp": 5,
+        "full": True,
+        "pairs": ["BTC/USD"],
+        "removed": [],
+        "bid": [1.0],
+        "ask": [2.0],
+    }
+
+
+class Polled:
+    # an api whose getAssetsPrices quotes a higher bid on every call
+    def __init__(self):
+        self.calls = itertools.count(1)
+
+    def getApiName(self):
+        return "polled"
+
+    def rateLimitHeadroom(self):
+        return {}
+
+    async def getAssetsPrices(self):
+        bid = next(self.calls)
+        return prices(BTC_USD=(bid, bid + 1))
+
+
+def test_slow_subscriber_only_diffs_newest_snapshot():
+    async def main():
+        feed, events = ChangeFeed(), []
+        async with Scheduler() as scheduler:
+            subscription = scheduler.subscribe(
+                Polled(), "getAssetsPrices", interval=0.001
+            )
+            async for snapshot in subscription:
+                events.append(feed.diff("polled", snapshot))
+                if len(events) == 3:
+                    break
+                # polls published meanwhile replace each other in the queue
+                await asyncio.sleep(0.05)
+            job = subscription.job
+            subscription.close()
+        return events, job
+
+    events, job = asyncio.run(main())
+    assert events[0].full
+    bids = [event.values[0, 0] for event in events]
+    assert bids == sorted(bids) and bids[2] - bids[1] > 1
+    assert job.runs > len(events)
+    assert not job.subscribers
@@ -0,0 +1,105 @@
+import asyncio
+import time
+
+import pytest
+from multidict import CIMultiDict
+
+from apis import BinanceAPI
+from apis.ApiTemplate import APIException, Response
+from apis.CircuitBreaker import CircuitBreaker
+
+
+def test_opens_at_threshold_and_probes_after_cooldown():
+    breaker = CircuitBreaker(3, 0.05)
+    for _ in range(2):
+        breaker.failure()
+        assert breaker.allow()
+    breaker.failure()
+    assert breaker.isOpen and not breaker.allow()
+
+    time.sleep(0.06)
+    assert breaker.ready()
+    # one probe per cooldown
+    assert breaker.allow()
+    assert not breaker.ready() and not breaker.allow()
+
+
+def test_probe_outcome_closes_or_reopens():
+    breaker = CircuitBreaker(1, 0.05)
+    breaker.failure()
+    time.sleep(0.06)
+    assert breaker.allow()
+    breaker.failure()
+    assert breaker.isOpen and not breaker.allow()
+
+    time.sleep(0.06)
+    assert breaker.allow()
+    breaker.success()
+    assert not breaker.isOpen and breaker.failures == 0
+    assert breaker.allow() and breaker.allow()
+
+
+def test_ready_does_not_take_the_probe():
+    breaker = CircuitBreaker(1, 0.05)
+    breaker.failure()
+    time.sleep(0.06)
+    assert breaker.ready() and breaker.ready()
+    assert breaker.allow()
+
+
+class Status:
+    # transport answering every request with one status
+    def __init__(self, status):
+        self.status = status
+        self.calls = 0
+
+    async def fetch(self, api, method, url, params, data, headers) -> Response:
+        self.calls += 1
+        return Response(self.status, CIMultiDict(), "application/json", b"{}", None)
+
+
+def test_blocked_endpoint_leaves_the_exchange_probe():
+    async def main():
+        api = BinanceAPI("key", "secret", transport=Status(200))
+        api.BREAKER_THRESHOLD = 1
+        api.BREAKER_COOLDOWN = 0.05
+        try:
+            # the exchange breaker is due a probe, the depth breaker is not
+            api._getBreaker(None).failure()
+            await asyncio.sleep(0.06)
+            api._getBreaker("/api/v3/depth").failure()
+            with pytest.raises(APIException, match="/api/v3/depth circuit open"):
+                await api._send("GET", "https://api.binance.com/api/v3/depth")
+            assert api._transport.calls == 0
+            # so the probe is still there for another endpoint
+            await api._send("GET", "https://api.binance.com/api/v3/time")
+            assert api._transport.calls == 1
+            assert not api._getBreaker(None).isOpen and api.OPERATIONAL
+        finally:
+            await api.close()
+
+    asyncio.run(main())
+
+
+def test_failing_calls_open_the_breakers():
+    async def main():
+        api = BinanceAPI("key", "secret", transport=Status(500))
+        api.RETRY_ATTEMPTS = 1
+        api.BREAKER_THRESHOLD = 2
+        try:
+            url = "https://api.binance.com/api/v3/time"
+            await api._send("GET", url)
+            # one failing endpoint is that endpoint's problem
+            assert api._getBreaker(None).failures == 0
+            await api._send("GET", "https://api.binance.com/api/v3/exchangeInfo")
+            assert api._getBreaker(None).failures == 1
+            await api._send("GET", url)
+            assert api._getBreaker("/api/v3/time").isOpen
+            assert api._getBreaker(None).isOpen and not api.OPERATIONAL
+            with pytest.raises(APIException, match="binance circuit open"):
+                await api._send("GET", "https://api.binance.com/api/v3/ping")
+            assert api._transport.calls == 3
+        finally:
+            await api.close()
+
+    asyncio.run(main())
@@ -0,0 +1,374 @@
+import asyncio
+import json
+import urllib.parse
+import zlib
+
+import pytest
+from aiohttp import web
+from multidict import CIMultiDict
+
+from apis import BinanceAPI, BitfinexAPI, BitgetAPI, BitstampAPI, KrakenAPI
+from apis.ApiTemplate import APIException, Response
+from orderbook import OrderBook
+
+# streamDepth against a local websocket stand-in: each connection plays the
+# next scripted session, so a session ending in a gap or a bad checksum must
+# be followed by a reconnect and a fresh book from the next one
+
+
+class WsStandIn:
+    def __init__(self, *sessions):
+        self.sessions = sessions
+        self.connections = 0
+        self.received = []
+
+    async def handle(self, request):
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        session = self.sessions[min(self.connections, len(self.sessions) - 1)]
+        self.connections += 1
+        # let the client subscribe and start its snapshot download first
+        await asyncio.sleep(0.1)
+        for message in session:
+            await ws.send_str(json.dumps(message))
+        async for msg in ws:
+            self.received.append(msg.data)
+        return ws
+
+    async def __aenter__(self):
+        app = web.Application()
+        app.router.add_get("/ws", self.handle)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.url = "http://127.0.0.1:%d/ws" % port
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.runner.cleanup()
+
+
+class RestStandIn:
+    # transport answering REST requests by url path
+    def __init__(self, routes):
+        self.routes = routes
+
+    async def fetch(self, api, method, url, params, data, headers) -> Response:
+        body = json.dumps(self.routes[urllib.parse.urlsplit(url).path]).encode()
+        return Response(200, CIMultiDict(), "application/json", body, api.JSON_DECODER)
+
+
+async def stream(cls, standIn, asset0, asset1, count, routes=None):
+    api = cls("key", "c2VjcmV0", transport=RestStandIn(routes or {}))
+    api.WS_URL = standIn.url
+    api.RESYNC_DELAY = 0
+    depths = []
+    updates = api.streamDepth(asset0, asset1, limit=10)
+    try:
+        async for depth in updates:
+            depths.append(depth)
+            if len(depths) == count:
+                break
+    finally:
+        await updates.aclose()
+        await api.close()
+    return depths
+
+
+def run(cls, sessions, asset0, asset1, count, routes=None):
+    async def main():
+        async with WsStandIn(*sessions) as standIn:
+            depths = await asyncio.wait_for(
+                stream(cls, standIn, asset0, asset1, count, routes), 10
+            )
+            return depths, standIn
+
+    return asyncio.run(main())
+
+
+def levels(depth, side) -> list[tuple[float, float]]:
+    return [(i.price, i.volume) for i in getattr(depth, side)]
+
+
+def test_binance_buffers_diffs_and_resyncs_on_gap():
+    routes = {
+        "/api/v3/exchangeInfo": {
+            "symbols": [{"baseAsset": "BTC", "quoteAsset": "USDT", "symbol": "BTCUSDT"}]
+        },
+        "/api/v3/depth": {
+            "lastUpdateId": 100,
+            "bids": [["99.0", "1.0"]],
+            "asks": [["101.0", "1.0"]],
+        },
+    }
+    first = [
+        {"result": None, "id": 1},
+        # already in the snapshot: dropped, the book is the snapshot's
+        {"e": "depthUpdate", "U": 90, "u": 95, "b": [["99.0", "7.0"]], "a": []},
+        {"e": "depthUpdate", "U": 99, "u": 101, "b": [["99.0", "2.0"]], "a": []},
+        {"e": "depthUpdate", "U": 105, "u": 106, "b": [], "a": []},
+    ]
+    second = [
+        {
+            "e": "depthUpdate",
+            "U": 101,
+            "u": 102,
+            "b": [],
+            "a": [["101.0", "0"], ["102.0", "3.0"]],
+        }
+    ]
+    depths, standIn = run(BinanceAPI, [first, second], "BTC", "USDT", 3, routes)
+    assert levels(depths[0], "bids") == [(99.0, 1.0)]
+    assert levels(depths[1], "bids") == [(99.0, 2.0)]
+    assert levels(depths[1], "asks") == [(101.0, 1.0)]
+    # rebuilt from the snapshot after the gap
+    assert standIn.connections == 2
+    assert levels(depths[2], "bids") == [(99.0, 1.0)]
+    assert levels(depths[2], "asks") == [(102.0, 3.0)]
+    assert json.loads(standIn.received[0])["params"] == ["btcusdt@depth@100ms"]
+
+
+def test_bitstamp_resyncs_on_reconnect_request():
+    routes = {
+        "/api/v2/trading-pairs-info/": [{"name": "BTC/USD", "url_symbol": "btcusd"}],
+        "/api/v2/order_book/btcusd": {
+            "microtimestamp": "1000",
+            "bids": [["99.0", "1.0"]],
+            "asks": [["101.0", "1.0"]],
+        },
+    }
+    first = [
+        {"event": "bts:subscription_succeeded", "data": {}},
+        {"event": "data", "data": {"microtimestamp": "900", "bids": [], "asks": []}},
+        {
+            "event": "data",
+            "data": {"microtimestamp": "2000", "bids": [["99.0", "2.0"]], "asks": []},
+        },
+        {"event": "bts:request_reconnect", "data": {}},
+    ]
+    second = [
+        {
+            "event": "data",
+            "data": {
+                "microtimestamp": "3000",
+                "bids": [],
+                "asks": [["101.0", "0"], ["102.0", "3.0"]],
+            },
+        }
+    ]
+    depths, standIn = run(BitstampAPI, [first, second], "BTC", "USD", 3, routes)
+    assert levels(depths[0], "bids") == [(99.0, 1.0)]
+    assert levels(depths[1], "bids") == [(99.0, 2.0)]
+    assert standIn.connections == 2
+    assert levels(depths[2], "bids") == [(99.0, 1.0)]
+    assert levels(depths[2], "asks") == [(102.0, 3.0)]
+
+
+BITFINEX_ROUTES = {"/v2/conf/pub:list:pair:exchange": [["BTCUST", "BTCUSD"]]}
+
+
+def test_bitfinex_resyncs_on_sequence_gap():
+    snapshot = [17, [[100.0, 1, 1.0], [101.0, 1, -1.0]], 1]
+    first = [
+        {"event": "info", "version": 2},
+        {"event": "subscribed", "channel": "book", "chanId": 17},
+        snapshot,
+        [17, "hb", 2],
+        [17, [100.0, 1, 2.0], 3],
+        [17, [100.0, 0, 1.0], 5],
+    ]
+    second = [snapshot, [17, [101.0, 0, -1.0], 2], [17, [102.0, 2, -3.0], 3]]
+    depths, standIn = run(
+        BitfinexAPI, [first, second], "BTC", "USDT", 5, BITFINEX_ROUTES
+    )
+    assert levels(depths[0], "bids") == [(100.0, 1.0)]
+    assert levels(depths[0], "asks") == [(101.0, 1.0)]
+    assert levels(depths[1], "bids") == [(100.0, 2.0)]
+    assert standIn.connections == 2
+    assert levels(depths[2], "bids") == [(100.0, 1.0)]
+    assert levels(depths[4], "asks") == [(102.0, 3.0)]
+    assert json.loads(standIn.received[0]) == {"event": "conf", "flags": 65536}
+    # BTC/USDT is listed as BTCUST, not getSymbol's tBTC:USDT
+    assert json.loads(standIn.received[1])["symbol"] == "tBTCUST"
+
+
+def test_bitfinex_prices_aliased_pair():
+    routes = dict(BITFINEX_ROUTES)
+    routes["/v2/ticker/tBTCUST"] = [99.0, 1, 101.0, 1, 0, 0, 100.0, 42.0, 0, 0]
+
+    async def main():
+        api = BitfinexAPI("key", "c2VjcmV0", transport=RestStandIn(routes))
+        try:
+            return (
+                await api.getAssetPrice("BTC", "USDT"),
+                await api.get24hVolume("BTC", "USDT"),
+            )
+        finally:
+            await api.close()
+
+    price, volume = asyncio.run(main())
+    assert (price.bid, price.ask, volume) == (99.0, 101.0, 42.0)
+
+
+# kraken's documented checksum example
+KRAKEN_ASKS = [
+    ["0.05005", "0.00000500"],
+    ["0.05010", "0.00000500"],
+    ["0.05015", "0.00000500"],
+    ["0.05020", "0.00000500"],
+    ["0.05025", "0.00000500"],
+    ["0.05030", "0.00000500"],
+    ["0.05035", "0.00000500"],
+    ["0.05040", "0.00000500"],
+    ["0.05045", "0.00000500"],
+    ["0.05050", "0.00000500"],
+]
+KRAKEN_BIDS = [
+    ["0.05000", "0.00000500"],
+    ["0.04995", "0.00000500"],
+    ["0.04990", "0.00000500"],
+    ["0.04980", "0.00000500"],
+    ["0.04975", "0.00000500"],
+    ["0.04970", "0.00000500"],
+    ["0.04965", "0.00000500"],
+    ["0.04960", "0.00000500"],
+    ["0.04955", "0.00000500"],
+    ["0.04950", "0.00000500"],
+]
+
+
+def krakenChecksum(asks, bids) -> str:
+    values = [v.replace(".", "").lstrip("0") for level in asks + bids for v in level]
+    return str(zlib.crc32("".join(values).encode()))
+
+
+def test_kraken_checksum_matches_documented_example():
+    book, raw = OrderBook(), {"asks": {}, "bids": {}}
+    for side, rows in (("asks", KRAKEN_ASKS), ("bids", KRAKEN_BIDS)):
+        for price, volume in rows:
+            book.update(side, float(price), float(volume))
+            raw[side][float(price)] = (price, volume)
+    assert KrakenAPI._bookChecksum(book, raw) == 974947235
+
+
+KRAKEN_ROUTES = {
+    "/0/public/AssetPairs": {
+        "error": [],
+        "result": {"XETHXXBT": {"altname": "ETHXBT", "wsname": "ETH/XBT"}},
+    }
+}
+
+
+def test_kraken_resyncs_on_checksum_mismatch():
+    routes = KRAKEN_ROUTES
+    snapshot = [
+        42,
+        {
+            "as": [level + ["1.0"] for level in KRAKEN_ASKS],
+            "bs": [level + ["1.0"] for level in KRAKEN_BIDS],
+        },
+        "book-10",
+        "ETH/XBT",
+    ]
+    updatedAsks = [["0.05005", "0.00000600"]] + KRAKEN_ASKS[1:]
+    update = [
+        42,
+        {
+            "a": [["0.05005", "0.00000600", "2.0"]],
+            "c": krakenChecksum(updatedAsks, KRAKEN_BIDS),
+        },
+        "book-10",
+        "ETH/XBT",
+    ]
+    mismatch = [
+        42,
+        {"b": [["0.05000", "0.00000700", "3.0"]], "c": "1"},
+        "book-10",
+        "ETH/XBT",
+    ]
+    first = [{"event": "systemStatus", "status": "online"}, snapshot, update, mismatch]
+    depths, standIn = run(KrakenAPI, [first, [snapshot]], "ETH", "XBT", 3, routes)
+    assert levels(depths[0], "asks")[0] == (0.05005, 0.000005)
+    assert levels(depths[1], "asks")[0] == (0.05005, 0.000006)
+    assert standIn.connections == 2
+    assert levels(depths[2], "asks")[0] == (0.05005, 0.000005)
+    assert levels(depths[2], "bids")[0] == (0.05, 0.000005)
+    assert json.loads(standIn.received[0])["pair"] == ["ETH/XBT"]
+
+
+def test_kraken_raises_rejected_subscription():
+    # a permanent error reaches the caller instead of reconnecting forever
+    rejected = [
+        {
+            "event": "subscriptionStatus",
+            "status": "error",
+            "errorMessage": "Currency pair not supported",
+        }
+    ]
+    with pytest.raises(APIException, match="not supported"):
+        run(KrakenAPI, [rejected], "ETH", "XBT", 1, KRAKEN_ROUTES)
+
+
+def bitgetChecksum(asks, bids) -> int:
+    parts = []
+    for i in range(max(len(bids), len(asks))):
+        if i < len(bids):
+            parts.extend(bids[i])
+        if i < len(asks):
+            parts.extend(asks[i])
+    checksum = zlib.crc32(":".join(parts).encode())
+    return checksum - (1 << 32) if checksum >= 1 << 31 else checksum
+
+
+def test_bitget_resyncs_on_checksum_mismatch():
+    asks, bids = [["101.0", "1.0"]], [["100.0", "1.0"]]
+    snapshot = {
+        "action": "snapshot",
+        "data": [
+            {
+                "asks": asks,
+                "bids": bids,
+                "checksum": bitgetChecksum(asks, bids),
+                "ts": "1000",
+            }
+        ],
+    }
+    update = {
+        "action": "update",
+        "data": [
+            {
+                "asks": [["102.0", "2.0"]],
+                "bids": [["100.0", "0"]],
+                "checksum": bitgetChecksum([["101.0", "1.0"], ["102.0", "2.0"]], []),
+                "ts": "1001",
+            }
+        ],
+    }
+    mismatch = {
+        "action": "update",
+        "data": [{"asks": [], "bids": [["99.0", "1.0"]], "checksum": 1, "ts": "1002"}],
+    }
+    routes = {
+        "/api/spot/v1/public/products": {
+            "code": "00000",
+            "data": [
+                {
+                    "baseCoin": "BTC",
+                    "quoteCoin": "USDT",
+                    "symbol": "BTCUSDT_SPBL",
+                    "symbolName": "BTCUSDT",
+                }
+            ],
+        }
+    }
+    first = [{"event": "subscribe", "arg": {}}, snapshot, update, mismatch]
+    depths, standIn = run(BitgetAPI, [first, [snapshot]], "BTC", "USDT", 3, routes)
+    assert levels(depths[0], "bids") == [(100.0, 1.0)]
+    assert levels(depths[1], "bids") == []
+    assert levels(depths[1], "asks") == [(101.0, 1.0), (102.0, 2.0)]
+    assert standIn.connections == 2
+    assert levels(depths[2], "bids") == [(100.0, 1.0)]
+    assert depths[2].timestamp == 1000
+    assert json.loads(standIn.received[0])["args"][0]["instId"] == "BTCUSDT"
@@ -0,0 +1,134 @@
+import numpy as np
+import pytest
+
+from apis import executionCosts
+from apis.ApiTemplate import APIException
+from apis.ExecutionCost import _searchRows
+from schemas import DepthArray, DepthSchema, PriceVolumeSchema
+
+
+def walk(levels, size, unit):
+    # level by level fill of one order, the reference for the vectorized path
+    remaining, volume, notional = size, 0.0, 0.0
+    for price, available in levels:
+        if remaining <= 0:
+            break
+        if unit == "quote":
+            take = min(remaining, price * available)
+            volume += take / price
+            notional += take
+        else:
+            take = min(remaining, available)
+            volume += take
+            notional += take * price
+        remaining -= take
+    total = sum(p * v if unit == "quote" else v for p, v in levels)
+    vwap = notional / volume if volume > 0 else np.nan
+    return vwap, min(size, total), size <= total
+
+
+def randomBook(rng, levels) -> DepthArray:
+    mid = rng.uniform(10, 1000)
+    asks = mid + np.cumsum(rng.uniform(0.01, 1, levels))
+    bids = mid - np.cumsum(rng.uniform(0.01, 1, levels))
+    return DepthArray(
+        asks=np.column_stack([asks, rng.uniform(0.1, 5, levels)]),
+        bids=np.column_stack([bids, rng.uniform(0.1, 5, levels)]),
+        timestamp=0,
+    )
+
+
+def schemaBook(asks, bids) -> DepthSchema:
+    return DepthSchema.build(
+        asks=[PriceVolumeSchema.build(price=p, volume=v) for p, v in asks],
+        bids=[PriceVolumeSchema.build(price=p, volume=v) for p, v in bids],
+        timestamp=0,
+    )
+
+
+@pytest.mark.parametrize("side", ["buy", "sell"])
+@pytest.mark.parametrize("unit", ["quote", "base"])
+def test_matches_level_by_level_walk(side, unit):
+    rng = np.random.default_rng(7)
+    books = [randomBook(rng, n) for n in (1, 3, 20, 50)]
+    sizes = [0.5, 3.0, 40.0, 2_000.0, 1e9]
+    costs = executionCosts(books, sizes, side=side, unit=unit)
+    walked = "asks" if side == "buy" else "bids"
+    for i, book in enumerate(books):
+        levels = getattr(book, walked).tolist()
+        mid = (book.asks[0, 0] + book.bids[0, 0]) / 2
+        assert costs.mid[i] == pytest.approx(mid)
+        for j, size in enumerate(sizes):
+            vwap, filled, executable = walk(levels, size, unit)
+            assert costs.vwap[i, j] == pytest.approx(vwap, rel=1e-9)
+            assert costs.filled[i, j] == pytest.approx(filled, rel=1e-9)
+            assert costs.executable[i, j] == executable
+            sign = 1 if side == "buy" else -1
+            slippage = sign * (vwap - mid) / mid * 1e4
+            assert costs.slippage[i, j] == pytest.approx(slippage, rel=1e-6)
+
+
+def test_partial_fill_within_a_level():
+    book = schemaBook(asks=[(100, 1), (110, 2)], bids=[(90, 1)])
+    costs = executionCosts({"x": book}, [150, 0.5], unit="quote")
+    row = costs.row("x")
+    # 100 of the first level, 50 of the second
+    assert row["vwap"][0] == pytest.approx(150 / (1 + 50 / 110))
+    assert row["filled"][0] == 150
+    assert row["executable"].all()
+    assert costs.maxSize[0] == 320
+    assert row["slippage"][0] == pytest.approx((row["vwap"][0] - 95) / 95 * 1e4)
+
+    costs = executionCosts([book], [0.5, 2], side="buy", unit="base")
+    assert costs.vwap[0].tolist() == [100, pytest.approx((100 + 110) / 2)]
+
+
+def test_size_beyond_book_fills_all_of_it():
+    book = schemaBook(asks=[(100, 1), (110, 1)], bids=[(90, 2)])
+    costs = executionCosts([book], [10], side="sell", unit="base")
+    assert not costs.executable[0, 0]
+    assert costs.filled[0, 0] == 2
+    assert costs.vwap[0, 0] == 90
+    assert costs.maxSize[0] == 2
+
+
+def test_empty_books():
+    empty = schemaBook(asks=[], bids=[])
+    oneSided = schemaBook(asks=[(100, 1)], bids=[])
+    costs = executionCosts([empty, oneSided], [50])
+    assert np.isnan(costs.vwap[0, 0])
+    assert costs.filled[0, 0] == 0 and not costs.executable[0, 0]
+    assert costs.maxSize[0] == 0
+    assert (costs.liquidity[0] == 0).all()
+    # a book without the other side has no mid, so no slippage or bands
+    assert costs.vwap[1, 0] == 100
+    assert np.isnan(costs.mid[1]) and np.isnan(costs.slippage[1, 0])
+    assert (costs.liquidity[1] == 0).all()
+
+    costs = executionCosts([], [50])
+    assert costs.vwap.shape == (0, 1)
+
+
+def test_liquidity_within_bands():
+    book = schemaBook(asks=[(100.5, 1), (101, 2), (103, 4)], bids=[(99.5, 3)])
+    costs = executionCosts([book], [1], unit="base", bands=(0.001, 0.01, 0.05))
+    # mid 100: 0.1% reaches 100.1, 1% 101, 5% 105
+    assert costs.liquidity[0].tolist() == [0, 3, 7]
+    costs = executionCosts([book], [1], side="sell", unit="base", bands=(0.01,))
+    assert costs.liquidity[0].tolist() == [3]
+
+
+def test_search_rows_matches_searchsorted():
+    rng = np.random.default_rng(3)
+    rows = np.sort(rng.uniform(-50, 50, (6, 9)), axis=1)
+    values = rng.uniform(-60, 60, (6, 4))
+    for side in ("left", "right"):
+        expected = [np.searchsorted(r, v, side) for r, v in zip(rows, values)]
+        assert _searchRows(rows, values, side).tolist() == np.array(expected).tolist()
+
+
+def test_rejects_unknown_side_and_unit():
+    with pytest.raises(APIException):
+        executionCosts([], [1], side="short")
+    with pytest.raises(APIException):
+        executionCosts([], [1], unit="lots")
@@ -0,0 +1,133 @@
+import multiprocessing
+import uuid
+from multiprocessing import shared_memory
+
+import numpy as np
+import pytest
+
+from apis import PriceTableReader, PriceTableWriter
+from apis.ApiTemplate import APIException
+from schemas import PriceSchema, TickerSchema
+
+PAIRS = ["P%d/USD" % i for i in range(64)]
+
+
+def tableName() -> str:
+    return "test_" + uuid.uuid4().hex[:12]
+
+
+def write(name, ready, stop):
+    # every field of a row holds the same counter, so a torn read shows up
+    # as a row whose fields disagree
+    writer = PriceTableWriter(name, capacity=len(PAIRS))
+    try:
+        n = 0
+        while True:
+            n += 1
+            value = float(n)
+            writer.publish(
+                "x",
+                {
+                    pair: TickerSchema.build(bid=value, ask=value, volume=value)
+                    for pair in PAIRS
+                },
+                timestamp=value,
+            )
+            if n == 1:
+                ready.set()
+            if stop.is_set():
+                break
+    finally:
+        writer.close()
+
+
+def read(name, reads, results):
+    reader = PriceTableReader(name)
+    torn = 0
+    last = 0.0
+    try:
+        for i in range(reads):
+            if i % 2:
+                quote = reader.get("x", PAIRS[i % len(PAIRS)])
+                torn += len(set(quote)) != 1
+            else:
+                _, values = reader.snapshot()
+                torn += int((values != values[:, :1]).any(axis=1).sum())
+                last = max(last, float(values[:, 3].max()))
+    finally:
+        reader.close()
+    results.put((torn, last))
+
+
+def test_concurrent_reads_are_never_torn():
+    context = multiprocessing.get_context("spawn")
+    name = tableName()
+    ready, stop, results = context.Event(), context.Event(), context.Queue()
+    writer = context.Process(target=write, args=(name, ready, stop))
+    writer.start()
+    try:
+        assert ready.wait(30)
+        reader = context.Process(target=read, args=(name, 20000, results))
+        reader.start()
+        torn, last = results.get(timeout=60)
+        reader.join(10)
+    finally:
+        stop.set()
+        writer.join(10)
+    assert torn == 0
+    # the writer kept publishing while the reader ran
+    assert last > 1
+    assert writer.exitcode == 0 and reader.exitcode == 0
+
+
+def test_reader_sees_rows_added_after_attaching():
+    name = tableName()
+    writer = PriceTableWriter(name, capacity=4)
+    reader = PriceTableReader(name)
+    try:
+        writer.publish("x", {"BTC/USD": PriceSchema.build(bid=1, ask=2)}, timestamp=5)
+        assert reader.get("x", "BTC/USD")[:2] == (1.0, 2.0)
+        assert np.isnan(reader.get("x", "BTC/USD")[2])
+        assert reader.get("x", "ETH/USD") is None
+
+        writer.publish("y", {"ETH/USD": TickerSchema.build(bid=3, ask=4, volume=7)})
+        assert reader.get("y", "ETH/USD")[:3] == (3.0, 4.0, 7.0)
+        keys, values = reader.snapshot()
+        assert keys == [("x", "BTC/USD"), ("y", "ETH/USD")]
+        assert values.shape == (2, 4)
+    finally:
+        reader.close()
+        writer.close()
+
+
+def test_full_table_raises():
+    writer = PriceTableWriter(tableName(), capacity=1)
+    try:
+        writer.publish("x", {"BTC/USD": PriceSchema.build(bid=1, ask=2)})
+        with pytest.raises(APIException):
+            writer.publish("x", {"ETH/USD": PriceSchema.build(bid=1, ask=2)})
+    finally:
+        writer.close()
+
+
+def test_close_unlinks_for_new_readers_only():
+    name = tableName()
+    writer = PriceTableWriter(name, capacity=4)
+    writer.publish("x", {"BTC/USD": PriceSchema.build(bid=1, ask=2)})
+    reader = PriceTableReader(name)
+    writer.close()
+    # an attached reader keeps its mapping
+    assert reader.get("x", "BTC/USD")[:2] == (1.0, 2.0)
+    reader.close()
+    with pytest.raises(FileNotFoundError):
+        PriceTableReader(name)
+
+
+def test_attaching_to_another_segment_raises():
+    segment = shared_memory.SharedMemory(name=tableName(), create=True, size=4096)
+    try:
+        with pytest.raises(APIException):
+            PriceTableReader(segment.name)
+    finally:
+        segment.close()
+        segment.unlink()
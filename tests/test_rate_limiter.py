@@ -0,0 +1,139 @@
+import asyncio
+import email.utils
+import time
+
+import pytest
+from multidict import CIMultiDict
+
+from apis import BinanceAPI
+from apis.ApiTemplate import Response
+from apis.RateLimiter import RateLimiter
+
+
+def timed(coroutine) -> float:
+    async def main():
+        start = time.monotonic()
+        await coroutine
+        return time.monotonic() - start
+
+    return asyncio.run(main())
+
+
+def test_acquire_waits_for_refill():
+    async def main():
+        limiter = RateLimiter(10, 0.5)  # 20 weight per second
+        start = time.monotonic()
+        await limiter.acquire(10)
+        assert time.monotonic() - start < 0.05
+        await limiter.acquire(4)
+        return time.monotonic() - start
+
+    assert 0.15 <= asyncio.run(main()) < 0.5
+
+
+def test_queued_callers_go_in_order():
+    async def main():
+        limiter = RateLimiter(2, 0.1)
+        order = []
+
+        async def call(i):
+            await limiter.acquire(2)
+            order.append(i)
+
+        await asyncio.gather(*[call(i) for i in range(5)])
+        return order
+
+    assert asyncio.run(main()) == [0, 1, 2, 3, 4]
+
+
+def test_weight_above_capacity_waits_for_a_full_bucket():
+    limiter = RateLimiter(5, 0.1)
+    assert timed(limiter.acquire(50)) < 0.05
+    assert limiter.headroom < 0.5
+
+
+def test_refill_is_capped_at_capacity():
+    limiter = RateLimiter(10, 0.01)
+    limiter.tokens = 0
+    time.sleep(0.05)
+    assert limiter.headroom == 1.0
+
+
+def test_sync_only_lowers_the_budget():
+    limiter = RateLimiter(100, 60)
+    limiter.sync(30)
+    assert limiter.tokens == pytest.approx(70)
+    limiter.tokens = 10
+    limiter.sync(30)
+    assert limiter.tokens == pytest.approx(10, abs=0.1)
+
+
+def test_pause_holds_every_caller():
+    limiter = RateLimiter(100, 1)
+    limiter.pause(0.2)
+    assert limiter.headroom == 0
+    assert timed(limiter.acquire(1)) >= 0.2
+
+
+class Headers:
+    # transport answering every request with the given status and headers
+    def __init__(self, status, headers):
+        self.status = status
+        self.headers = headers
+
+    async def fetch(self, api, method, url, params, data, headers) -> Response:
+        return Response(
+            self.status, CIMultiDict(self.headers), "application/json", b"{}", None
+        )
+
+
+def send(api, url):
+    async def main():
+        try:
+            return await api._send("GET", url)
+        finally:
+            await api.close()
+
+    return asyncio.run(main())
+
+
+def test_binance_syncs_used_weight_and_weighs_endpoints():
+    api = BinanceAPI(
+        "key", "secret", transport=Headers(200, {"X-MBX-USED-WEIGHT-1M": "1500"})
+    )
+    send(api, "https://api.binance.com/api/v3/exchangeInfo")
+    # the server's 1500 counts, not our own 20 for exchangeInfo
+    assert api.rateLimitHeadroom()["default"] == pytest.approx(0.75, abs=0.01)
+
+    api = BinanceAPI("key", "secret", transport=Headers(200, {}))
+    send(api, "https://api.binance.com/sapi/v1/capital/config/getall")
+    assert api.rateLimitHeadroom()["sapi"] == pytest.approx(1 - 10 / 12000, abs=1e-3)
+
+
+@pytest.mark.parametrize(
+    "retryAfter, seconds",
+    [
+        ("7", 7),
+        ("date", 30),
+        ("soon", 60),  # unreadable: the bucket's full refill time
+    ],
+)
+def test_429_pauses_for_retry_after(retryAfter, seconds):
+    if retryAfter == "date":
+        retryAfter = email.utils.formatdate(time.time() + seconds, usegmt=True)
+    api = BinanceAPI(
+        "key", "secret", transport=Headers(429, {"Retry-After": retryAfter})
+    )
+    api.RETRY_ATTEMPTS = 1
+    start = time.monotonic()
+    assert send(api, "https://api.binance.com/api/v3/time").status == 429
+    limiter = api._limiters["default"]
+    assert limiter.pausedUntil - start == pytest.approx(seconds, abs=1.5)
+    assert api.rateLimitHeadroom()["default"] == 0
+
+
+def test_nothing_accrues_during_a_pause():
+    limiter = RateLimiter(10, 0.1)
+    limiter.pause(0.1)
+    time.sleep(0.15)
+    assert limiter.headroom < 0.6
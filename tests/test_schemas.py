@@ -0,0 +1,23 @@
+import pydantic
+import pytest
+
+import schemas
+from schemas import PriceSchema
+
+
+def test_strict_by_default_in_tests():
+    assert schemas.STRICT
+
+
+def test_build_validates_when_strict():
+    with pytest.raises(pydantic.ValidationError):
+        PriceSchema.build(bid="not a price", ask=1.0)
+    # values are coerced like the constructor does
+    assert PriceSchema.build(bid="1.5", ask=2).bid == 1.5
+
+
+def test_build_skips_validation_otherwise(monkeypatch):
+    monkeypatch.setattr(schemas, "STRICT", False)
+    price = PriceSchema.build(bid="not a price", ask=1.0)
+    assert price.bid == "not a price"
+    assert price.__fields_set__ == {"bid", "ask"}
@@ -0,0 +1,116 @@
+import os
+
+import numpy as np
+import pytest
+
+from apis import DiskCache, SnapshotReader, SnapshotRecorder
+from apis.ApiTemplate import APIException
+from apis.DiskCache import replaceFile
+from schemas import DepthArray, DepthSchema, PriceSchema, PriceVolumeSchema
+
+
+def prices(bid) -> dict[str, PriceSchema]:
+    return {
+        "BTC/USD": PriceSchema.build(bid=bid, ask=bid + 1),
+        "ETH/USD": PriceSchema.build(bid=bid / 10, ask=bid / 10 + 1),
+    }
+
+
+def test_read_time_range_and_pairs(tmp_path):
+    with SnapshotRecorder(str(tmp_path)) as recorder:
+        for t in range(10):
+            recorder.addPrices("x", prices(100 + t), timestamp=t)
+        recorder.addVolumes("x", {"BTC/USD": 5.0}, timestamp=3)
+
+    reader = SnapshotReader(str(tmp_path))
+    assert reader.exchanges("prices") == ["x"]
+    rows = reader.read("prices", "x")
+    assert len(rows) == 20 and (np.diff(rows["time"]) >= 0).all()
+
+    rows = reader.read("prices", "x", start=2, end=5, pairs=["BTC/USD"])
+    assert rows["time"].tolist() == [2, 3, 4]
+    assert rows["bid"].tolist() == [102, 103, 104]
+    assert reader.pairs("x", rows) == ["BTC/USD"] * 3
+    # a range within one chunk is read from the mapping, not copied
+    assert isinstance(reader.read("prices", "x", start=2, end=5).base, np.memmap)
+
+    assert reader.read("volumes", "x")["volume"].tolist() == [5.0]
+    assert len(reader.read("prices", "x", pairs=["DOGE/USD"])) == 0
+    assert len(reader.read("prices", "nobody")) == 0
+
+
+def test_chunks_roll_over_and_reopening_appends(tmp_path, monkeypatch):
+    monkeypatch.setattr(SnapshotRecorder, "CHUNK_ROWS", 4)
+    recorder = SnapshotRecorder(str(tmp_path))
+    for t in range(5):
+        recorder.addPrices("x", prices(t), timestamp=t)
+    recorder.close()
+    recorder = SnapshotRecorder(str(tmp_path))
+    recorder.addPrices("x", {"SOL/USD": PriceSchema.build(bid=1, ask=2)}, timestamp=9)
+    recorder.close()
+
+    reader = SnapshotReader(str(tmp_path))
+    assert [chunk["rows"] for chunk in reader.index] == [4, 4, 2, 1]
+    rows = reader.read("prices", "x", start=1, end=4)
+    assert rows["time"].tolist() == [1, 1, 2, 2, 3, 3]
+    rows = reader.read("prices", "x", start=9)
+    assert reader.pairs("x", rows) == ["SOL/USD"]
+    assert reader.pairNames["x"] == ["BTC/USD", "ETH/USD", "SOL/USD"]
+
+
+def test_depth_in_either_form_is_padded(tmp_path):
+    levels = [(100.0, 1.0), (101.0, 2.0), (102.0, 3.0)]
+    schema = DepthSchema.build(
+        asks=[PriceVolumeSchema.build(price=p, volume=v) for p, v in levels],
+        bids=[PriceVolumeSchema.build(price=99.0, volume=4.0)],
+        timestamp=0,
+    )
+    array = DepthArray.fromRows(asks=levels, bids=[(99.0, 4.0)], timestamp=0)
+    with SnapshotRecorder(str(tmp_path), depthLevels=2) as recorder:
+        recorder.addDepth("x", "BTC/USD", schema, timestamp=1)
+        recorder.addDepth("x", "BTC/USD", array, timestamp=2)
+
+    rows = SnapshotReader(str(tmp_path)).read("depth", "x")
+    for row in rows:
+        assert row["asks"].tolist() == [[100.0, 1.0], [101.0, 2.0]]
+        assert row["bids"][0].tolist() == [99.0, 4.0]
+        assert np.isnan(row["bids"][1]).all()
+
+    with pytest.raises(APIException):
+        SnapshotRecorder(str(tmp_path), depthLevels=5)
+
+
+def test_reader_needs_a_store_and_refreshes(tmp_path):
+    with pytest.raises(APIException):
+        SnapshotReader(str(tmp_path))
+    recorder = SnapshotRecorder(str(tmp_path))
+    recorder.addPrices("x", prices(1), timestamp=1)
+    recorder.flush()
+    reader = SnapshotReader(str(tmp_path))
+    recorder.addPrices("y", prices(2), timestamp=2)
+    recorder.close()
+    assert reader.exchanges("prices") == ["x"]
+    reader.refresh()
+    assert reader.exchanges("prices") == ["x", "y"]
+
+
+def test_replace_file_keeps_the_old_file_on_failure(tmp_path):
+    path = str(tmp_path / "file")
+    replaceFile(path, lambda f: f.write(b"old"))
+
+    def fail(f):
+        f.write(b"partial")
+        raise OSError("disk full")
+
+    with pytest.raises(OSError):
+        replaceFile(path, fail)
+    assert open(path, "rb").read() == b"old"
+    assert os.listdir(tmp_path) == ["file"]
+
+
+def test_disk_cache_round_trip(tmp_path):
+    cache = DiskCache(str(tmp_path))
+    assert cache.get("x", "metadata") is None
+    cache.put("x", "metadata", {"pairs": ["BTC/USD"]})
+    value, written = cache.get("x", "metadata")
+    assert value == {"pairs": ["BTC/USD"]} and written > 0
@@ -0,0 +1,124 @@
+import asyncio
+import time
+
+import pytest
+from aiohttp import web
+
+from apis import BinanceAPI
+from apis.ApiTemplate import APIException, Response
+from apis.Transport import RecordingTransport, ReplayTransport, requestKey
+
+
+class Echo:
+    # answers with what it was sent, plus a per-request counter
+    def __init__(self):
+        self.hits = 0
+
+    async def handle(self, request):
+        self.hits += 1
+        body = await request.post() if request.method == "POST" else {}
+        return web.json_response(
+            {"hit": self.hits, "query": dict(request.query), "body": dict(body)}
+        )
+
+
+async def record(path):
+    app = web.Application()
+    app.router.add_route("*", "/echo", Echo().handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    url = "http://127.0.0.1:%d/echo" % site._server.sockets[0].getsockname()[1]
+
+    transport = RecordingTransport(path)
+    api = BinanceAPI("key", "secret", transport=transport)
+    try:
+        await api._send("GET", url, params={"symbol": "BTCUSDT", "timestamp": 1})
+        await api._send("GET", url, params={"symbol": "ETHUSDT"})
+        for asset, nonce in (("XBT", 1), ("ETH", 2), ("XBT", 3)):
+            await api._send("POST", url, data={"asset": asset, "nonce": nonce})
+    finally:
+        await api.close()
+        transport.close()
+        await runner.cleanup()
+    return url
+
+
+def replay(path, url, useMmap=False):
+    async def main():
+        transport = ReplayTransport(path, useMmap=useMmap)
+        api = BinanceAPI("key", "secret", transport=transport)
+        try:
+            # volatile fields differ from the recording and still match
+            gets = [
+                (await api._send("GET", url, params=params)).json()
+                for params in (
+                    {"symbol": "BTCUSDT", "timestamp": 99},
+                    {"symbol": "ETHUSDT"},
+                )
+            ]
+            posts = [
+                (await api._send("POST", url, data={"asset": a, "nonce": 7})).json()
+                for a in ("XBT", "ETH", "XBT", "XBT")
+            ]
+            with pytest.raises(APIException):
+                await api._send("GET", url, params={"symbol": "SOLUSDT"})
+            return gets, posts, transport.requests()
+        finally:
+            await api.close()
+            transport.close()
+
+    return asyncio.run(main())
+
+
+@pytest.mark.parametrize("useMmap", [False, True])
+def test_replay_serves_recorded_responses_by_request(tmp_path, useMmap):
+    path = str(tmp_path / "traffic.rec")
+    url = asyncio.run(record(path))
+    gets, posts, requests = replay(path, url, useMmap)
+
+    assert [g["query"]["symbol"] for g in gets] == ["BTCUSDT", "ETHUSDT"]
+    # POSTs to one url are told apart by their bodies, and a key's
+    # responses come back in recorded order, then from the start again
+    assert [p["body"]["asset"] for p in posts] == ["XBT", "ETH", "XBT", "XBT"]
+    assert [p["hit"] for p in posts] == [3, 4, 5, 3]
+    assert len(requests) == 5
+    assert [offset for offset, _ in requests] == sorted(o for o, _ in requests)
+
+
+def test_request_key_ignores_volatile_fields_only():
+    key = requestKey("GET", "u", {"b": 2, "a": 1, "timestamp": 5, "signature": "s"})
+    assert key == "GET u?a=1&b=2"
+    post = requestKey("POST", "u", None, {"asset": "XBT", "nonce": 1})
+    assert post == requestKey("POST", "u", None, {"nonce": 2, "asset": "XBT"})
+    assert post != requestKey("POST", "u", None, {"asset": "ETH", "nonce": 1})
+    assert post.startswith("POST u #")
+    assert requestKey("POST", "u", None, "a=1") == requestKey("POST", "u", None, b"a=1")
+
+
+def test_replay_speed_waits_recorded_duration(tmp_path):
+    path = str(tmp_path / "slow.rec")
+    transport = RecordingTransport(path)
+    transport.write(0, 0.2, "GET u", Response(200, {}, "", b"", None))
+    transport.close()
+
+    async def fetch(speed):
+        replay = ReplayTransport(path, speed=speed)
+        api = BinanceAPI("key", "secret", transport=replay)
+        start = time.monotonic()
+        try:
+            await replay.fetch(api, "GET", "u", None, None, None)
+        finally:
+            await api.close()
+        return time.monotonic() - start
+
+    assert asyncio.run(fetch(1)) >= 0.2
+    assert asyncio.run(fetch(10)) < 0.1
+
+
+def test_replay_rejects_other_files(tmp_path):
+    path = tmp_path / "other"
+    path.write_bytes(b"not a recording")
+    with pytest.raises(APIException):
+        ReplayTransport(str(path))